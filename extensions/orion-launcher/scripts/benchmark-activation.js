@@ -0,0 +1,133 @@
+// Measure orion-launcher startup cost: module load (require) and activate().
+//
+// Each sample runs in a fresh Node process, so module resolution and file
+// reads are paid in full, as they are when the extension host starts.
+// The "vscode" module is replaced with a stub that accepts any API call.
+//
+// Usage:
+//   node scripts/benchmark-activation.js [--runs N] ENTRY [ENTRY...]
+//   npm run benchmark:activation   # tsc output (out/) vs bundle (dist/)
+
+const { execFileSync } = require("child_process");
+const Module = require("module");
+const path = require("path");
+
+function vscodeStub() {
+  // Every property is another stub and every call returns one, except the
+  // few values activate() branches on.
+  const handler = {
+    get(target, prop) {
+      if (prop === "then") {
+        return undefined;
+      }
+      if (prop === "workspaceFolders" || prop === "remoteName") {
+        return undefined;
+      }
+      return stub;
+    },
+    apply() {
+      return stub;
+    },
+    construct() {
+      return stub;
+    },
+  };
+  const stub = new Proxy(function () {}, handler);
+  return stub;
+}
+
+function sampleChild(entry) {
+  const stub = vscodeStub();
+  const originalLoad = Module._load;
+  Module._load = function (request, ...rest) {
+    return request === "vscode"
+      ? stub
+      : originalLoad.call(this, request, ...rest);
+  };
+
+  const context = {
+    subscriptions: [],
+    extensionUri: stub,
+    extensionPath: path.dirname(entry),
+    globalState: { get: () => undefined, update: async () => undefined },
+  };
+
+  console.log = () => {};
+  const start = process.hrtime.bigint();
+  const extension = require(path.resolve(entry));
+  const loaded = process.hrtime.bigint();
+  extension.activate(context);
+  const activated = process.hrtime.bigint();
+
+  process.stdout.write(
+    JSON.stringify({
+      loadMs: Number(loaded - start) / 1e6,
+      activateMs: Number(activated - loaded) / 1e6,
+      modules: Object.keys(require.cache).length,
+    }),
+  );
+  // Exit before the wizard's asynchronous work starts against the stub
+  process.exit(0);
+}
+
+function median(values) {
+  const sorted = [...values].sort((a, b) => a - b);
+  const middle = Math.floor(sorted.length / 2);
+  return sorted.length % 2
+    ? sorted[middle]
+    : (sorted[middle - 1] + sorted[middle]) / 2;
+}
+
+function main(argv) {
+  let runs = 20;
+  const entries = [];
+  for (let i = 0; i < argv.length; i++) {
+    if (argv[i] === "--runs") {
+      runs = Number(argv[++i]);
+    } else {
+      entries.push(argv[i]);
+    }
+  }
+  if (!entries.length) {
+    console.error(
+      "Usage: benchmark-activation.js [--runs N] ENTRY [ENTRY...]",
+    );
+    process.exit(2);
+  }
+
+  const results = [];
+  for (const entry of entries) {
+    const samples = [];
+    for (let run = 0; run < runs; run++) {
+      const output = execFileSync(
+        process.execPath,
+        [__filename, "--child", entry],
+        { encoding: "utf8" },
+      );
+      samples.push(JSON.parse(output));
+    }
+    const load = median(samples.map((sample) => sample.loadMs));
+    const activate = median(samples.map((sample) => sample.activateMs));
+    results.push({ entry, load, activate, modules: samples[0].modules });
+  }
+
+  console.log(`Median over ${runs} cold starts:`);
+  for (const { entry, load, activate, modules } of results) {
+    console.log(
+      `  ${entry.padEnd(24)} load ${load.toFixed(1).padStart(7)} ms` +
+        `  activate ${activate.toFixed(1).padStart(6)} ms` +
+        `  ${String(modules).padStart(4)} modules`,
+    );
+  }
+  if (results.length > 1) {
+    const total = ({ load, activate }) => load + activate;
+    const speedup = total(results[0]) / total(results[results.length - 1]);
+    console.log(`  Speedup: ${speedup.toFixed(2)}x`);
+  }
+}
+
+if (process.argv[2] === "--child") {
+  sampleChild(process.argv[3]);
+} else {
+  main(process.argv.slice(2));
+}
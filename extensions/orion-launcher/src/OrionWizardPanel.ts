@@ -10,6 +10,7 @@ import {
   Repository,
   RepositoryStatus,
 } from "./extension";
+import { RemoteServerService } from "./RemoteServerService";
 
 /**
  * Status data for a repository, used for UI display.
@@ -129,6 +130,15 @@ export class OrionWizardPanel {
   }
 
   private async _connectRemote(host: string) {
+    // Install the bundled VS Code Server and extensions on the host first, so the
+    // connect does not download them there. If that fails, Remote-SSH still does.
+    try {
+      const staged = await new RemoteServerService().stage(host);
+      console.log(`VS Code Server pre-staged on ${host}: ${staged}`);
+    } catch (e) {
+      console.error(`Failed to pre-stage the VS Code Server on ${host}: ${e}`);
+    }
+
     // Open a new window with the remote authority
     // We use the 'vscode.newWindow' command with the remoteAuthority option
     // The format for ssh remote is 'ssh-remote+<host>'
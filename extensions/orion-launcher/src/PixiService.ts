@@ -2,6 +2,7 @@ import * as cp from "child_process";
 import * as fs from "fs";
 import * as path from "path";
 import * as os from "os";
+import * as url from "url";
 import { modify, applyEdits } from "jsonc-parser";
 
 export class PixiService {
@@ -117,6 +118,7 @@ export class PixiService {
   ): Promise<void> {
     if (progressCallback) progressCallback("Running pixi install...");
 
+    this.configureBundledPackages(targetDir);
     const pixiPath = this.getPixiPath();
 
     return new Promise((resolve, reject) => {
@@ -143,6 +145,44 @@ export class PixiService {
     });
   }
 
+  /**
+   * Point pixi at the conda packages bundled with Orion Studio (build option
+   * --prefetch-env) so the first install of a notebook repo needs no downloads.
+   * The launcher script sets ORION_PIXI_MIRROR when the bundle exists. Writes a
+   * project-local .pixi/config.toml unless the project already has one; packages
+   * missing from the bundle still come from the original channel.
+   */
+  private configureBundledPackages(targetDir: string): void {
+    const mirrorDir = process.env.ORION_PIXI_MIRROR;
+    const configPath = path.join(targetDir, ".pixi", "config.toml");
+    if (!mirrorDir || fs.existsSync(configPath)) {
+      return;
+    }
+
+    try {
+      const index = JSON.parse(
+        fs.readFileSync(path.join(mirrorDir, "mirrors.json"), "utf-8"),
+      );
+      const lines = [
+        "# Written by Orion Studio: bundled packages first, then the channel",
+        "[mirrors]",
+      ];
+      for (const [channel, dir] of Object.entries<string>(index.mirrors)) {
+        const local = url.pathToFileURL(path.join(mirrorDir, dir)).href;
+        // JSON string literals are valid TOML basic strings
+        lines.push(
+          `${JSON.stringify(channel)} = [${JSON.stringify(local)}, ${JSON.stringify(channel)}]`,
+        );
+      }
+      fs.mkdirSync(path.dirname(configPath), { recursive: true });
+      fs.writeFileSync(configPath, lines.join("\n") + "\n");
+      console.log(`Using bundled conda packages from ${mirrorDir}`);
+    } catch (e) {
+      // Not fatal: pixi downloads everything as usual
+      console.warn(`Failed to configure bundled conda packages: ${e}`);
+    }
+  }
+
   private isPixiInstalled(): boolean {
     try {
       const pixiPath = this.getPixiPath();
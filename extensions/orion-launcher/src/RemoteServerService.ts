@@ -0,0 +1,98 @@
+import * as vscode from "vscode";
+import * as fs from "fs";
+import * as os from "os";
+import * as path from "path";
+
+const STAGE_TASK_TYPE = "orion-remote-server";
+
+export class RemoteServerService {
+  /**
+   * Find stage_remote_server.sh in the remote-server/ directory the build
+   * bundles with the install. Returns undefined when there is none (development
+   * hosts, builds made without --remote-server).
+   */
+  public getStageScript(): string | undefined {
+    // appRoot is <install>/resources/app on Linux, and on macOS
+    // Orion Studio.app/Contents/Resources/Visual Studio Code.app/Contents/Resources/app
+    const candidates = [
+      path.join(vscode.env.appRoot, "..", "..", "remote-server"),
+      path.join(vscode.env.appRoot, "..", "..", "..", "..", "remote-server"),
+    ];
+    for (const dir of candidates) {
+      const script = path.join(dir, "stage_remote_server.sh");
+      if (fs.existsSync(script)) {
+        return script;
+      }
+    }
+    return undefined;
+  }
+
+  /**
+   * Whether stage_remote_server.sh recorded `host` as staged with the bundled
+   * commit, in ~/.orion-studio/remote-server-staged.
+   */
+  public isStaged(script: string, host: string): boolean {
+    try {
+      const commit = fs
+        .readFileSync(path.join(path.dirname(script), "commit"), "utf8")
+        .trim();
+      const staged = fs.readFileSync(
+        path.join(os.homedir(), ".orion-studio", "remote-server-staged"),
+        "utf8",
+      );
+      return staged.split("\n").includes(`${host} ${commit}`);
+    } catch {
+      return false;
+    }
+  }
+
+  /**
+   * Install the bundled VS Code Server and remote default extensions on `host`,
+   * so that connecting to it does not download them there.
+   *
+   * The script runs as a task, in a terminal where SSH can ask for passwords and
+   * one-time codes. Hosts staged earlier are skipped without a task. Uses the
+   * shared cluster-side copy in `orion-launcher.remoteServerCache` when set.
+   * Resolves to true if the host is staged.
+   */
+  public async stage(host: string): Promise<boolean> {
+    const script = this.getStageScript();
+    if (!script) {
+      return false;
+    }
+    if (this.isStaged(script, host)) {
+      return true;
+    }
+
+    const cacheDir = vscode.workspace
+      .getConfiguration("orion-launcher")
+      .get<string>("remoteServerCache", "");
+    const args = cacheDir ? ["--cache", cacheDir, host] : [host];
+    const definition = { type: STAGE_TASK_TYPE, host };
+    const task = new vscode.Task(
+      definition,
+      vscode.TaskScope.Global,
+      `Prepare ${host}`,
+      "Orion Studio",
+      new vscode.ProcessExecution(script, args),
+    );
+    task.presentationOptions = {
+      reveal: vscode.TaskRevealKind.Always,
+      focus: true,
+      panel: vscode.TaskPanelKind.Dedicated,
+    };
+
+    // Subscribed before the task starts, in case it finishes immediately
+    const finished = new Promise<boolean>((resolve) => {
+      const listener = vscode.tasks.onDidEndTaskProcess((event) => {
+        const ended = event.execution.task.definition;
+        if (ended.type === STAGE_TASK_TYPE && ended.host === host) {
+          listener.dispose();
+          resolve(event.exitCode === 0);
+        }
+      });
+    });
+    await vscode.tasks.executeTask(task);
+    return finished;
+  }
+}
@@ -0,0 +1,225 @@
+"""Apply an Orion Studio delta update package to a Linux install in place.
+
+Delta packages (``OrionStudio-linux-delta-<old>-to-<new>.tar.*``) are written by
+``build_orion.py --delta-from``. They only work on an install of the release they
+were made from: every file the package touches must still match the hash it had
+in that release, and every new file must match the hash recorded for it, before
+anything in the install is changed. If applying fails partway, the files changed
+so far are restored and the install stays at the old release; only a crash or
+power loss in the middle can leave it mixed, and then reinstalling the full
+release (or restoring from ``.orion-delta-*/backup`` in the install) recovers it.
+
+Usage:
+    python3 apply_delta.py PACKAGE [INSTALL_DIR]    # INSTALL_DIR defaults to this script's directory
+    python3 apply_delta.py --check PACKAGE          # verify only, change nothing
+
+Needs only the Python standard library (and the zstd tool for .tar.zst packages).
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+RELEASE_MANIFEST_NAME = ".orion-release.json"
+DELTA_FORMAT = 1
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_entry(path):
+    """Return the release manifest entry of ``path`` as it is now, or None if it is missing."""
+    if os.path.islink(path):
+        return {"link": os.readlink(path)}
+    if not os.path.isfile(path):
+        return None
+    st = os.stat(path)
+    return {"sha256": sha256_file(path), "size": st.st_size, "mode": st.st_mode & 0o7777}
+
+
+def unpack(package, dest_dir):
+    """Unpack a delta package into ``dest_dir`` and return the directory holding delta.json."""
+    if package.endswith(".zst"):
+        if not shutil.which("zstd"):
+            raise SystemExit("Error: the zstd command is required to read .tar.zst packages")
+        proc = subprocess.Popen(["zstd", "-dc", package], stdout=subprocess.PIPE)
+        with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+            _extract(tar, dest_dir)
+        if proc.wait() != 0:
+            raise SystemExit(f"Error: could not decompress {package}")
+    else:
+        with tarfile.open(package, "r:*") as tar:
+            _extract(tar, dest_dir)
+    roots = os.listdir(dest_dir)
+    if len(roots) != 1 or not os.path.exists(os.path.join(dest_dir, roots[0], "delta.json")):
+        raise SystemExit(f"Error: {package} is not a delta update package")
+    return os.path.join(dest_dir, roots[0])
+
+
+def _extract(tar, dest_dir):
+    # Reject absolute paths and links out of dest_dir where tarfile supports it
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(dest_dir, filter="data")
+    else:
+        tar.extractall(dest_dir)
+
+
+def verify(delta, package_dir, install_dir):
+    """Return a list of problems that prevent applying ``delta`` to ``install_dir``."""
+    problems = []
+    if delta.get("format") != DELTA_FORMAT:
+        return [f"unsupported delta format {delta.get('format')!r}"]
+
+    try:
+        with open(os.path.join(install_dir, RELEASE_MANIFEST_NAME)) as f:
+            installed = json.load(f)
+    except (OSError, ValueError):
+        return [f"{install_dir} has no readable {RELEASE_MANIFEST_NAME}; is it an Orion Studio install?"]
+    if installed["digest"] == delta["to"]["digest"]:
+        return [f"{install_dir} is already at {delta['to']['version']}"]
+    if installed["digest"] != delta["from"]["digest"]:
+        return [
+            f"the package updates {delta['from']['version']}, but {install_dir} is "
+            f"{installed.get('version')} (a different build)"
+        ]
+
+    # The install must still hold the files of the base release the delta was made from
+    touched = {path: entry["old"] for path, entry in delta["changed"].items()}
+    touched.update(delta["deleted"])
+    for path, expected in sorted(touched.items()):
+        if file_entry(os.path.join(install_dir, path)) != expected:
+            problems.append(f"{path} was modified after installation")
+
+    # The payload must be what the new release contains
+    for path, entry in sorted(delta["changed"].items()):
+        if "sha256" in entry:
+            payload = os.path.join(package_dir, "files", path)
+            if not os.path.isfile(payload) or sha256_file(payload) != entry["sha256"]:
+                problems.append(f"{path} is damaged in the package")
+    return problems
+
+
+def apply(delta, package_dir, install_dir, backup_dir):
+    """Delete the files ``delta`` dropped and move its payload into ``install_dir``.
+
+    Every file that is replaced or deleted is kept in ``backup_dir`` (on the same
+    filesystem) first. If any step fails, the changes made so far are undone in
+    reverse order, so the install is left at the old release with its manifest,
+    and the error is re-raised.
+    """
+    undo = []
+
+    def backup(path, dest, keep):
+        # A hardlink for files that stay in place until os.replace() swaps them, so
+        # a running instance never sees the path missing; a rename for deletions
+        saved = os.path.join(backup_dir, path)
+        os.makedirs(os.path.dirname(saved), exist_ok=True)
+        if keep:
+            os.link(dest, saved, follow_symlinks=False)
+        else:
+            os.replace(dest, saved)
+        undo.append(functools.partial(os.replace, saved, dest))
+
+    try:
+        # Deletions first, so that a file can replace a directory and vice versa
+        for path in sorted(delta["deleted"], reverse=True):
+            dest = os.path.join(install_dir, path)
+            if os.path.lexists(dest):
+                backup(path, dest, keep=False)
+            # Remove directories the deletion left empty, such as an old extension version
+            parent = os.path.dirname(dest)
+            while parent != install_dir and os.path.isdir(parent) and not os.listdir(parent):
+                os.rmdir(parent)
+                undo.append(functools.partial(os.makedirs, parent, exist_ok=True))
+                parent = os.path.dirname(parent)
+
+        for path, entry in sorted(delta["changed"].items()):
+            dest = os.path.join(install_dir, path)
+            created = []
+            parent = os.path.dirname(dest)
+            while not os.path.isdir(parent):
+                created.append(parent)
+                parent = os.path.dirname(parent)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            undo.extend(functools.partial(os.rmdir, directory) for directory in reversed(created))
+            existed = os.path.lexists(dest)
+            if existed:
+                backup(path, dest, keep="link" not in entry)
+            if "link" in entry:
+                os.symlink(entry["link"], dest)
+            else:
+                # os.replace() is atomic, so a running instance sees the old or the new file
+                payload = os.path.join(package_dir, "files", path)
+                os.chmod(payload, entry["mode"])
+                os.replace(payload, dest)
+            if not existed:
+                undo.append(functools.partial(os.remove, dest))
+
+        # Written last: the install only claims the new release once every file is in place
+        shutil.copy(os.path.join(package_dir, "manifest.json"), os.path.join(install_dir, RELEASE_MANIFEST_NAME))
+    except BaseException:
+        print("Update failed, restoring the previous files...", file=sys.stderr)
+        for step in reversed(undo):
+            try:
+                step()
+            except OSError as e:
+                print(f"  Could not restore: {e}", file=sys.stderr)
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply an Orion Studio delta update package in place.")
+    parser.add_argument("package", help="Delta package (.tar.gz, .tar.zst or .tar.xz)")
+    parser.add_argument(
+        "install_dir",
+        nargs="?",
+        default=os.path.dirname(os.path.abspath(__file__)),
+        help="Orion Studio install to update (default: %(default)s)",
+    )
+    parser.add_argument("--check", action="store_true", help="Verify the package against the install only")
+    args = parser.parse_args(argv)
+    install_dir = os.path.abspath(args.install_dir)
+
+    # Unpacked next to the install, so that applying is a rename rather than a copy
+    with tempfile.TemporaryDirectory(dir=install_dir, prefix=".orion-delta-") as tmp_dir:
+        package_dir = unpack(args.package, tmp_dir)
+        with open(os.path.join(package_dir, "delta.json")) as f:
+            delta = json.load(f)
+        print(
+            f"Delta {delta['from']['version']} -> {delta['to']['version']}: "
+            f"{len(delta['changed'])} files added or changed, {len(delta['deleted'])} deleted"
+        )
+
+        problems = verify(delta, package_dir, install_dir)
+        if problems:
+            print(f"Cannot apply {args.package}:", file=sys.stderr)
+            for problem in problems:
+                print(f"  {problem}", file=sys.stderr)
+            return 1
+        if args.check:
+            print("Package verified; nothing changed (--check)")
+            return 0
+
+        try:
+            apply(delta, package_dir, install_dir, os.path.join(tmp_dir, "backup"))
+        except OSError as e:
+            print(f"Error: {e}; {install_dir} was left at {delta['from']['version']}", file=sys.stderr)
+            return 1
+    print(f"Updated {install_dir} to {delta['to']['version']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
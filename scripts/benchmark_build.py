@@ -0,0 +1,466 @@
+"""Benchmark the Orion Studio build offline against a local stand-in for its upstream services.
+
+A local HTTP server plays the VS Code update API, the marketplace ``extensionquery``
+endpoint and the gallery VSIX asset hosts, serving a synthetic VS Code archive (with
+VS Code Server and CLI stand-ins) and synthetic VSIX packages. The build pipeline in build_orion.py runs end to end against
+it a fixed number of times, and the per-stage medians from each run's build profile
+are reported, so pipeline changes can be compared on equal terms.
+
+Usage:
+    pixi run benchmark
+    pixi run benchmark --repeat 7 --extensions 40 --vsix-kb 4096
+    pixi run benchmark --latency-ms 80 --bandwidth-mbit 100 --output bench.json
+    pixi run benchmark --connect-ms 300   # TCP/TLS setup through a site proxy
+    pixi run benchmark --warm-cache -- --jobs 1   # arguments after -- go to build_orion.py
+
+The orion-launcher stage runs ``npm ci``, which needs the network, so it is
+replaced by an empty install unless ``--with-launcher`` is given.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import build_orion
+
+FIXTURE_VSCODE_VERSION = "1.116.0"
+FIXTURE_VSCODE_COMMIT = "f0e1d2c3b4a5968778695a4b3c2d1e0f0a1b2c3d"
+FIXTURE_PUBLISHER = "orionbench"
+VSIX_ASSET_TYPE = "Microsoft.VisualStudio.Services.VSIXPackage"
+
+
+def _payload(rng, size):
+    """Return ``size`` bytes that compress roughly 2:1, like typical extension contents."""
+    text = b"export function activate(context) { return context.subscriptions; }\n"
+    half = size // 2
+    return rng.randbytes(half) + (text * (size // len(text) + 1))[: size - half]
+
+
+def make_vsix(ext_id, version, size, dependencies, seed):
+    """Build a synthetic VSIX of roughly ``size`` bytes of extension files.
+
+    Returns:
+        The VSIX as bytes
+    """
+    rng = random.Random(seed)
+    publisher, name = ext_id.split(".", 1)
+    manifest = {
+        "name": name,
+        "publisher": publisher,
+        "version": version,
+        "engines": {"vscode": "^1.90.0"},
+        "extensionDependencies": dependencies,
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as vsix:
+        vsix.writestr("extension.vsixmanifest", f"<PackageManifest><Identity Id='{name}'/></PackageManifest>")
+        vsix.writestr("extension/package.json", json.dumps(manifest, indent=2))
+        file_size = 64 * 1024
+        for index in range(max(1, size // file_size)):
+            vsix.writestr(f"extension/dist/chunk-{index}.js", _payload(rng, min(file_size, size)))
+    return buffer.getvalue()
+
+
+def make_vscode_archive(size, seed):
+    """Build a synthetic VS Code archive in the layout the build expects on this host.
+
+    Returns:
+        ``(filename, archive bytes)``
+    """
+    rng = random.Random(seed)
+    product = json.dumps(
+        {"nameShort": "Code", "version": FIXTURE_VSCODE_VERSION, "commit": FIXTURE_VSCODE_COMMIT}
+    ).encode()
+    file_size = 256 * 1024
+    # A few identical files, as in the real node_modules, give dedupe something to do
+    shared = _payload(rng, file_size)
+    files = {f"resources/app/node_modules/pkg-{index}/index.js": shared for index in range(4)}
+    for index in range(max(1, size // file_size)):
+        files[f"resources/app/out/chunk-{index}.js"] = _payload(rng, file_size)
+    files["resources/app/product.json"] = product
+
+    buffer = io.BytesIO()
+    if platform.system() == "Darwin":
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for path, data in files.items():
+                archive.writestr(f"Visual Studio Code.app/Contents/{path.replace('resources/', 'Resources/')}", data)
+        return "vscode.zip", buffer.getvalue()
+
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for path, data in {**files, "bin/code": b"#!/bin/sh\n"}.items():
+            info = tarfile.TarInfo(f"VSCode-linux-x64/{path}")
+            info.size = len(data)
+            info.mode = 0o755 if path.startswith("bin/") else 0o644
+            archive.addfile(info, io.BytesIO(data))
+    return "vscode.tar.gz", buffer.getvalue()
+
+
+def make_remote_archives():
+    """Build small stand-ins for the VS Code Server and CLI archives of the update server.
+
+    Returns:
+        Dict mapping update-server platform ID to the archive as bytes
+    """
+    archives = {}
+    for server_platform in build_orion.REMOTE_ARCHIVES:
+        members = {"code": b"#!/bin/sh\n"}
+        if server_platform.startswith("server-"):
+            members = {f"vscode-{server_platform}/bin/code-server": b"#!/bin/sh\n"}
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for path, data in members.items():
+                info = tarfile.TarInfo(path)
+                info.size = len(data)
+                info.mode = 0o755
+                archive.addfile(info, io.BytesIO(data))
+        archives[server_platform] = buffer.getvalue()
+    return archives
+
+
+def make_fixtures(extensions, vsix_size, vscode_size, seed=0):
+    """Generate the archive, VSIXes and marketplace records served by the fixture server.
+
+    Half of the extensions (rounded up) are listed in extensions.txt; each listed
+    extension depends on one unlisted one, so resolution takes two dependency levels.
+    The first two listed extensions are also the Remote-SSH default extensions.
+    """
+    ids = [f"{FIXTURE_PUBLISHER}.ext{index:03d}" for index in range(extensions)]
+    listed = ids[: (len(ids) + 1) // 2]
+    unlisted = ids[len(listed) :]
+    dependencies = {ext_id: [unlisted[index]] if index < len(unlisted) else [] for index, ext_id in enumerate(listed)}
+
+    archive_name, archive = make_vscode_archive(vscode_size, seed)
+    vsixes = {}
+    for index, ext_id in enumerate(ids):
+        vsixes[ext_id.lower()] = make_vsix(ext_id, "1.0.0", vsix_size, dependencies.get(ext_id, []), seed + index + 1)
+    return {
+        "archive_name": archive_name,
+        "archive": archive,
+        "vsixes": vsixes,
+        "dependencies": dependencies,
+        "extensions_txt": "".join(f"{ext_id}\n" for ext_id in listed),
+        "remote_archives": make_remote_archives(),
+        "remote_extensions": listed[:2],
+    }
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the fixtures, with optional per-request latency and per-connection bandwidth.
+
+    Connections are kept alive (HTTP/1.1); ``connect_latency`` is paid once per new
+    connection, standing in for the TCP and TLS handshakes.
+    """
+
+    protocol_version = "HTTP/1.1"
+    fixtures = None
+    latency = 0.0
+    connect_latency = 0.0
+    bandwidth = None  # bytes per second, None for unlimited
+    stats = {"requests": 0, "connections": 0, "bytes": 0}
+    stats_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.connect_latency)
+        with self.stats_lock:
+            self.stats["connections"] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _base_url(self):
+        return f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+
+    def _send(self, status, body, content_type="application/octet-stream", headers=None, head=False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if head:
+            return
+        chunk_size = 64 * 1024
+        for offset in range(0, len(body), chunk_size):
+            chunk = body[offset : offset + chunk_size]
+            self.wfile.write(chunk)
+            if self.bandwidth:
+                time.sleep(len(chunk) / self.bandwidth)
+        with self.stats_lock:
+            self.stats["bytes"] += len(body)
+
+    def _send_blob(self, data, head=False):
+        etag = '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+        headers = {"Accept-Ranges": "bytes", "ETag": etag}
+        byte_range = self.headers.get("Range")
+        if byte_range and byte_range.startswith("bytes="):
+            first, _, last = byte_range[6:].partition("-")
+            first, last = int(first), int(last) if last else len(data) - 1
+            headers["Content-Range"] = f"bytes {first}-{last}/{len(data)}"
+            self._send(206, data[first : last + 1], headers=headers, head=head)
+        else:
+            self._send(200, data, headers=headers, head=head)
+
+    def _send_json(self, value):
+        body = json.dumps(value).encode()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", headers={"ETag": etag}, head=True)
+        self._send(200, body, "application/json", headers={"ETag": etag})
+
+    def _route(self, head=False):
+        time.sleep(self.latency)
+        with self.stats_lock:
+            self.stats["requests"] += 1
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        fixtures = self.fixtures
+
+        if url.path == "/api/releases/stable":
+            return self._send_json([FIXTURE_VSCODE_VERSION])
+        if parts[:2] == ["api", "versions"]:
+            # /api/versions/<version>/<platform>/stable
+            name = parts[3] if parts[3] in fixtures["remote_archives"] else fixtures["archive_name"]
+            archive = fixtures["remote_archives"].get(parts[3], fixtures["archive"])
+            return self._send_json(
+                {
+                    "url": f"{self._base_url()}/download/{name}",
+                    "name": FIXTURE_VSCODE_VERSION,
+                    "version": FIXTURE_VSCODE_COMMIT,
+                    "productVersion": FIXTURE_VSCODE_VERSION,
+                    "sha256hash": hashlib.sha256(archive).hexdigest(),
+                }
+            )
+        if parts[0] == "download":
+            return self._send_blob(fixtures["remote_archives"].get(parts[-1], fixtures["archive"]), head=head)
+        if parts[-1] == VSIX_ASSET_TYPE and "publisher" in parts:
+            # Synthetic extensions are universal: every platform-specific probe misses
+            publisher, name = parts[parts.index("publisher") + 1], parts[parts.index("extension") + 1]
+            vsix = fixtures["vsixes"].get(f"{publisher}.{name}".lower())
+            if vsix is None or "targetPlatform" in parse_qs(url.query):
+                return self._send(404, b"", head=head)
+            return self._send_blob(vsix, head=head)
+        return self._send(404, b"", head=head)
+
+    def do_HEAD(self):
+        self._route(head=True)
+
+    def do_GET(self):
+        self._route()
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        with self.stats_lock:
+            self.stats["requests"] += 1
+        if not self.path.endswith("/extensionquery"):
+            return self._send(404, b"")
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        requested = [criterion["value"] for criterion in payload["filters"][0]["criteria"]]
+        extensions = []
+        for ext_id in requested:
+            if ext_id.lower() not in self.fixtures["vsixes"]:
+                continue
+            publisher, name = ext_id.split(".", 1)
+            dependencies = self.fixtures["dependencies"].get(f"{publisher}.{name}", [])
+            source = (
+                f"{self._base_url()}/_apis/public/gallery/publisher/{publisher}/extension/{name}/1.0.0"
+                f"/assetbyname/{VSIX_ASSET_TYPE}"
+            )
+            extensions.append(
+                {
+                    "publisher": {"publisherName": publisher},
+                    "extensionName": name,
+                    "versions": [
+                        {
+                            "version": "1.0.0",
+                            "files": [{"assetType": VSIX_ASSET_TYPE, "source": source}],
+                            "properties": [
+                                {
+                                    "key": "Microsoft.VisualStudio.Code.ExtensionDependencies",
+                                    "value": ",".join(dependencies),
+                                }
+                            ],
+                        }
+                    ],
+                }
+            )
+        self._send_json({"results": [{"extensions": extensions}]})
+
+
+def start_fixture_server(fixtures, latency_ms=0, bandwidth_mbit=None, connect_ms=0):
+    """Start the fixture server on a free localhost port in a background thread.
+
+    Returns:
+        ``(server, base_url)``
+    """
+    handler = type(
+        "BoundFixtureHandler",
+        (FixtureHandler,),
+        {
+            "fixtures": fixtures,
+            "latency": latency_ms / 1000,
+            "connect_latency": connect_ms / 1000,
+            "bandwidth": bandwidth_mbit * 1_000_000 / 8 if bandwidth_mbit else None,
+            "stats": {"requests": 0, "connections": 0, "bytes": 0},
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _skip_launcher(install_dir, build=None):
+    target = build_orion.get_launcher_target_dir(install_dir)
+    os.makedirs(target, exist_ok=True)
+    print("Skipping orion-launcher build (benchmark without --with-launcher)")
+
+
+def run_build(workspace, cache_dir, base_url, build_args, log_path):
+    """Run one full build inside ``workspace`` and return its build profile."""
+    build_orion.UPDATE_SERVER_URL = base_url
+    build_orion.MARKETPLACE_URL = base_url
+    build_orion.GALLERY_ASSETS_URL = base_url
+    build_orion.CONFIG_DIR = os.path.join(workspace, "config")
+    build_orion.EXTENSIONS_LOCK = os.path.join(build_orion.CONFIG_DIR, "extensions.lock")
+    build_orion.BUILD_DIR = os.path.join(workspace, "build")
+    build_orion.BUILD_MANIFEST = os.path.join(build_orion.BUILD_DIR, "build-manifest.json")
+    build_orion.DIST_DIR = os.path.join(workspace, "dist")
+
+    with open(log_path, "a") as log, contextlib.redirect_stdout(log):
+        build_orion.main(["build", "--cache-dir", cache_dir, *build_args])
+    with open(os.path.join(build_orion.DIST_DIR, "build-profile.json")) as f:
+        return json.load(f)
+
+
+def summarize(profiles):
+    """Reduce the build profiles of all repetitions to per-stage median/min/max seconds."""
+    stages = {}
+    for profile in profiles:
+        for stage in profile["stages"]:
+            stages.setdefault(stage["name"], []).append(stage["seconds"])
+    totals = [profile["total_seconds"] for profile in profiles]
+    summary = {
+        name: {"median": statistics.median(times), "min": min(times), "max": max(times)}
+        for name, times in stages.items()
+    }
+    summary["total"] = {"median": statistics.median(totals), "min": min(totals), "max": max(totals)}
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Orion Studio build offline against local update-server and marketplace fixtures.",
+        epilog="Arguments after -- are passed to build_orion.py, e.g. -- --jobs 1 --compression zstd",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed builds to run (default: %(default)s)")
+    parser.add_argument("--extensions", type=int, default=20, help="Synthetic extensions (default: %(default)s)")
+    parser.add_argument("--vsix-kb", type=int, default=1024, help="Size of each synthetic VSIX (default: %(default)s)")
+    parser.add_argument(
+        "--vscode-mb", type=int, default=32, help="Size of the synthetic VS Code archive (default: %(default)s)"
+    )
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every request (default: none)")
+    parser.add_argument(
+        "--connect-ms", type=float, default=0, help="Delay added to every new connection (default: none)"
+    )
+    parser.add_argument(
+        "--bandwidth-mbit", type=float, help="Per-connection bandwidth limit in Mbit/s (default: unlimited)"
+    )
+    parser.add_argument(
+        "--warm-cache",
+        action="store_true",
+        help="Share one download cache across runs, primed by an untimed build (default: a cold cache per run)",
+    )
+    parser.add_argument("--with-launcher", action="store_true", help="Build the orion-launcher extension with npm")
+    parser.add_argument("--output", help="Write the configuration, every build profile and the summary as JSON")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark workspace and build logs")
+    if argv is None:
+        argv = sys.argv[1:]
+    build_args = argv[argv.index("--") + 1 :] if "--" in argv else []
+    args = parser.parse_args(argv[: argv.index("--")] if "--" in argv else argv)
+    args.build_args = build_args
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print(f"Generating fixtures: {args.extensions} VSIXes of {args.vsix_kb} KB, {args.vscode_mb} MB VS Code archive...")
+    fixtures = make_fixtures(args.extensions, args.vsix_kb * 1024, args.vscode_mb * 1024 * 1024)
+    server, base_url = start_fixture_server(fixtures, args.latency_ms, args.bandwidth_mbit, args.connect_ms)
+    print(f"Serving fixtures at {base_url}")
+
+    if not args.with_launcher:
+        build_orion.install_orion_launcher = _skip_launcher
+
+    root = tempfile.mkdtemp(prefix="orion-bench-")
+    log_path = os.path.join(root, "build.log")
+    profiles = []
+    try:
+        workspace = os.path.join(root, "workspace")
+        config_dir = os.path.join(workspace, "config")
+        os.makedirs(config_dir)
+        with open(os.path.join(build_orion.CONFIG_DIR, "settings.json")) as f:
+            settings = json.load(f)
+        settings["remote.SSH.defaultExtensions"] = fixtures["remote_extensions"]
+        with open(os.path.join(config_dir, "settings.json"), "w") as f:
+            json.dump(settings, f, indent=2)
+        with open(os.path.join(config_dir, "extensions.txt"), "w") as f:
+            f.write(fixtures["extensions_txt"])
+
+        shared_cache = os.path.join(root, "cache")
+        if args.warm_cache:
+            print("Priming the download cache (untimed)...")
+            run_build(workspace, shared_cache, base_url, args.build_args, log_path)
+
+        for run in range(args.repeat):
+            cache_dir = shared_cache if args.warm_cache else os.path.join(root, f"cache-{run}")
+            profile = run_build(workspace, cache_dir, base_url, args.build_args, log_path)
+            profiles.append(profile)
+            print(f"  Run {run + 1}/{args.repeat}: {profile['total_seconds']:.2f}s")
+            if not args.warm_cache:
+                shutil.rmtree(cache_dir)
+    finally:
+        server.shutdown()
+        if args.keep:
+            print(f"Workspace and build log kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    summary = summarize(profiles)
+    print(f"\nPer-stage seconds over {len(profiles)} runs ({'warm' if args.warm_cache else 'cold'} cache):")
+    width = max(len(name) for name in summary)
+    print(f"  {'stage':<{width}} {'median':>8} {'min':>8} {'max':>8}")
+    for name, times in summary.items():
+        print(f"  {name:<{width}} {times['median']:8.3f} {times['min']:8.3f} {times['max']:8.3f}")
+    counters = profiles[-1]["counters"]
+    print(
+        f"  Last run: {counters['http_requests']} HTTP requests over {counters['http_connections']} connections, "
+        f"{counters['net_bytes'] / (1024 * 1024):.1f} MB downloaded, "
+        f"{counters['disk_bytes'] / (1024 * 1024):.1f} MB written, peak RSS {profiles[-1]['peak_rss_mb']:.0f} MB"
+    )
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "keep")}
+        with open(args.output, "w") as f:
+            json.dump({"config": config, "summary": summary, "runs": profiles}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
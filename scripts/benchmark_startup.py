@@ -0,0 +1,147 @@
+"""Benchmark how long a Linux Orion Studio install takes to load its bundled extensions.
+
+Every sample materializes the install's data-template into a fresh portable
+directory, as the launcher does on a user's first start, and times VS Code's
+extension scan in it with ``bin/code --list-extensions --show-versions``, the
+same scan a window runs before the extension host starts. Three cases are timed:
+
+    first launch, rescan        extensions.json removed, so VS Code scans the directory
+                                and writes it (installs built before it was shipped)
+    first launch, pre-generated the extensions.json written by the build
+    warm launch                 a second start in the same directory
+
+The pre-generated case must list exactly the extensions the rescan finds;
+the benchmark fails otherwise.
+
+Usage:
+    pixi run benchmark-startup                      # dist/OrionStudio
+    pixi run benchmark-startup --runs 20 /opt/orion-studio
+    pixi run benchmark-startup --work-dir ~/tmp     # time on the home filesystem (NFS)
+
+Only the page cache is left as is: on a machine that has not read the install
+recently, the first sample of each case also pays the disk (or NFS) reads.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INSTALL_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "dist", "OrionStudio")
+
+
+def materialize(install_dir, portable_dir):
+    """Set up ``portable_dir`` from the install's data-template, as launch_orion.sh does.
+
+    Returns:
+        Seconds taken
+    """
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            os.path.join(install_dir, "materialize_data_template.sh"),
+            os.path.join(install_dir, "data-template"),
+            portable_dir,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def list_extensions(install_dir, portable_dir):
+    """Run VS Code's extension scan against ``portable_dir``.
+
+    Returns:
+        ``(seconds, listed extensions)``
+    """
+    env = dict(os.environ, VSCODE_PORTABLE=portable_dir)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [
+            os.path.join(install_dir, "bin", "code"),
+            "--user-data-dir",
+            portable_dir,
+            "--extensions-dir",
+            os.path.join(portable_dir, "extensions"),
+            "--list-extensions",
+            "--show-versions",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    return time.perf_counter() - start, sorted(result.stdout.split())
+
+
+def sample(install_dir, work_dir, pregenerated):
+    """Time a first and a second launch in a fresh portable directory.
+
+    Returns:
+        ``(materialize seconds, first launch seconds, warm launch seconds, listed extensions)``
+    """
+    portable_dir = tempfile.mkdtemp(prefix="orion-startup-", dir=work_dir)
+    try:
+        materialize_time = materialize(install_dir, portable_dir)
+        if not pregenerated:
+            os.remove(os.path.join(portable_dir, "extensions", "extensions.json"))
+        first_time, listed = list_extensions(install_dir, portable_dir)
+        warm_time, _listed = list_extensions(install_dir, portable_dir)
+        return materialize_time, first_time, warm_time, listed
+    finally:
+        shutil.rmtree(portable_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark first and warm extension loading of an install.")
+    parser.add_argument(
+        "install_dir", nargs="?", default=DEFAULT_INSTALL_DIR, help="Linux install to measure (default: %(default)s)"
+    )
+    parser.add_argument("--runs", type=int, default=10, help="Samples per case (default: %(default)s)")
+    parser.add_argument(
+        "--work-dir", help="Directory for the portable directories (default: the system temp directory)"
+    )
+    args = parser.parse_args(argv)
+
+    install_dir = os.path.abspath(args.install_dir)
+    template_manifest = os.path.join(install_dir, "data-template", "extensions", "extensions.json")
+    if not os.path.isfile(os.path.join(install_dir, "bin", "code")):
+        parser.error(f"{install_dir} is not a Linux Orion Studio install")
+    if not os.path.isfile(template_manifest):
+        parser.error(f"{install_dir} has no pre-generated extensions.json; rebuild it")
+
+    results = {}
+    listings = {}
+    for pregenerated in (False, True):
+        samples = [sample(install_dir, args.work_dir, pregenerated) for _ in range(args.runs)]
+        results[pregenerated] = [statistics.median(column) for column in list(zip(*samples, strict=True))[:3]]
+        listings[pregenerated] = samples[0][3]
+
+    rescan, pregenerated = results[False], results[True]
+    print(f"Median over {args.runs} runs ({len(listings[True])} extensions):")
+    print(f"  materialize                  {pregenerated[0] * 1000:8.0f} ms")
+    print(f"  first launch, rescan         {rescan[1] * 1000:8.0f} ms")
+    print(f"  first launch, pre-generated  {pregenerated[1] * 1000:8.0f} ms")
+    print(f"  warm launch                  {pregenerated[2] * 1000:8.0f} ms")
+    print(
+        f"  First launch / warm launch: {rescan[1] / pregenerated[2]:.2f}x rescan, "
+        f"{pregenerated[1] / pregenerated[2]:.2f}x pre-generated"
+    )
+
+    if listings[True] != listings[False]:
+        print("Error: the pre-generated extensions.json lists different extensions than a rescan:", file=sys.stderr)
+        for line in sorted(set(listings[True]) ^ set(listings[False])):
+            side = "pre-generated" if line in listings[True] else "rescan"
+            print(f"  {line} (only {side})", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
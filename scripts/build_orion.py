@@ -1,37 +1,730 @@
+import argparse
+import base64
+import contextlib
+import fcntl
+import fnmatch
+import functools
+import hashlib
+import http.client
 import json
+import lzma
 import os
 import platform
+import re
+import resource
 import shutil
 import ssl
+import stat
 import subprocess
+import sys
 import tarfile
 import tempfile
+import threading
 import time
+import tomllib
+import urllib.error
+import urllib.parse
 import urllib.request
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import cairosvg
+import cairosvg.parser
+import cairosvg.surface
 
 # Configuration
 APP_NAME = "OrionStudio"
 RESOURCES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources")
 FALLBACK_VSCODE_VERSION = "1.116.0"
 CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+EXTENSIONS_LOCK = os.path.join(CONFIG_DIR, "extensions.lock")
+PRUNE_CONFIG = os.path.join(CONFIG_DIR, "prune.txt")
 BUILD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "build")
 DIST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dist")
+BUILD_MANIFEST = os.path.join(BUILD_DIR, "build-manifest.json")
+ICON_SVG = os.path.join(RESOURCES_DIR, "icons", "orion-icon.svg")
+LAUNCHER_EXT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "extensions", "orion-launcher"
+)
+LAUNCHER_BUILD_IGNORE = ("node_modules", "out", "dist", ".git", ".vscode-test")
+# Files of the esbuild bundle that make up the installed extension, besides package.json
+LAUNCHER_BUNDLE_FILES = ("extension.js", "extension.js.map")
+# Pins the Node.js/npm toolchain the launcher is built with
+PIXI_LOCK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pixi.lock")
+# Workspace manifest; its version is the Orion Studio release version
+PIXI_TOML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pixi.toml")
+
+# Upstream endpoints; overridable so builds and benchmarks can run against a local stand-in
+UPDATE_SERVER_URL = os.environ.get("ORION_UPDATE_SERVER_URL", "https://update.code.visualstudio.com")
+MARKETPLACE_URL = os.environ.get("ORION_MARKETPLACE_URL", "https://marketplace.visualstudio.com")
+# ``{publisher}`` is substituted: every publisher has its own asset host
+GALLERY_ASSETS_URL = os.environ.get("ORION_GALLERY_ASSETS_URL", "https://{publisher}.gallery.vsassets.io")
+
+# Persistent download cache (lives outside build/ so it survives the clean step)
+CACHE_DIR = os.environ.get("ORION_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "orion-build"))
+CACHE_MAX_BYTES = int(os.environ.get("ORION_CACHE_MAX_MB", "2048")) * 1024 * 1024
+CACHE_ENABLED = True
+_cache_lock = threading.Lock()
+_url_locks = {}
+_url_locks_guard = threading.Lock()
+
+# VSIX downloads up to this size are buffered in memory instead of a temporary file
+VSIX_SPOOL_MAX_BYTES = 256 * 1024 * 1024
+_vsix_stats = {"packages": 0, "downloaded": 0, "files": 0, "extracted": 0, "cached": 0}
+_vsix_stats_lock = threading.Lock()
+
+# Files smaller than this are not worth hardlinking (tar spends a 512-byte header either way)
+DEDUPE_MIN_BYTES = 1024
+
+# Every Linux install carries a release manifest (path, SHA-256, size and mode of each
+# file); a delta update package is the difference between two of them
+RELEASE_MANIFEST_NAME = ".orion-release.json"
+RELEASE_MANIFEST_FORMAT = 1
+DELTA_FORMAT = 1
+# Stages that only package the staged install; they run after, and depend on, all others
+PACKAGING_STAGES = ("release-manifest", "package", "delta")
+
+# Archive extraction: files up to this size are read into memory and written by the
+# thread pool, larger ones are streamed to disk; at most this many files are queued
+EXTRACT_INLINE_BYTES = 1024 * 1024
+EXTRACT_QUEUE_FILES = 64
+
+# Tarball compression formats: archive suffix and default level
+COMPRESSION_FORMATS = {
+    "gzip": {"suffix": ".tar.gz", "default_level": 9},
+    "zstd": {"suffix": ".tar.zst", "default_level": 19},
+    "xz": {"suffix": ".tar.xz", "default_level": 9},
+}
+# Uncompressed bytes per independently compressed gzip member
+GZIP_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Download engine: parallel Range segments, retries with exponential backoff
+DOWNLOAD_SEGMENTS = 4
+DOWNLOAD_SEGMENT_MIN_BYTES = 8 * 1024 * 1024
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_BACKOFF = 1.0  # seconds before the first retry, doubled for each further one
+DOWNLOAD_TIMEOUT = 60
+# HTTP statuses retried besides 5xx; any other HTTP error is permanent
+RETRY_HTTP_CODES = {408, 429}
+
+# HTTP client: all traffic goes through http_request(), which keeps connections alive
+# in a pool per host and applies one TLS and proxy policy (http_proxy, https_proxy and
+# no_proxy from the environment). Certificate checks are off by default, as site
+# proxies re-sign TLS; ORION_VERIFY_TLS=1 / --verify-tls or a CA bundle turn them on
+HTTP_VERIFY_TLS = False
+HTTP_CA_BUNDLE = os.environ.get("ORION_CA_BUNDLE") or None
+HTTP_POOL_SIZE = 16  # idle connections kept per host
+HTTP_MAX_REDIRECTS = 5
+HTTP_USER_AGENT = f"Python-urllib/{sys.version_info.major}.{sys.version_info.minor}"
+_http_pools = {}
+_http_pools_lock = threading.Lock()
+_http_tls_context = None
+
+# Metadata (marketplace queries, platform VSIX probes, VS Code release lists) is cached
+# under CACHE_DIR/metadata. Responses younger than METADATA_TTL seconds are used as is;
+# older ones are revalidated with ETag/Last-Modified, and are still served for up to
+# METADATA_STALE_SECONDS when the server fails. OFFLINE builds never touch the network
+METADATA_TTL = int(os.environ.get("ORION_METADATA_TTL", "3600"))
+METADATA_STALE_SECONDS = 24 * 3600
+OFFLINE = False
+
+# Worker pool size for marketplace queries and VSIX downloads (all network-bound)
+DEFAULT_JOBS = 8
+
+# Maximum number of extensions looked up in a single marketplace extensionquery
+MARKETPLACE_BATCH_SIZE = 50
+_marketplace_records_lock = threading.Lock()
+
+# Platforms that --targets can cross-build (Linux tarballs, built on a Linux host)
+CROSS_BUILD_TARGETS = ["linux-x64", "linux-arm64"]
+
+# Notebook repository whose pixi environment --prefetch-env mirrors by default (the
+# launcher's "Reduction" workflow), and pixi's names for the build platforms
+DEFAULT_NOTEBOOK_REPO = "https://github.com/neutronimaging/python_notebooks"
+PIXI_PLATFORMS = {
+    "linux-x64": "linux-64",
+    "linux-arm64": "linux-aarch64",
+    "darwin-arm64": "osx-arm64",
+    "darwin-x64": "osx-64",
+}
+PIXI_MIRROR_DIR = "pixi-mirror"
+
+# ioctl that clones a file as a reflink on Linux (linux/fs.h)
+FICLONE = 0x40049409
+
+# VS Code Server, its CLI and the remote.SSH.defaultExtensions VSIXes, bundled in
+# <install>/remote-server for Remote-SSH hosts (the analysis cluster is linux-x64)
+REMOTE_SERVER_DIR = "remote-server"
+REMOTE_PLATFORM = "linux-x64"
+# Update-server platform IDs of the remote archives, and their file names in REMOTE_SERVER_DIR
+REMOTE_ARCHIVES = {"server-linux-x64": "vscode-server.tar.gz", "cli-alpine-x64": "vscode-cli.tar.gz"}
+REMOTE_STAGE_SCRIPTS = ["stage_remote_server.sh", "install_remote_server.sh"]
+
+# Node.js platform-arch names that extensions use for per-platform native binaries;
+# {other-platform} in config/prune.txt expands to all of them except the build target
+NODE_PLATFORMS = [
+    "alpine-arm64",
+    "alpine-x64",
+    "darwin-arm64",
+    "darwin-x64",
+    "linux-arm",
+    "linux-arm64",
+    "linux-armhf",
+    "linux-x64",
+    "win32-arm64",
+    "win32-ia32",
+    "win32-x64",
+]
+
+# Platforms recorded in config/extensions.lock by the "lock" command
+LOCK_PLATFORMS = ["darwin-arm64", "darwin-x64", "linux-x64", "linux-arm64"]
+LOCK_FORMAT_VERSION = 1
+# Update-server platform IDs of the VS Code target platforms (Intel macOS is "darwin")
+VSCODE_PLATFORMS = {
+    "darwin-arm64": "darwin-arm64",
+    "darwin-x64": "darwin",
+    "linux-x64": "linux-x64",
+    "linux-arm64": "linux-arm64",
+}
+
+# Air-gapped mirrors ("mirror" command, --mirror): VS Code archives, VSIXes and a
+# prebuilt orion-launcher in a directory tree indexed by mirror.json
+MIRROR_INDEX = "mirror.json"
+MIRROR_FORMAT = 1
+
+# Build profile: spans (stages and their sub-steps) plus build-wide counters,
+# written to dist/build-profile.json and dist/build-profile.trace.json
+PROFILE_COUNTERS = (
+    "net_bytes",
+    "http_requests",
+    "http_connections",
+    "http_reused",
+    "metadata_hits",
+    "metadata_revalidated",
+    "disk_bytes",
+    "files",
+)
+_profile = {"start": time.perf_counter(), "spans": [], "counters": dict.fromkeys(PROFILE_COUNTERS, 0)}
+_profile_lock = threading.Lock()
+# Counters of the target a thread builds for (see profile_scope()); unset outside one
+_profile_local = threading.local()
+
+
+def _set_profile_scope(counters):
+    _profile_local.counters = counters
+
+
+def profile_count(**counts):
+    """Add to the build profile counters (see PROFILE_COUNTERS), and to the thread's scope."""
+    scope = getattr(_profile_local, "counters", None)
+    with _profile_lock:
+        for name, value in counts.items():
+            _profile["counters"][name] += value
+            if scope is not None:
+                scope[name] += value
+
+
+def profile_counters():
+    """Return a snapshot of the counters of the thread's scope, or of the build-wide ones."""
+    scope = getattr(_profile_local, "counters", None)
+    with _profile_lock:
+        return dict(_profile["counters"] if scope is None else scope)
+
+
+@contextlib.contextmanager
+def profile_scope():
+    """Count everything the enclosed block does into a counter set of its own.
+
+    build_targets() runs each target in a scope, so the stage counters of
+    concurrent targets do not mix. The scope covers the calling thread and the
+    workers of pools it starts with profile_thread_pool().
+    """
+    _set_profile_scope(dict.fromkeys(PROFILE_COUNTERS, 0))
+    try:
+        yield
+    finally:
+        _set_profile_scope(None)
+
+
+def profile_thread_pool(max_workers):
+    """Return a ThreadPoolExecutor whose workers count into the calling thread's profile scope."""
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=_set_profile_scope,
+        initargs=(getattr(_profile_local, "counters", None),),
+    )
+
+
+@contextlib.contextmanager
+def profile_span(name, category="step", **args):
+    """Record the enclosed block as a timed span of the build profile.
+
+    Yields the span's ``args`` dict, so the block can attach details such as sizes.
+    Stage spans also record how much each counter grew while they ran. A build
+    runs its stages one at a time, and concurrent target builds each count in
+    their own profile_scope(), so the growth belongs to that stage.
+    """
+    before = profile_counters() if category == "stage" else None
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        span = {
+            "name": name,
+            "category": category,
+            "start": start - _profile["start"],
+            "seconds": time.perf_counter() - start,
+            "thread": threading.get_ident(),
+            "args": args,
+        }
+        if before is not None:
+            after = profile_counters()
+            span["counters"] = {counter: after[counter] - before[counter] for counter in PROFILE_COUNTERS}
+            span["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        with _profile_lock:
+            _profile["spans"].append(span)
+
+
+def write_build_profile(output_dir=None, **metadata):
+    """Write the build profile and print a per-stage summary.
+
+    Two files are written to ``output_dir`` (default: DIST_DIR):
+
+    - ``build-profile.json``: totals, one entry per stage (seconds, counter growth,
+      peak RSS, skipped or not) and per-step totals aggregated by name
+    - ``build-profile.trace.json``: every span in Chrome trace event format, for
+      ``chrome://tracing`` or https://ui.perfetto.dev
+
+    Returns:
+        Path to ``build-profile.json``
+    """
+    output_dir = output_dir or DIST_DIR
+    with _profile_lock:
+        spans = list(_profile["spans"])
+        counters = dict(_profile["counters"])
+    total = time.perf_counter() - _profile["start"]
+
+    stages = []
+    steps = {}
+    for span in spans:
+        if span["category"] == "stage":
+            stages.append(
+                {
+                    "name": span["name"],
+                    "skipped": span["args"].get("skipped", False),
+                    "seconds": round(span["seconds"], 3),
+                    "counters": span["counters"],
+                    "peak_rss_mb": span["peak_rss_mb"],
+                }
+            )
+        else:
+            step = steps.setdefault(span["name"], {"count": 0, "seconds": 0.0})
+            step["count"] += 1
+            step["seconds"] += span["seconds"]
+    for step in steps.values():
+        step["seconds"] = round(step["seconds"], 3)
+
+    profile = {
+        **metadata,
+        "total_seconds": round(total, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_child_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "counters": counters,
+        "stages": stages,
+        "steps": steps,
+    }
+
+    # Chrome trace: complete ("X") events in microseconds, threads numbered in order of appearance
+    threads = {}
+    events = []
+    for span in sorted(spans, key=lambda span: span["start"]):
+        tid = threads.setdefault(span["thread"], len(threads) + 1)
+        events.append(
+            {
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": round(span["start"] * 1e6),
+                "dur": round(span["seconds"] * 1e6),
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {**span["args"], **span.get("counters", {})},
+            }
+        )
+
+    os.makedirs(output_dir, exist_ok=True)
+    profile_path = os.path.join(output_dir, "build-profile.json")
+    with open(profile_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    with open(os.path.join(output_dir, "build-profile.trace.json"), "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    mb = 1024 * 1024
+    print(f"Build profile written to {profile_path}")
+    # Wide enough for the longest name, e.g. "linux-arm64 release-manifest" with --targets
+    width = max([len(stage["name"]) for stage in stages] + [len("total")])
+    for stage in stages:
+        if stage["skipped"]:
+            print(f"  {stage['name']:<{width}} skipped")
+            continue
+        stage_counters = stage["counters"]
+        print(
+            f"  {stage['name']:<{width}} {stage['seconds']:8.1f}s  {stage_counters['net_bytes'] / mb:8.1f} MB down  "
+            f"{stage_counters['disk_bytes'] / mb:8.1f} MB written  {stage_counters['files']:6d} files"
+        )
+    print(
+        f"  {'http':<{width}} {counters['http_requests']} requests over {counters['http_connections']} connections "
+        f"({counters['http_reused']} reused); metadata: {counters['metadata_hits']} cached, "
+        f"{counters['metadata_revalidated']} revalidated"
+    )
+    print(f"  {'total':<{width}} {total:8.1f}s  peak RSS {profile['peak_rss_mb']:.0f} MB")
+    return profile_path
+
+
+def _tls_context():
+    """Return the SSL context shared by every HTTPS connection (see HTTP_VERIFY_TLS)."""
+    global _http_tls_context
+    with _http_pools_lock:
+        if _http_tls_context is None:
+            if HTTP_VERIFY_TLS or HTTP_CA_BUNDLE:
+                _http_tls_context = ssl.create_default_context(cafile=HTTP_CA_BUNDLE)
+            else:
+                _http_tls_context = ssl.create_default_context()
+                _http_tls_context.check_hostname = False
+                _http_tls_context.verify_mode = ssl.CERT_NONE
+        return _http_tls_context
+
+
+def _http_proxy(scheme, host):
+    """Return ``(proxy host, proxy port, headers)`` for requests to ``host``, or None to connect directly."""
+    if urllib.request.proxy_bypass(host):
+        return None
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy:
+        return None
+    parsed = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    headers = {}
+    if parsed.username:
+        credentials = f"{urllib.parse.unquote(parsed.username)}:{urllib.parse.unquote(parsed.password or '')}"
+        headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode()
+    return parsed.hostname, parsed.port or 80, headers
+
+
+def _http_checkout(key, timeout):
+    """Take an idle connection to ``key`` (scheme, host, port) from the pool, or open a new one.
+
+    Returns:
+        ``(connection, reused)``
+    """
+    with _http_pools_lock:
+        idle = _http_pools.get(key)
+        conn = idle.pop() if idle else None
+    if conn:
+        conn.timeout = timeout
+        if conn.sock:
+            conn.sock.settimeout(timeout)
+        profile_count(http_reused=1)
+        return conn, True
+
+    scheme, host, port = key
+    proxy = _http_proxy(scheme, host)
+    profile_count(http_connections=1)
+    if scheme == "https":
+        if proxy:
+            # TLS to the server through a CONNECT tunnel
+            conn = http.client.HTTPSConnection(proxy[0], proxy[1], timeout=timeout, context=_tls_context())
+            conn.set_tunnel(host, port, headers=proxy[2])
+        else:
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=_tls_context())
+    else:
+        conn = http.client.HTTPConnection(*(proxy[:2] if proxy else (host, port)), timeout=timeout)
+    return conn, False
+
+
+def _http_checkin(key, conn):
+    with _http_pools_lock:
+        idle = _http_pools.setdefault(key, [])
+        if len(idle) < HTTP_POOL_SIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def close_http_pools():
+    """Close every idle pooled connection."""
+    with _http_pools_lock:
+        pools = list(_http_pools.values())
+        _http_pools.clear()
+    for idle in pools:
+        for conn in idle:
+            conn.close()
+
+
+class _PooledResponse:
+    """A response whose connection goes back to the pool once the body has been read.
+
+    Offers what the build used from ``urllib.request.urlopen()``: ``status``,
+    ``headers``, ``geturl()``, ``read()`` and use as a context manager. A gzip-encoded
+    body is decoded on the fly; the bytes received are counted as net_bytes.
+    """
+
+    def __init__(self, key, conn, response, url):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self._url = url
+        gzipped = response.headers.get("Content-Encoding", "").lower() == "gzip"
+        self._gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        self._buffer = b""
+
+    def geturl(self):
+        return self._url
+
+    def _read_raw(self, amt=None):
+        data = self._response.read(amt)
+        profile_count(net_bytes=len(data))
+        return data
+
+    def read(self, amt=None):
+        if not self._gunzip:
+            return self._read_raw(amt)
+        while amt is None or len(self._buffer) < amt:
+            chunk = self._read_raw(1024 * 1024)
+            if not chunk:
+                self._buffer += self._gunzip.flush()
+                break
+            self._buffer += self._gunzip.decompress(chunk)
+        data = self._buffer if amt is None else self._buffer[:amt]
+        self._buffer = self._buffer[len(data) :]
+        return data
+
+    def close(self):
+        if not self._conn:
+            return
+        response = self._response
+        reusable = not response.will_close
+        # Small unread bodies (redirects, errors, HEAD) are drained to keep the connection
+        if reusable and not response.isclosed():
+            if response.length is not None and response.length <= 64 * 1024:
+                try:
+                    self._read_raw()
+                except (OSError, http.client.HTTPException):
+                    reusable = False
+            else:
+                reusable = False
+        if reusable and response.isclosed():
+            _http_checkin(self._key, self._conn)
+        else:
+            self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def http_request(url, method="GET", data=None, headers=None, timeout=DOWNLOAD_TIMEOUT, compressed=False):
+    """Send a request over a pooled keep-alive connection and return the response.
+
+    Redirects are followed (the final URL is ``response.geturl()``). As with
+    ``urllib.request.urlopen()``, error statuses raise ``urllib.error.HTTPError`` and
+    connection failures ``urllib.error.URLError``. A pooled connection the server has
+    closed in the meantime is replaced transparently.
+
+    Args:
+        url: http or https URL
+        method: HTTP method
+        data: Request body
+        headers: Extra request headers
+        timeout: Socket timeout in seconds
+        compressed: Ask for a gzip-encoded body, for API responses (not for byte
+            ranges, whose offsets refer to the decoded content)
+
+    Returns:
+        A response to use as a context manager; closing it returns the connection
+        to the pool
+    """
+    if OFFLINE:
+        raise urllib.error.URLError(f"cannot fetch {url} in offline mode")
+    for _redirect in range(HTTP_MAX_REDIRECTS + 1):
+        parsed = urllib.parse.urlsplit(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+        request_headers = {"User-Agent": HTTP_USER_AGENT, **(headers or {})}
+        if compressed:
+            request_headers["Accept-Encoding"] = "gzip"
+        target = urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+        proxy = parsed.scheme == "http" and _http_proxy("http", parsed.hostname)
+        if proxy:
+            # Plain HTTP goes to the proxy itself, with the absolute URL as the target
+            target = urllib.parse.urlunsplit((*parsed[:4], ""))
+            request_headers.update(proxy[2])
+
+        profile_count(http_requests=1)
+        while True:
+            conn, reused = _http_checkout(key, timeout)
+            try:
+                conn.request(method, target, body=data, headers=request_headers)
+                response = _PooledResponse(key, conn, conn.getresponse(), url)
+                break
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if reused and isinstance(e, (ConnectionError, http.client.BadStatusLine)):
+                    continue
+                raise urllib.error.URLError(e) from e
+
+        location = response.headers.get("Location")
+        if response.status in (301, 302, 303, 307, 308) and location:
+            response.close()
+            url = urllib.parse.urljoin(url, location)
+            if response.status == 303 or (response.status in (301, 302) and method == "POST"):
+                method, data = "GET", None
+            continue
+        if response.status >= 400:
+            response.close()
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+        return response
+    raise urllib.error.URLError(f"too many redirects for {url}")
+
+
+def _metadata_path(key):
+    return os.path.join(CACHE_DIR, "metadata", hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+def fetch_metadata(url, method="GET", data=None, headers=None):
+    """Send a small API request through the metadata cache.
+
+    A cached response younger than METADATA_TTL is returned without a request; an
+    older one is revalidated with If-None-Match/If-Modified-Since. Not-found answers
+    (such as a platform VSIX probe that misses) are cached like successes. When the
+    server cannot be reached or fails, a response cached within METADATA_STALE_SECONDS
+    is returned with a warning. In OFFLINE mode only the cache is read.
+
+    Args:
+        url: API URL
+        method: HTTP method; POST bodies are part of the cache key
+        data: Request body
+        headers: Extra request headers
+
+    Returns:
+        ``(status, body)``: the HTTP status (200 or 404) and the response body as bytes
+
+    Raises:
+        urllib.error.URLError: The request failed and no usable response is cached
+    """
+    key = f"{method} {url}" + (f" {hashlib.sha256(data).hexdigest()}" if data else "")
+    path = _metadata_path(key)
+    entry = None
+    if CACHE_ENABLED:
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+    if entry and (OFFLINE or time.time() - entry["stored"] < METADATA_TTL):
+        profile_count(metadata_hits=1)
+        return entry["status"], entry["body"].encode()
+    if OFFLINE:
+        raise urllib.error.URLError(f"{url} is not in the metadata cache (offline mode)")
+
+    request_headers = dict(headers or {})
+    if entry and entry.get("etag"):
+        request_headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        request_headers["If-Modified-Since"] = entry["last_modified"]
+    try:
+        try:
+            with http_request(url, method, data, request_headers, compressed=True) as response:
+                status, body, response_headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                raise
+            status, body, response_headers = e.code, b"", e.headers
+    except (urllib.error.URLError, OSError, http.client.HTTPException) as e:
+        if entry and time.time() - entry["stored"] < METADATA_STALE_SECONDS:
+            age = (time.time() - entry["stored"]) / 60
+            print(f"  Warning: {url} failed ({e}); using the response cached {age:.0f} minutes ago")
+            return entry["status"], entry["body"].encode()
+        raise
+
+    if status == 304 and entry:
+        profile_count(metadata_revalidated=1)
+        entry["stored"] = time.time()
+    else:
+        entry = {
+            "url": url,
+            "status": status,
+            "body": body.decode(),
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "stored": time.time(),
+        }
+    if CACHE_ENABLED:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    return entry["status"], entry["body"].encode()
+
+
+def git_head(repo_url):
+    """Return the ``HEAD`` commit of ``repo_url``, cached like ``fetch_metadata`` responses.
+
+    ``git ls-remote`` runs only when the cached commit is older than METADATA_TTL, so
+    warm builds do not need the network. When it fails, a commit cached within
+    METADATA_STALE_SECONDS is returned with a warning. In OFFLINE mode only the cache
+    is read.
+
+    Raises:
+        Exception: The lookup failed and no usable commit is cached
+    """
+    path = _metadata_path(f"git ls-remote {repo_url} HEAD")
+    entry = None
+    if CACHE_ENABLED:
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+    if entry and (OFFLINE or time.time() - entry["stored"] < METADATA_TTL):
+        profile_count(metadata_hits=1)
+        return entry["commit"]
+    if OFFLINE:
+        raise Exception(f"The HEAD commit of {repo_url} is not in the metadata cache (offline mode)")
+
+    try:
+        commit = subprocess.run(
+            ["git", "ls-remote", repo_url, "HEAD"], check=True, capture_output=True, text=True
+        ).stdout.split()[0]
+    except (subprocess.CalledProcessError, IndexError) as e:
+        if entry and time.time() - entry["stored"] < METADATA_STALE_SECONDS:
+            age = (time.time() - entry["stored"]) / 60
+            print(f"  Warning: git ls-remote {repo_url} failed ({e}); using the commit cached {age:.0f} minutes ago")
+            return entry["commit"]
+        raise Exception(f"Could not look up the HEAD commit of {repo_url}") from e
+
+    if CACHE_ENABLED:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"url": repo_url, "commit": commit, "stored": time.time()}, f)
+        os.replace(tmp_path, path)
+    return commit
 
 
 def get_latest_version():
-    url = "https://update.code.visualstudio.com/api/releases/stable"
+    url = f"{UPDATE_SERVER_URL}/api/releases/stable"
     print(f"Fetching latest VS Code version from {url}...")
     try:
-        # Bypass SSL verification for simplicity
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
-
-        with urllib.request.urlopen(url, context=ctx) as response:
-            data = json.loads(response.read().decode())
+        with profile_span("version lookup"):
+            _status, body = fetch_metadata(url)
+            data = json.loads(body.decode())
             if isinstance(data, list) and len(data) > 0:
                 version = data[0]
                 print(f"Detected latest VS Code version: {version}")
@@ -45,48 +738,646 @@ def get_latest_version():
         return FALLBACK_VSCODE_VERSION
 
 
-def get_download_url():
-    version = get_latest_version()
+def get_vscode_platform():
+    """Return the update-server platform ID of the build host (``darwin`` is Intel macOS)."""
     system = platform.system()
     machine = platform.machine()
 
     if system == "Darwin":
         if machine == "arm64":
-            return f"https://update.code.visualstudio.com/{version}/darwin-arm64/stable"
+            return "darwin-arm64"
         else:
-            return f"https://update.code.visualstudio.com/{version}/darwin/stable"
+            return "darwin"
     elif system == "Linux":
         if machine == "x86_64":
-            return f"https://update.code.visualstudio.com/{version}/linux-x64/stable"
+            return "linux-x64"
         elif machine == "aarch64":
-            return f"https://update.code.visualstudio.com/{version}/linux-arm64/stable"
+            return "linux-arm64"
 
     raise Exception(f"Unsupported platform: {system} {machine}")
 
 
-def download_file(url, dest):
-    print(f"Downloading VS Code from {url}...")
-    # Bypass SSL verification for simplicity in some environments
-    ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
+def get_download_url(version=None, vscode_platform=None):
+    version = version or get_latest_version()
+    return f"{UPDATE_SERVER_URL}/{version}/{vscode_platform or get_vscode_platform()}/stable"
 
-    with urllib.request.urlopen(url, context=ctx) as response, open(dest, "wb") as out_file:
-        shutil.copyfileobj(response, out_file)
 
+def get_release_info(version, vscode_platform=None):
+    """Return the update API's metadata for a VS Code release.
 
-def extract_file(filepath, dest_dir):
-    print(f"Extracting {filepath} to {dest_dir}...")
-    if filepath.endswith(".zip"):
-        # Use system unzip on macOS to preserve permissions and symlinks
-        if platform.system() == "Darwin":
-            subprocess.run(["unzip", "-q", filepath, "-d", dest_dir], check=True)
+    ``vscode_platform`` is an update-server platform ID such as ``linux-arm64``
+    (default: the build host's). The result includes the archive ``url`` and its
+    ``sha256hash``; None if the API cannot be reached, in which case the archive is
+    downloaded unverified.
+    """
+    url = f"{UPDATE_SERVER_URL}/api/versions/{version}/{vscode_platform or get_vscode_platform()}/stable"
+    try:
+        with profile_span("release lookup"):
+            _status, body = fetch_metadata(url)
+            info = json.loads(body.decode())
+        if not info.get("url") or not info.get("sha256hash"):
+            raise Exception("Invalid API response format")
+        return info
+    except Exception as e:
+        print(f"Warning: Could not fetch release metadata for VS Code {version}: {e}")
+        return None
+
+
+def sha256_file(path):
+    """Return the hex SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_index_path():
+    return os.path.join(CACHE_DIR, "index.json")
+
+
+@contextlib.contextmanager
+def _cache_index_lock():
+    """Hold the download cache index exclusively, across threads and across processes.
+
+    Concurrent builds may share CACHE_DIR; a file lock around every read-modify-write
+    of the index keeps them from losing each other's entries or evicting blobs
+    another build has just added.
+    """
+    with _cache_lock:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(os.path.join(CACHE_DIR, "index.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_cache_index():
+    try:
+        with open(_cache_index_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache_index(index):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, _cache_index_path())
+
+
+def _cache_blob_path(digest):
+    return os.path.join(CACHE_DIR, "blobs", digest[:2], digest)
+
+
+def _cache_entry(digest, blob_path):
+    """Return a fresh index entry for the blob at ``blob_path``, recording its size and mtime."""
+    st = os.stat(blob_path)
+    return {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "last_used": time.time()}
+
+
+def _blob_valid(blob_path, entry):
+    """Check a cached blob against its index ``entry``.
+
+    Blobs are named by their SHA-256, so one whose size and mtime still match the
+    index is trusted as is. Only a blob changed since it was recorded (or recorded
+    before mtimes were) is re-hashed.
+    """
+    try:
+        st = os.stat(blob_path)
+    except OSError:
+        return False
+    if st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns"):
+        return True
+    return sha256_file(blob_path) == entry["sha256"]
+
+
+def cache_lookup(key):
+    """Return the path of the cached blob for ``key``, or None on a miss.
+
+    A blob that is missing or fails _blob_valid() is dropped from the index and
+    reported as a miss.
+    """
+    if not CACHE_ENABLED:
+        return None
+
+    with _cache_index_lock():
+        entry = _load_cache_index().get(key)
+    if not entry:
+        return None
+
+    blob_path = _cache_blob_path(entry["sha256"])
+    valid = _blob_valid(blob_path, entry)
+
+    with _cache_index_lock():
+        index = _load_cache_index()
+        if not valid:
+            print(f"  Cache entry for {key} failed verification, discarding")
+            index.pop(key, None)
+            if os.path.exists(blob_path):
+                os.remove(blob_path)
+        elif key in index:
+            index[key] = _cache_entry(entry["sha256"], blob_path)
+        _save_cache_index(index)
+    return blob_path if valid else None
+
+
+def cache_store(key, src_path, digest=None):
+    """Move a downloaded file into the cache under ``key`` and return the blob path.
+
+    ``digest`` skips re-hashing when the caller already hashed the content.
+    """
+    digest = digest or sha256_file(src_path)
+    blob_path = _cache_blob_path(digest)
+
+    with _cache_index_lock():
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if os.path.exists(blob_path):
+            os.remove(src_path)  # Same content already cached under another key
         else:
+            os.replace(src_path, blob_path)
+
+        index = _load_cache_index()
+        index[key] = _cache_entry(digest, blob_path)
+        evict_cache(index)
+        _save_cache_index(index)
+    return blob_path
+
+
+def evict_cache(index, max_bytes=None):
+    """Evict least-recently-used blobs until the cache fits in ``max_bytes``.
+
+    Modifies ``index`` in place; the caller is responsible for saving it.
+    """
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+
+    # Several keys may share one blob, so account by digest
+    blobs = {}
+    for key, entry in index.items():
+        blob = blobs.setdefault(entry["sha256"], {"size": entry["size"], "last_used": 0, "keys": []})
+        blob["last_used"] = max(blob["last_used"], entry["last_used"])
+        blob["keys"].append(key)
+
+    total = sum(blob["size"] for blob in blobs.values())
+    for digest, blob in sorted(blobs.items(), key=lambda item: item[1]["last_used"]):
+        if total <= max_bytes:
+            break
+        print(f"  Evicting {digest[:12]} ({blob['size'] / (1024 * 1024):.1f} MB) from download cache")
+        for key in blob["keys"]:
+            del index[key]
+        blob_path = _cache_blob_path(digest)
+        if os.path.exists(blob_path):
+            os.remove(blob_path)
+        total -= blob["size"]
+
+
+def _cache_get(key, sha256=None):
+    """Return a verified cached blob for ``key`` (or for digest ``sha256``), or None."""
+    if sha256 and CACHE_ENABLED:
+        blob_path = _cache_blob_path(sha256)
+        with _cache_index_lock():
+            index = _load_cache_index()
+        # Any key recording this digest knows the blob's size and mtime
+        known = next((entry for entry in index.values() if entry["sha256"] == sha256), {"sha256": sha256})
+        if _blob_valid(blob_path, known):
+            with _cache_index_lock():
+                index = _load_cache_index()
+                index[key] = _cache_entry(sha256, blob_path)
+                _save_cache_index(index)
+            return blob_path
+
+    cached = cache_lookup(key)
+    if cached and (not sha256 or os.path.basename(cached) == sha256):
+        return cached
+    return None
+
+
+def _url_lock(url):
+    """Return the lock that serializes downloads of one URL (or builds of one cache key) across threads."""
+    with _url_locks_guard:
+        return _url_locks.setdefault(url, threading.Lock())
+
+
+def fetch_to_cache(url, key=None, sha256=None):
+    """Return a local path holding the content of ``url``, downloading only on a cache miss.
+
+    Args:
+        url: URL to download
+        key: Cache key; defaults to the URL, which already embeds the version for
+            both VS Code archives and VSIX packages
+        sha256: Expected SHA-256 of the content. When given, a blob with that digest is
+            reused regardless of key, and a download with a different digest is rejected.
+
+    Returns:
+        Path to the cached blob, or to a file under BUILD_DIR when caching is disabled
+    """
+    key = key or url
+    # Concurrent fetches of one URL share its partial file: the first downloads it,
+    # the others wait and then find it in the cache
+    with _url_lock(url):
+        return _fetch_to_cache(url, key, sha256)
+
+
+def _fetch_to_cache(url, key, sha256):
+    cached = _cache_get(key, sha256)
+    if cached:
+        print(f"  Using cached copy of {url}")
+        return cached
+    if OFFLINE:
+        raise urllib.error.URLError(f"{url} is not in the download cache (offline mode)")
+
+    # Partial downloads get a name derived from the URL so an interrupted transfer
+    # resumes on the next attempt, even from a later build
+    staging_dir = os.path.join(CACHE_DIR, "tmp") if CACHE_ENABLED else BUILD_DIR
+    os.makedirs(staging_dir, exist_ok=True)
+    tmp_path = os.path.join(staging_dir, hashlib.sha256(url.encode()).hexdigest()[:32] + ".part")
+    download_resumable(url, tmp_path)
+    if sha256:
+        actual = sha256_file(tmp_path)
+        if actual != sha256:
+            os.remove(tmp_path)
+            raise ValueError(f"SHA-256 mismatch for {url}: expected {sha256}, got {actual}")
+
+    if not CACHE_ENABLED:
+        return tmp_path
+    return cache_store(key, tmp_path)
+
+
+def _probe_download(url):
+    """HEAD ``url`` and return ``(final_url, size, validator, accepts_ranges)``.
+
+    Redirects are resolved once here so segment requests go straight to the CDN.
+    Anything unknown is returned as None/False, which selects a single-stream download.
+    """
+    try:
+        with http_request(url, method="HEAD") as response:
+            length = response.headers.get("Content-Length")
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+            return response.geturl(), int(length) if length else None, validator, accepts_ranges
+    except (urllib.error.URLError, OSError, ValueError):
+        return url, None, None, False
+
+
+def _retryable(error):
+    """Return whether a failed download is worth retrying.
+
+    Connection errors and timeouts are; HTTP errors only when the server may
+    answer differently later (408, 429 and 5xx). A 404, 403 or 410 fails at once.
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in RETRY_HTTP_CODES or error.code >= 500
+    return True
+
+
+def download_resumable(url, dest, segments=None, retries=None):
+    """Download ``url`` to ``dest`` with HTTP Range resume, parallel segments and retries.
+
+    When the server reports a size and accepts byte ranges, the file is split into
+    up to ``segments`` parts fetched concurrently; each part retries with exponential
+    backoff and resumes from its last received byte. Progress is recorded in
+    ``dest + ".json"`` so a download interrupted in one build resumes in the next,
+    as long as the server still reports the same size and ETag/Last-Modified.
+    Servers without Range support get a plain single-stream download with retries.
+
+    Returns:
+        Number of bytes transferred over the network
+    """
+    segments = segments or DOWNLOAD_SEGMENTS
+    retries = DOWNLOAD_RETRIES if retries is None else retries
+
+    final_url, size, validator, accepts_ranges = _probe_download(url)
+    state_path = dest + ".json"
+    mb = 1024 * 1024
+
+    progress = {"done": 0, "fetched": 0, "reported": 0, "saved": 0.0}
+    progress_lock = threading.Lock()
+    start_time = time.perf_counter()
+
+    def report(count, save_state=False):
+        profile_count(disk_bytes=count)
+        with progress_lock:
+            progress["done"] += count
+            progress["fetched"] += count
+            now = time.perf_counter()
+            if size and progress["done"] * 10 // size > progress["reported"]:
+                progress["reported"] = progress["done"] * 10 // size
+                rate = progress["fetched"] / mb / max(now - start_time, 1e-6)
+                print(f"  {progress['done'] * 100 // size}% of {size / mb:.1f} MB ({rate:.1f} MB/s)")
+            if save_state and now - progress["saved"] > 1:
+                progress["saved"] = now
+                _save_download_state(state_path, state)
+
+    def with_retries(label, func):
+        for attempt in range(retries + 1):
+            try:
+                return func()
+            except (urllib.error.URLError, OSError, http.client.HTTPException) as e:
+                if attempt == retries or not _retryable(e):
+                    raise
+                delay = DOWNLOAD_BACKOFF * 2**attempt
+                print(f"  {label} failed ({e}), retry {attempt + 1}/{retries} in {delay:.0f}s...")
+                time.sleep(delay)
+
+    if not (size and accepts_ranges):
+        # No Range support: stream the whole file, restarting from scratch on failure
+        def fetch_whole():
+            progress["done"] = 0
+            with http_request(final_url) as response:
+                with open(dest, "wb") as f:
+                    for chunk in iter(lambda: response.read(1024 * 1024), b""):
+                        f.write(chunk)
+                        report(len(chunk))
+
+        with_retries("Download", fetch_whole)
+        return progress["fetched"]
+
+    state = _load_download_state(state_path)
+    if not (
+        state
+        and state.get("url") == url
+        and state.get("size") == size
+        and state.get("validator") == validator
+        and os.path.exists(dest)
+        and os.path.getsize(dest) == size
+    ):
+        count = max(1, min(segments, size // DOWNLOAD_SEGMENT_MIN_BYTES))
+        bounds = [size * i // count for i in range(count + 1)]
+        state = {
+            "url": url,
+            "size": size,
+            "validator": validator,
+            "segments": [[bounds[i], bounds[i + 1] - 1, 0] for i in range(count)],
+        }
+        with open(dest, "wb") as f:
+            f.truncate(size)
+    else:
+        resumed = sum(segment[2] for segment in state["segments"])
+        print(f"  Resuming download at {resumed / mb:.1f} of {size / mb:.1f} MB")
+        progress["done"] = resumed
+
+    def fetch_segment(index):
+        segment = state["segments"][index]  # [first byte, last byte, bytes received]
+
+        def fetch():
+            position = segment[0] + segment[2]
+            if position > segment[1]:
+                return
+            with http_request(final_url, headers={"Range": f"bytes={position}-{segment[1]}"}) as response:
+                if response.status != 206:
+                    raise urllib.error.URLError(f"expected 206 Partial Content, got {response.status}")
+                # Unbuffered, so every recorded byte has reached the OS before it is counted
+                with open(dest, "r+b", buffering=0) as f:
+                    f.seek(position)
+                    remaining = segment[1] - position + 1
+                    while remaining > 0:
+                        chunk = response.read(min(1024 * 1024, remaining))
+                        if not chunk:
+                            raise http.client.IncompleteRead(b"", remaining)
+                        f.write(chunk)
+                        segment[2] += len(chunk)
+                        remaining -= len(chunk)
+                        report(len(chunk), save_state=True)
+
+        with_retries(f"Segment {index + 1}/{len(state['segments'])}", fetch)
+
+    try:
+        with profile_thread_pool(max_workers=len(state["segments"])) as pool:
+            list(pool.map(fetch_segment, range(len(state["segments"]))))
+    except BaseException:
+        _save_download_state(state_path, state)
+        raise
+
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"  Downloaded {progress['fetched'] / mb:.1f} MB in {elapsed:.1f}s "
+        f"({progress['fetched'] / mb / max(elapsed, 1e-6):.1f} MB/s, {len(state['segments'])} segments)"
+    )
+    return progress["fetched"]
+
+
+def _load_download_state(state_path):
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_download_state(state_path, state):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def get_target_platform():
+    """Return the VS Code target platform (e.g. ``linux-x64``) of the build host, or None."""
+    system = platform.system()
+    machine = platform.machine()
+    if system == "Darwin":
+        return "darwin-arm64" if machine == "arm64" else "darwin-x64"
+    elif system == "Linux":
+        return "linux-arm64" if machine == "aarch64" else "linux-x64"
+    return None
+
+
+def download_file(url, dest, sha256=None, label="VS Code"):
+    print(f"Downloading {label} from {url}...")
+    local_path = _file_url_path(url)
+    if local_path:
+        # An archive in a mirror on local disk is copied directly, not through the cache
+        if sha256 and sha256_file(local_path) != sha256:
+            raise ValueError(f"SHA-256 mismatch for {local_path}")
+        shutil.copyfile(local_path, dest)
+        profile_count(disk_bytes=os.path.getsize(dest), files=1)
+        return
+    with profile_span("fetch archive", url=url):
+        path = fetch_to_cache(url, sha256=sha256)
+    if CACHE_ENABLED:
+        with profile_span("copy archive from cache"):
+            shutil.copyfile(path, dest)
+        profile_count(disk_bytes=os.path.getsize(dest), files=1)
+    else:
+        os.replace(path, dest)
+
+
+def extract_file(filepath, dest_dir, strip_components=0, jobs=None):
+    """Extract a VS Code archive into ``dest_dir``.
+
+    Tarballs are decompressed as a stream while a thread pool writes the files, so
+    decompression and disk writes overlap; modes, mtimes, symlinks and hardlinks are
+    preserved. Zips are extracted with ``unzip`` on macOS (which keeps permissions
+    and symlinks) and with zipfile elsewhere.
+
+    Args:
+        filepath: Archive to extract (.tar.gz or .zip)
+        dest_dir: Existing directory to extract into
+        strip_components: Leading path components to drop from tarball members, like
+            ``tar --strip-components``; 1 extracts the contents of the archive's single
+            top-level directory straight into ``dest_dir``
+        jobs: File writer threads (default: all CPUs)
+    """
+    print(f"Extracting {filepath} to {dest_dir}...")
+    start = time.perf_counter()
+    with profile_span("extract archive", archive=os.path.basename(filepath)) as span:
+        if filepath.endswith(".zip"):
             with zipfile.ZipFile(filepath, "r") as zip_ref:
-                zip_ref.extractall(dest_dir)
-    elif filepath.endswith(".tar.gz"):
-        with tarfile.open(filepath, "r:gz") as tar_ref:
-            tar_ref.extractall(dest_dir)
+                sizes = [member.file_size for member in zip_ref.infolist() if not member.is_dir()]
+            # Use system unzip on macOS to preserve permissions and symlinks
+            if platform.system() == "Darwin":
+                subprocess.run(["unzip", "-q", filepath, "-d", dest_dir], check=True)
+            else:
+                with zipfile.ZipFile(filepath, "r") as zip_ref:
+                    zip_ref.extractall(dest_dir)
+        elif filepath.endswith(".tar.gz"):
+            sizes = _extract_tar_stream(filepath, dest_dir, strip_components, jobs or os.cpu_count() or 1)
+        else:
+            sizes = []
+        elapsed = time.perf_counter() - start
+        mb_per_s = sum(sizes) / (1024 * 1024) / max(elapsed, 1e-6)
+        span.update(files=len(sizes), bytes=sum(sizes), mb_per_s=round(mb_per_s, 1))
+        profile_count(disk_bytes=sum(sizes), files=len(sizes))
+    print(
+        f"  Extracted {len(sizes)} files ({sum(sizes) / (1024 * 1024):.1f} MB) in {elapsed:.1f}s ({mb_per_s:.1f} MB/s)"
+    )
+
+
+def _open_extracted_file(path):
+    # O_NOFOLLOW: a symlink extracted to the same path must not redirect the write
+    return open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600), "wb")
+
+
+def _write_extracted_file(path, data, mode, mtime):
+    with _open_extracted_file(path) as f:
+        f.write(data)
+        os.fchmod(f.fileno(), mode)
+        f.flush()
+        os.utime(f.fileno(), (mtime, mtime))
+
+
+def _extract_tar_stream(filepath, dest_dir, strip_components, jobs):
+    """Extract a gzip tarball in one sequential pass, writing small files on ``jobs`` threads.
+
+    Decompression runs in a ``gzip -dc`` child process when gzip is installed, so it
+    proceeds on another core while this process parses members and writes files.
+    Members are checked like tarfile's data filter: an archive whose members or link
+    targets would end up outside ``dest_dir`` is refused, and files are never written
+    through an existing link.
+
+    Returns:
+        List of the sizes of the regular files written
+    """
+    dest_root = os.path.realpath(dest_dir)
+    sizes = []
+    directories = []
+    hardlinks = []
+    futures = []
+    parents = {(): dest_root}
+    # Caps the buffered file contents at EXTRACT_QUEUE_FILES * EXTRACT_INLINE_BYTES
+    slots = threading.BoundedSemaphore(EXTRACT_QUEUE_FILES)
+
+    def target_path(name):
+        parts = tuple(part for part in name.split("/") if part not in ("", "."))[strip_components:]
+        if not parts:
+            return None
+        # Resolve (and create) the parent only: the member itself may be a symlink
+        parent = parents.get(parts[:-1])
+        if parent is None:
+            parent = os.path.realpath(os.path.join(dest_root, *parts[:-1]))
+            if os.path.commonpath([dest_root, parent]) != dest_root:
+                raise Exception(f"Refusing to extract {name!r} outside {dest_dir}")
+            os.makedirs(parent, exist_ok=True)
+            parents[parts[:-1]] = parent
+        if parts[-1] == "..":
+            raise Exception(f"Refusing to extract {name!r} outside {dest_dir}")
+        return os.path.join(parent, parts[-1])
+
+    def check_inside(name, path):
+        if os.path.commonpath([dest_root, os.path.realpath(path)]) != dest_root:
+            raise Exception(f"Refusing to extract {name!r}: its link target is outside {dest_dir}")
+
+    def write(path, data, member):
+        if jobs == 1:
+            _write_extracted_file(path, data, member.mode, member.mtime)
+            return
+        slots.acquire()
+        future = pool.submit(_write_extracted_file, path, data, member.mode, member.mtime)
+        future.add_done_callback(lambda _future: slots.release())
+        futures.append(future)
+
+    gzip_command = shutil.which("gzip")
+    with contextlib.ExitStack() as stack:
+        pool = stack.enter_context(profile_thread_pool(max_workers=jobs))
+        if gzip_command:
+            proc = stack.enter_context(subprocess.Popen([gzip_command, "-dc", filepath], stdout=subprocess.PIPE))
+            tar = stack.enter_context(tarfile.open(fileobj=proc.stdout, mode="r|"))
+        else:
+            tar = stack.enter_context(tarfile.open(filepath, "r|gz"))
+
+        for member in tar:
+            path = target_path(member.name)
+            if path is None:
+                continue
+            if member.isdir():
+                os.makedirs(path, exist_ok=True)
+                directories.append((path, member))
+            elif member.issym():
+                # Like tarfile's data filter: no absolute links, none that leave dest_dir
+                if os.path.isabs(member.linkname):
+                    raise Exception(f"Refusing to extract {member.name!r}: it links to an absolute path")
+                check_inside(member.name, os.path.join(os.path.dirname(path), member.linkname))
+                if os.path.lexists(path):
+                    os.remove(path)
+                os.symlink(member.linkname, path)
+            elif member.islnk():
+                # The link target may still be queued; link once everything is written
+                link_target = target_path(member.linkname)
+                if link_target is None:
+                    raise Exception(f"Refusing to extract {member.name!r}: its link target is outside {dest_dir}")
+                hardlinks.append((member.name, path, link_target))
+            elif member.isfile():
+                sizes.append(member.size)
+                source = tar.extractfile(member)
+                if os.path.islink(path):
+                    os.remove(path)
+                if member.size > EXTRACT_INLINE_BYTES:
+                    # Large files are streamed to disk instead of being held in memory
+                    with _open_extracted_file(path) as f:
+                        shutil.copyfileobj(source, f, 1024 * 1024)
+                        os.fchmod(f.fileno(), member.mode)
+                        f.flush()
+                        os.utime(f.fileno(), (member.mtime, member.mtime))
+                else:
+                    write(path, source.read(), member)
+        if gzip_command:
+            # Drain the zero padding after the end-of-archive marker, so gzip exits cleanly
+            while proc.stdout.read(1024 * 1024):
+                pass
+        for future in futures:
+            future.result()
+    if gzip_command and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, [gzip_command, "-dc", filepath])
+
+    for name, path, link_target in hardlinks:
+        # Checked now that every symlink exists: a hardlink made through one that
+        # leaves dest_dir would link to the file outside it
+        check_inside(name, link_target)
+        if os.path.lexists(path):
+            os.remove(path)
+        os.link(link_target, path, follow_symlinks=False)
+    # Directory modes and mtimes last: writing their contents would change them
+    for path, member in reversed(directories):
+        os.chmod(path, member.mode)
+        os.utime(path, (member.mtime, member.mtime))
+    return sizes
 
 
 def clear_quarantine(app_path):
@@ -98,6 +1389,46 @@ def clear_quarantine(app_path):
             print(f"Warning: Failed to clear quarantine: {e}")
 
 
+def _render_icon(tree, size, output_path):
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        cairosvg.surface.PNGSurface(tree, f, 96, output_width=size, output_height=size).finish()
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def render_icon_pngs(svg_path, sizes):
+    """Rasterize ``svg_path`` to square PNGs, reusing cached renders.
+
+    PNGs are cached under the download cache, keyed by the SVG's SHA-256 and the
+    size, so an unchanged icon costs nothing on rebuild and each size is rendered
+    once however many icon layouts use it. Missing sizes are rendered one after
+    another from a single parse of the SVG; for a handful of small PNGs that is
+    faster than starting worker processes.
+
+    Returns:
+        Dict mapping each size to the path of its PNG
+    """
+    with open(svg_path, "rb") as f:
+        svg_bytes = f.read()
+    digest = hashlib.sha256(svg_bytes).hexdigest()
+    cache_root = CACHE_DIR if CACHE_ENABLED else BUILD_DIR
+    icon_dir = os.path.join(cache_root, "icons", digest[:32])
+    os.makedirs(icon_dir, exist_ok=True)
+
+    rendered = {size: os.path.join(icon_dir, f"{size}.png") for size in sorted(set(sizes))}
+    missing = [size for size, path in rendered.items() if not os.path.exists(path)]
+    if missing:
+        print(f"  Rendering {len(missing)} icon sizes ({', '.join(map(str, missing))} px)...")
+        with profile_span("render icons", sizes=missing):
+            tree = cairosvg.parser.Tree(bytestring=svg_bytes)
+            for size in missing:
+                _render_icon(tree, size, rendered[size])
+    else:
+        print("  Using cached icon renders")
+    return rendered
+
+
 def generate_icons(output_dir):
     """Generate platform-specific icons from SVG source.
 
@@ -107,7 +1438,7 @@ def generate_icons(output_dir):
     Returns:
         Path to the generated icon file (icns on macOS, png on Linux)
     """
-    svg_path = os.path.join(RESOURCES_DIR, "icons", "orion-icon.svg")
+    svg_path = ICON_SVG
     if not os.path.exists(svg_path):
         print(f"Warning: Icon source not found at {svg_path}")
         return None
@@ -135,9 +1466,9 @@ def generate_icons(output_dir):
                 (1024, "icon_512x512@2x.png"),
             ]
 
+            rendered = render_icon_pngs(svg_path, {size for size, _filename in sizes})
             for size, filename in sizes:
-                output_path = os.path.join(iconset_path, filename)
-                cairosvg.svg2png(url=svg_path, write_to=output_path, output_width=size, output_height=size)
+                shutil.copyfile(rendered[size], os.path.join(iconset_path, filename))
 
             # Convert iconset to icns using iconutil
             icns_path = os.path.join(output_dir, "AppIcon.icns")
@@ -152,19 +1483,253 @@ def generate_icons(output_dir):
         icons_dir = os.path.join(output_dir, "icons")
         os.makedirs(icons_dir, exist_ok=True)
 
+        rendered = render_icon_pngs(svg_path, icon_sizes)
         for size in icon_sizes:
-            output_path = os.path.join(icons_dir, f"orion-studio-{size}.png")
-            cairosvg.svg2png(url=svg_path, write_to=output_path, output_width=size, output_height=size)
+            shutil.copyfile(rendered[size], os.path.join(icons_dir, f"orion-studio-{size}.png"))
 
         # Also create a default icon.png at 256px
         default_icon = os.path.join(output_dir, "orion-studio.png")
-        cairosvg.svg2png(url=svg_path, write_to=default_icon, output_width=256, output_height=256)
+        shutil.copyfile(rendered[256], default_icon)
         print(f"  Created icons in {icons_dir}")
         return default_icon
 
     return None
 
 
+def dedupe_files(roots, min_size=None, jobs=None):
+    """Replace identical files under ``roots`` with hardlinks to a single copy.
+
+    Files are grouped by size and permission bits first, so only size collisions
+    are hashed. tar stores the duplicates as hard links, so each identical payload
+    is compressed and downloaded once.
+
+    Args:
+        roots: Directories to scan; they must live on one filesystem to be linked
+        min_size: Ignore files smaller than this many bytes (default: DEDUPE_MIN_BYTES)
+        jobs: Hashing threads (default: all CPUs)
+
+    Returns:
+        Number of bytes saved
+    """
+    min_size = DEDUPE_MIN_BYTES if min_size is None else min_size
+    print(f"Deduplicating files in {', '.join(roots)}...")
+
+    candidates = {}
+    seen_inodes = set()
+    for root in roots:
+        for dirpath, _dirs, files in os.walk(root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                st = os.lstat(path)
+                if not stat.S_ISREG(st.st_mode) or st.st_size < min_size:
+                    continue
+                if (st.st_dev, st.st_ino) in seen_inodes:
+                    continue  # Already a hardlink to a file we have seen
+                seen_inodes.add((st.st_dev, st.st_ino))
+                candidates.setdefault((st.st_size, stat.S_IMODE(st.st_mode), st.st_dev), []).append(path)
+
+    to_hash = sorted(path for paths in candidates.values() if len(paths) > 1 for path in paths)
+    with (
+        profile_span("hash duplicate candidates", files=len(to_hash)),
+        profile_thread_pool(max_workers=jobs or os.cpu_count() or 1) as pool,
+    ):
+        digests = dict(zip(to_hash, pool.map(sha256_file, to_hash), strict=True))
+
+    groups = {}
+    for path in to_hash:
+        st = os.lstat(path)
+        groups.setdefault((st.st_size, stat.S_IMODE(st.st_mode), st.st_dev, digests[path]), []).append(path)
+
+    saved = 0
+    linked = 0
+    for (size, _mode, _dev, _digest), paths in groups.items():
+        keep = paths[0]
+        for duplicate in paths[1:]:
+            tmp_path = duplicate + ".dedupe-tmp"
+            os.link(keep, tmp_path)
+            os.replace(tmp_path, duplicate)
+            saved += size
+            linked += 1
+
+    print(f"  Hardlinked {linked} duplicate files, saving {saved / (1024 * 1024):.1f} MB")
+    return saved
+
+
+def read_prune_rules(config_path, target_platform):
+    """Parse config/prune.txt into a list of ``(scope, pattern, keep)`` rules.
+
+    ``scope`` is None for rules that apply to every extension, a lower-cased
+    extension ID, or ``"vscode"``. Rules limited to other operating systems with
+    ``scope (os, ...):`` are dropped. ``{other-platform}``, ``{other-os}`` and
+    ``{package}`` are expanded for ``target_platform``, so one line may yield
+    several rules.
+    """
+    target_os = target_platform.split("-")[0]
+    expansions = {
+        "{other-platform}": [name for name in NODE_PLATFORMS if name != target_platform],
+        "{other-os}": [name for name in ("darwin", "linux", "win32") if name != target_os],
+        # A node module directory: "name" or "@scope/name"
+        "{package}": ["[!@]*", "@*/*"],
+    }
+    rules = []
+    with open(config_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            scope = None
+            if ": " in line:
+                scope, line = (part.strip() for part in line.split(": ", 1))
+                limited = re.fullmatch(r"(.*?)\s*\(([^)]*)\)", scope)
+                if limited:
+                    scope = limited.group(1)
+                    if target_os not in (name.strip() for name in limited.group(2).split(",")):
+                        continue
+                scope = scope.lower() or None
+            keep = line.startswith("!")
+            patterns = [line.lstrip("!")]
+            for placeholder, values in expansions.items():
+                patterns = (
+                    [p.replace(placeholder, v) for p in patterns for v in values] if placeholder in line else patterns
+                )
+            rules.extend((scope, pattern, keep) for pattern in patterns)
+    return rules
+
+
+@functools.cache
+def _prune_regex(pattern):
+    """Compile a prune.txt glob that contains a "/" into an anchored regular expression.
+
+    ``*``, ``?`` and ``[...]`` stay within one path component; ``**/`` matches any
+    number of directories (including none) and ``**`` anything.
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end = pattern.index("]", i + 2)
+            chars = pattern[i + 1 : end].replace("\\", "\\\\")
+            parts.append(f"[^/{chars[1:]}]" if chars.startswith("!") else f"[{chars}]")
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(parts))
+
+
+def _prune_match(rel_path, pattern, is_dir):
+    """Match a path relative to the pruned root against one prune.txt glob."""
+    if pattern.endswith("/"):
+        if not is_dir:
+            return False
+        pattern = pattern.rstrip("/")
+    if "/" in pattern:
+        return _prune_regex(pattern).fullmatch(rel_path) is not None
+    return fnmatch.fnmatchcase(os.path.basename(rel_path), pattern)
+
+
+def prune_tree(root, rules):
+    """Delete the files and directories under ``root`` that ``rules`` remove.
+
+    Args:
+        root: Extension or VS Code ``resources/app`` directory
+        rules: ``(pattern, keep)`` pairs; a path is removed when it matches a rule
+            and no ``keep`` rule
+
+    Returns:
+        Tuple of ``(bytes, files)`` removed
+    """
+    removed_bytes = 0
+    removed_files = 0
+
+    def pruned(rel_path, is_dir):
+        return any(_prune_match(rel_path, p, is_dir) for p, keep in rules if not keep) and not any(
+            _prune_match(rel_path, p, is_dir) for p, keep in rules if keep
+        )
+
+    for dirpath, dirs, files in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        for name in list(dirs):
+            path = os.path.join(dirpath, name)
+            if not os.path.islink(path) and pruned(rel_dir + name, is_dir=True):
+                dirs.remove(name)
+                for sub_root, _sub_dirs, sub_files in os.walk(path):
+                    for sub_name in sub_files:
+                        removed_bytes += os.lstat(os.path.join(sub_root, sub_name)).st_size
+                        removed_files += 1
+                shutil.rmtree(path)
+        for name in files:
+            if pruned(rel_dir + name, is_dir=False):
+                path = os.path.join(dirpath, name)
+                removed_bytes += os.lstat(path).st_size
+                removed_files += 1
+                os.remove(path)
+    return removed_bytes, removed_files
+
+
+def prune_payloads(extensions_dir, app_dir, target_platform, config_path=None):
+    """Strip files listed in config/prune.txt from installed extensions and VS Code.
+
+    Prints the bytes removed per extension.
+
+    Args:
+        extensions_dir: Directory holding one folder per installed extension, or None
+        app_dir: VS Code's ``resources/app``, pruned with the ``vscode:`` rules, or None
+            (the macOS app must stay intact for its code signature)
+        target_platform: Build target, for the platform placeholders
+        config_path: Rules file (default: PRUNE_CONFIG)
+
+    Returns:
+        Total number of bytes removed
+    """
+    config_path = config_path or PRUNE_CONFIG
+    if not os.path.exists(config_path):
+        return 0
+    rules = read_prune_rules(config_path, target_platform)
+    print(f"Pruning bundled payloads with {config_path}...")
+
+    results = []
+    with profile_span("prune payloads") as span:
+        for name in sorted(os.listdir(extensions_dir)) if extensions_dir else []:
+            ext_dir = os.path.join(extensions_dir, name)
+            manifest_path = os.path.join(ext_dir, "package.json")
+            if not os.path.isfile(manifest_path):
+                continue
+            with open(manifest_path) as f:
+                package = json.load(f)
+            ext_id = f"{package.get('publisher', '')}.{package.get('name', '')}".lower()
+            ext_rules = [(pattern, keep) for scope, pattern, keep in rules if scope in (None, ext_id)]
+            results.append((ext_id, *prune_tree(ext_dir, ext_rules)))
+        vscode_rules = [
+            (pattern, keep) for scope, pattern, keep in rules if scope == "vscode" or (keep and scope is None)
+        ]
+        if app_dir and any(not keep for _pattern, keep in vscode_rules):
+            results.append(("VS Code", *prune_tree(app_dir, vscode_rules)))
+        total_bytes = sum(result[1] for result in results)
+        total_files = sum(result[2] for result in results)
+        span.update(bytes=total_bytes, files=total_files)
+
+    mb = 1024 * 1024
+    for name, removed_bytes, removed_files in sorted(results, key=lambda result: -result[1]):
+        if removed_files:
+            print(f"  {name:<40} {removed_bytes / mb:8.1f} MB  ({removed_files} files)")
+    print(f"  Pruned {total_files} files, {total_bytes / mb:.1f} MB")
+    return total_bytes
+
+
 def create_dmg(app_path, output_path, volume_name="Orion Studio"):
     """Create a compressed DMG installer with drag-and-drop interface for macOS.
 
@@ -175,10 +1740,13 @@ def create_dmg(app_path, output_path, volume_name="Orion Studio"):
     """
     print(f"Creating DMG installer: {output_path}...")
 
-    with tempfile.TemporaryDirectory() as staging_dir:
+    # Stage next to the output as a hardlinked copy of the app: as fast as moving it,
+    # keeps the hardlinks created by dedupe_files(), and the app never leaves dist
+    # even if the build is killed while hdiutil runs
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as staging_dir:
         # Create staging directory with app and Applications symlink
         staged_app = os.path.join(staging_dir, os.path.basename(app_path))
-        shutil.copytree(app_path, staged_app, symlinks=True)
+        shutil.copytree(app_path, staged_app, symlinks=True, copy_function=os.link)
 
         # Create symlink to /Applications for drag-and-drop install
         applications_link = os.path.join(staging_dir, "Applications")
@@ -206,7 +1774,8 @@ def create_dmg(app_path, output_path, volume_name="Orion Studio"):
             output_path,
         ]
         for attempt in range(3):
-            result = subprocess.run(hdiutil_cmd, capture_output=True, text=True)
+            with profile_span("hdiutil create", attempt=attempt + 1):
+                result = subprocess.run(hdiutil_cmd, capture_output=True, text=True)
             if result.returncode == 0:
                 break
             if "Resource busy" in result.stderr and attempt < 2:
@@ -217,51 +1786,271 @@ def create_dmg(app_path, output_path, volume_name="Orion Studio"):
                 print(result.stderr, flush=True)
                 result.check_returncode()
 
+    profile_count(disk_bytes=os.path.getsize(output_path), files=1)
     final_size = os.path.getsize(output_path) / (1024 * 1024)
     print(f"  Created {output_path} ({final_size:.1f} MB)")
     return output_path
 
 
-def create_tarball(source_dir, output_path):
+class _CountingWriter:
+    """Pass-through writer that counts the bytes written to ``fileobj``."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self.fileobj.write(data)
+
+
+class _ParallelGzipWriter:
+    """Writer producing gzip output with blocks compressed concurrently on a thread pool.
+
+    Each block becomes an independent gzip member. Concatenated members are a valid
+    gzip stream (the same trick pigz uses for its independent mode), so ``tar xzf``,
+    ``gunzip`` and Python's ``tarfile`` read the result as one archive.
+    """
+
+    def __init__(self, fileobj, level=9, threads=None, block_size=GZIP_BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.level = level
+        self.threads = threads or os.cpu_count() or 1
+        self.block_size = block_size
+        self._buffer = bytearray()
+        self._pending = []
+        self._pool = profile_thread_pool(max_workers=self.threads)
+
+    def _compress(self, block):
+        # zlib releases the GIL while compressing, so blocks really run in parallel
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)  # 31 = gzip container
+        return compressor.compress(block) + compressor.flush()
+
+    def _drain(self, keep):
+        while len(self._pending) > keep:
+            self.fileobj.write(self._pending.pop(0).result())
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._pending.append(self._pool.submit(self._compress, bytes(self._buffer[: self.block_size])))
+            del self._buffer[: self.block_size]
+        # Bound memory use: keep at most two blocks per worker in flight
+        self._drain(keep=2 * self.threads)
+        return len(data)
+
+    def close(self):
+        if self._buffer:
+            self._pending.append(self._pool.submit(self._compress, bytes(self._buffer)))
+            self._buffer = bytearray()
+        self._drain(keep=0)
+        self._pool.shutdown()
+
+
+def _compressor_command(compression, level, threads):
+    """Return the external compressor command line for ``compression``, or None if unavailable."""
+    if compression == "zstd" and shutil.which("zstd"):
+        return ["zstd", "-q", f"-{level}", f"-T{threads}"] + (["--ultra"] if level > 19 else [])
+    if compression == "xz" and shutil.which("xz"):
+        return ["xz", "-q", f"-{level}", f"-T{threads}"]
+    return None
+
+
+def create_tarball(source_dir, output_path, compression="gzip", level=None, threads=None):
     """Create a compressed tarball for Linux distribution.
 
     Args:
         source_dir: Directory to compress
-        output_path: Path for the output .tar.gz file
+        output_path: Path for the output archive (.tar.gz, .tar.zst or .tar.xz)
+        compression: One of COMPRESSION_FORMATS: "gzip" (multi-threaded, readable by any
+            gzip), "zstd" or "xz" (both through their multi-threaded command-line tools)
+        level: Compression level (default: the format's maximum practical level)
+        threads: Compression threads (default: all CPUs)
     """
-    print(f"Creating compressed tarball: {output_path}...")
+    level = level if level is not None else COMPRESSION_FORMATS[compression]["default_level"]
+    threads = threads or os.cpu_count() or 1
+    print(f"Creating compressed tarball: {output_path} ({compression} level {level}, {threads} threads)...")
 
     # Remove existing if present
     if os.path.exists(output_path):
         os.remove(output_path)
 
-    # Use maximum gzip compression
-    with tarfile.open(output_path, "w:gz", compresslevel=9) as tar:
-        tar.add(source_dir, arcname=os.path.basename(source_dir))
+    start = time.perf_counter()
+    command = _compressor_command(compression, level, threads)
+    with open(output_path, "wb") as out_file:
+        if compression == "gzip":
+            compressor = _ParallelGzipWriter(out_file, level=level, threads=threads)
+            counter = _CountingWriter(compressor)
+            with tarfile.open(fileobj=counter, mode="w|") as tar:
+                tar.add(source_dir, arcname=os.path.basename(source_dir))
+            compressor.close()
+        elif command:
+            proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=out_file)
+            counter = _CountingWriter(proc.stdin)
+            try:
+                with tarfile.open(fileobj=counter, mode="w|") as tar:
+                    tar.add(source_dir, arcname=os.path.basename(source_dir))
+            finally:
+                proc.stdin.close()
+                proc.wait()
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(proc.returncode, command)
+        elif compression == "xz":
+            print("  Warning: xz command not found, falling back to single-threaded lzma")
+            counter = _CountingWriter(lzma.LZMAFile(out_file, "wb", preset=level))
+            with tarfile.open(fileobj=counter, mode="w|") as tar:
+                tar.add(source_dir, arcname=os.path.basename(source_dir))
+            counter.fileobj.close()
+        else:
+            raise Exception(f"{compression} compression requires the {compression} command-line tool")
+    elapsed = time.perf_counter() - start
+    profile_count(disk_bytes=os.path.getsize(output_path), files=1)
 
-    final_size = os.path.getsize(output_path) / (1024 * 1024)
+    mb = 1024 * 1024
+    final_size = os.path.getsize(output_path) / mb
+    tar_size = counter.bytes_written / mb
     print(f"  Created {output_path} ({final_size:.1f} MB)")
+    print(
+        f"  Compressed {tar_size:.1f} MB in {elapsed:.1f}s ({tar_size / max(elapsed, 1e-6):.1f} MB/s, "
+        f"ratio {final_size / max(tar_size, 1e-6):.1%})"
+    )
     return output_path
 
 
-def setup_portable_mode(install_dir):
-    print("Setting up Portable Mode...")
-    system = platform.system()
+def get_orion_version():
+    """Return the Orion Studio version from pixi.toml."""
+    with open(PIXI_TOML, "rb") as f:
+        return tomllib.load(f)["workspace"]["version"]
 
-    data_dir = ""
+
+def create_release_manifest(install_dir, **metadata):
+    """Describe every file of an install for delta updates.
+
+    Regular files are recorded with their SHA-256, size and permission bits,
+    symlinks with their target. Hardlinked copies (see dedupe_files()) are hashed once.
+
+    Args:
+        install_dir: Root of the install; paths in the manifest are relative to it
+        **metadata: Extra top-level fields, such as the release version
+
+    Returns:
+        Manifest dict; ``digest`` identifies the exact file set
+    """
+    files = {}
+    digests = {}
+    with profile_span("hash install tree") as span:
+        for root, dirs, names in os.walk(install_dir):
+            dirs.sort()
+            for name in sorted(names + [d for d in dirs if os.path.islink(os.path.join(root, d))]):
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, install_dir).replace(os.sep, "/")
+                if rel_path == RELEASE_MANIFEST_NAME:
+                    continue
+                st = os.lstat(path)
+                if stat.S_ISLNK(st.st_mode):
+                    files[rel_path] = {"link": os.readlink(path)}
+                elif stat.S_ISREG(st.st_mode):
+                    inode = (st.st_dev, st.st_ino)
+                    if inode not in digests:
+                        digests[inode] = sha256_file(path)
+                    files[rel_path] = {"sha256": digests[inode], "size": st.st_size, "mode": stat.S_IMODE(st.st_mode)}
+        span.update(files=len(files))
+    digest = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+    return {"format": RELEASE_MANIFEST_FORMAT, **metadata, "digest": digest, "files": files}
+
+
+def write_release_manifest(install_dir, output_path, **metadata):
+    """Write the release manifest into the install and to ``output_path`` (a release asset)."""
+    print(f"Writing release manifest {output_path}...")
+    manifest = create_release_manifest(install_dir, **metadata)
+    for path in (os.path.join(install_dir, RELEASE_MANIFEST_NAME), output_path):
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def create_delta_package(base_manifest, install_dir, output_path, compression="gzip", level=None, threads=None):
+    """Create a delta update package from a previous release to the install in ``install_dir``.
+
+    The package holds ``delta.json`` (the files to write and delete, with the hashes
+    they must have before and after), the payload of every added or changed file
+    under ``files/``, and the new release manifest. scripts/apply_delta.py verifies
+    and applies it to an install of the previous release.
+
+    Args:
+        base_manifest: Release manifest dict of the previous release
+        install_dir: New install, with its release manifest already written
+        output_path: Path for the package; compressed like create_tarball()
+        compression, level, threads: See create_tarball()
+
+    Returns:
+        The delta dict written as ``delta.json``
+    """
+    with open(os.path.join(install_dir, RELEASE_MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    old_files = base_manifest["files"]
+    new_files = manifest["files"]
+    delta = {
+        "format": DELTA_FORMAT,
+        "from": {"version": base_manifest.get("version"), "digest": base_manifest["digest"]},
+        "to": {"version": manifest.get("version"), "digest": manifest["digest"]},
+        "changed": {
+            path: {**entry, "old": old_files.get(path)}
+            for path, entry in sorted(new_files.items())
+            if old_files.get(path) != entry
+        },
+        "deleted": {path: entry for path, entry in sorted(old_files.items()) if path not in new_files},
+    }
+
+    # Next to the install, so that the payload can be hardlinked instead of copied
+    staging_dir = os.path.join(tempfile.mkdtemp(dir=os.path.dirname(install_dir)), "OrionStudio-delta")
+    os.makedirs(staging_dir)
+    payload_bytes = 0
+    for path, entry in delta["changed"].items():
+        if "sha256" not in entry:
+            continue  # Symlinks are recreated from delta.json
+        dest = os.path.join(staging_dir, "files", path)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.link(os.path.join(install_dir, path), dest)
+        payload_bytes += entry["size"]
+    with open(os.path.join(staging_dir, "delta.json"), "w") as f:
+        json.dump(delta, f, indent=1, sort_keys=True)
+    shutil.copy(os.path.join(install_dir, RELEASE_MANIFEST_NAME), os.path.join(staging_dir, "manifest.json"))
+
+    print(
+        f"Delta {delta['from']['version']} -> {delta['to']['version']}: {len(delta['changed'])} files added or "
+        f"changed ({payload_bytes / (1024 * 1024):.1f} MB), {len(delta['deleted'])} deleted"
+    )
+    try:
+        create_tarball(staging_dir, output_path, compression=compression, level=level, threads=threads)
+    finally:
+        shutil.rmtree(os.path.dirname(staging_dir))
+    return delta
+
+
+def get_portable_data_dir(install_dir):
+    """Return the portable data directory (or Linux data-template) for an install."""
+    system = platform.system()
+
+    data_dir = ""
     if system == "Darwin":
         # On macOS, 'code-portable-data' goes alongside the .app
         data_dir = os.path.join(install_dir, "code-portable-data")
     elif system == "Linux":
         # On Linux, use 'data-template' to avoid triggering VS Code's auto portable mode
-        # The launcher will copy this to user's home directory on first run
+        # The launcher materializes this in the user's home directory on first run
         contents = os.listdir(install_dir)
         vscode_dir = next((d for d in contents if "VSCode" in d), None)
         if vscode_dir:
             data_dir = os.path.join(install_dir, vscode_dir, "data-template")
         else:
             data_dir = os.path.join(install_dir, "data-template")
+    return data_dir
 
+
+def setup_portable_mode(install_dir):
+    print("Setting up Portable Mode...")
+    data_dir = get_portable_data_dir(install_dir)
     os.makedirs(data_dir, exist_ok=True)
 
     # Create User/settings.json
@@ -278,140 +2067,444 @@ def setup_portable_mode(install_dir):
     return data_dir
 
 
-def get_extension_info(extension_id):
-    """Query VS Code Marketplace API to get extension download URL, version, and dependencies."""
-    # Parse extension ID (publisher.name or publisher.name@version)
+def copy_file_reflink(src, dest):
+    """Copy ``src`` to ``dest``, as a reflink where the filesystem supports it.
+
+    A reflink (Btrfs, XFS) shares the data blocks copy-on-write, so it is as fast as a
+    hardlink but writing to either file leaves the other unchanged. Elsewhere the data
+    is copied.
+    """
+    if sys.platform == "linux":
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                pass
+    shutil.copyfile(src, dest)
+
+
+def fetch_pixi_lock(repo_url, dest_dir):
+    """Fetch only ``pixi.lock`` from the default branch of ``repo_url`` and return its path.
+
+    A blobless shallow clone downloads the commit and tree but no file contents,
+    and ``git show`` then fetches the single blob.
+    """
+    print(f"Fetching pixi.lock from {repo_url}...")
+    if os.path.exists(dest_dir):
+        shutil.rmtree(dest_dir)
+    with profile_span("fetch pixi.lock", repo=repo_url):
+        subprocess.run(
+            ["git", "clone", "--quiet", "--depth", "1", "--filter=blob:none", "--no-checkout", repo_url, dest_dir],
+            check=True,
+        )
+        lock = subprocess.run(["git", "-C", dest_dir, "show", "HEAD:pixi.lock"], check=True, capture_output=True).stdout
+    lock_path = os.path.join(dest_dir, "pixi.lock")
+    with open(lock_path, "wb") as f:
+        f.write(lock)
+    return lock_path
+
+
+def read_pixi_lock_packages(lock_path, target_platform, environment="default"):
+    """List the conda packages ``pixi install`` needs for one environment and platform.
+
+    Returns:
+        Tuple of ``(channels, packages)``: the environment's channel URLs, and a list
+        of ``(url, sha256)`` for every conda package. PyPI packages are not included;
+        pixi installs them through uv, which does not use conda channel mirrors.
+    """
+    # pyyaml is in the build's pixi environment; only --prefetch-env needs it
+    import yaml
+
+    with open(lock_path) as f:
+        lock = yaml.safe_load(f)
+    if lock.get("version") != 6:
+        raise Exception(f"Unsupported pixi.lock format version {lock.get('version')} in {lock_path}")
+
+    env = lock["environments"][environment]
+    channels = [channel["url"].rstrip("/") for channel in env["channels"]]
+    hashes = {package["conda"]: package.get("sha256") for package in lock["packages"] if "conda" in package}
+    urls = [entry["conda"] for entry in env["packages"].get(PIXI_PLATFORMS[target_platform], []) if "conda" in entry]
+    return channels, [(url, hashes.get(url)) for url in urls]
+
+
+def prefetch_pixi_env(repo_url, mirror_dir, target_platform, work_dir, jobs=DEFAULT_JOBS):
+    """Mirror the conda packages of a notebook repository's pixi environment.
+
+    Every package pinned in the repository's ``pixi.lock`` for ``target_platform`` is
+    downloaded (through the download cache, verified against the lockfile's SHA-256)
+    to ``mirror_dir/<host>/<channel path>/<subdir>/``, the same layout as the channel.
+    ``mirrors.json`` maps each channel URL to its directory; the launcher turns it into
+    a pixi mirror configuration, so that the first ``pixi install`` of the repository
+    reads packages from the install instead of the network.
+
+    Args:
+        repo_url: Git URL of the notebook repository
+        mirror_dir: Output directory, normally ``pixi-mirror`` in the portable data dir
+        target_platform: Platform to mirror packages for, e.g. ``linux-x64``
+        work_dir: Scratch directory for fetching the lockfile
+        jobs: Concurrent package downloads
+    """
+    lock_path = fetch_pixi_lock(repo_url, os.path.join(work_dir, "pixi-lock"))
+    channels, packages = read_pixi_lock_packages(lock_path, target_platform)
+    print(f"Mirroring {len(packages)} conda packages of {repo_url} for {target_platform}...")
+
+    if os.path.exists(mirror_dir):
+        shutil.rmtree(mirror_dir)
+    os.makedirs(mirror_dir)
+
+    def mirror_package(package):
+        url, sha256 = package
+        parsed = urllib.parse.urlsplit(url)
+        dest = os.path.join(mirror_dir, parsed.netloc, *parsed.path.strip("/").split("/"))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        # A copy, not a hardlink: later edits of the install must not reach the cache
+        copy_file_reflink(fetch_to_cache(url, sha256=sha256), dest)
+        return os.path.getsize(dest)
+
+    with profile_span("mirror conda packages", packages=len(packages)) as span:
+        with profile_thread_pool(max_workers=jobs) as pool:
+            total = sum(pool.map(mirror_package, packages))
+        span.update(bytes=total)
+
+    mirrors = {}
+    for channel in channels:
+        parsed = urllib.parse.urlsplit(channel)
+        mirrors[channel] = "/".join([parsed.netloc, *parsed.path.strip("/").split("/")]).rstrip("/")
+    with open(os.path.join(mirror_dir, "mirrors.json"), "w") as f:
+        json.dump(
+            {"repository": repo_url, "platform": PIXI_PLATFORMS[target_platform], "mirrors": mirrors}, f, indent=2
+        )
+    print(f"  Mirrored {total / (1024 * 1024):.1f} MB to {mirror_dir}")
+
+
+def _split_extension_id(extension_id):
+    """Split ``publisher.name[@version]`` into ``(publisher.name, version)``; version may be None."""
     version = None
     if "@" in extension_id:
         extension_id, version = extension_id.rsplit("@", 1)
+    return extension_id, version
 
-    if "." not in extension_id:
-        print(f"Warning: Invalid extension ID format: {extension_id}")
-        return None
 
-    publisher, name = extension_id.split(".", 1)
+def query_marketplace(extension_ids):
+    """Look up several extensions with a single marketplace ``extensionquery`` request.
+
+    Args:
+        extension_ids: ``publisher.name`` IDs (without ``@version``)
+
+    Returns:
+        Dict mapping lower-cased extension ID to the raw marketplace extension record;
+        extensions the marketplace does not know are absent
+    """
+    if not extension_ids:
+        return {}
 
     # VS Code Marketplace API
-    api_url = "https://marketplace.visualstudio.com/_apis/public/gallery/extensionquery"
+    api_url = f"{MARKETPLACE_URL}/_apis/public/gallery/extensionquery"
 
-    # Build query payload
+    # Build query payload: one ExtensionName criterion per extension
     payload = {
         "filters": [
             {
-                "criteria": [
-                    {"filterType": 7, "value": extension_id}  # ExtensionName filter
-                ]
+                "criteria": [{"filterType": 7, "value": ext_id} for ext_id in extension_ids],
+                "pageNumber": 1,
+                "pageSize": len(extension_ids),
             }
         ],
         "flags": 914,  # Include files, versions, properties
     }
 
-    ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
+    with profile_span("marketplace query", extensions=len(extension_ids)):
+        _status, body = fetch_metadata(
+            api_url,
+            method="POST",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Accept": "application/json;api-version=6.0-preview.1"},
+        )
+        data = json.loads(body.decode())
 
-    req = urllib.request.Request(
-        api_url,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={"Content-Type": "application/json", "Accept": "application/json;api-version=6.0-preview.1"},
-    )
+    records = {}
+    for result in data.get("results", []):
+        for ext in result.get("extensions", []):
+            publisher = ext.get("publisher", {}).get("publisherName", "")
+            records[f"{publisher}.{ext.get('extensionName', '')}".lower()] = ext
+    return records
 
-    try:
-        with urllib.request.urlopen(req, context=ctx) as response:
-            data = json.loads(response.read().decode())
 
-            if not data.get("results") or not data["results"][0].get("extensions"):
-                return None
+def _extension_info_from_record(extension_id, version, ext, target_platform=None):
+    """Build the ``get_extension_info()`` result for a raw marketplace extension record.
 
-            ext = data["results"][0]["extensions"][0]
-            versions = ext.get("versions", [])
+    ``target_platform`` defaults to the build host's platform.
+    """
+    target_platform = target_platform or get_target_platform()
+    publisher, name = extension_id.split(".", 1)
+    versions = ext.get("versions", [])
 
-            if not versions:
-                return None
+    if not versions:
+        return None
 
-            # Find requested version or use latest
-            target_version = None
-            for v in versions:
-                if version and v["version"] == version:
-                    target_version = v
-                    break
-                elif not version:
-                    target_version = v  # First is latest
-                    break
+    # Find requested version or use latest
+    target_version = None
+    for v in versions:
+        if version and v["version"] == version:
+            target_version = v
+            break
+        elif not version:
+            target_version = v  # First is latest
+            break
+
+    if not target_version:
+        target_version = versions[0]
+
+    # Find VSIX download URL
+    vsix_url = None
+    for file in target_version.get("files", []):
+        if file.get("assetType") == "Microsoft.VisualStudio.Services.VSIXPackage":
+            vsix_url = file.get("source")
+            break
+
+    # Extract dependencies and extension pack members
+    dependencies = []
+    pre_release = False
+    for prop in target_version.get("properties", []):
+        key = prop.get("key", "")
+        value = prop.get("value", "")
+        if key == "Microsoft.VisualStudio.Code.ExtensionDependencies" and value:
+            dependencies.extend([d.strip() for d in value.split(",") if d.strip()])
+        elif key == "Microsoft.VisualStudio.Code.ExtensionPack" and value:
+            dependencies.extend([d.strip() for d in value.split(",") if d.strip()])
+        elif key == "Microsoft.VisualStudio.Code.PreRelease":
+            pre_release = value == "true"
+
+    asset_url = f"{GALLERY_ASSETS_URL.format(publisher=publisher)}/_apis/public/gallery/publisher/{publisher}/extension/{name}/{target_version['version']}/assetbyname/Microsoft.VisualStudio.Services.VSIXPackage"
+
+    # Try platform-specific URL
+    vsix_platform = "universal"
+    if target_platform:
+        platform_url = f"{asset_url}?targetPlatform={target_platform}"
+        # Test if platform-specific exists
+        try:
+            with profile_span("platform VSIX probe"):
+                status, _body = fetch_metadata(platform_url, method="HEAD")
+            if status == 200:
+                vsix_url = platform_url
+                vsix_platform = target_platform
+        except (urllib.error.URLError, urllib.error.HTTPError):
+            pass  # Fall back to universal
+
+    if not vsix_url:
+        # Construct fallback URL
+        vsix_url = asset_url
+
+    return {
+        "id": extension_id,
+        "publisher": publisher,
+        "name": name,
+        "version": target_version["version"],
+        "vsix_url": vsix_url,
+        "dependencies": dependencies,
+        "uuid": ext.get("extensionId"),
+        "publisher_id": ext.get("publisher", {}).get("publisherId"),
+        "publisher_display_name": ext.get("publisher", {}).get("displayName"),
+        "target_platform": vsix_platform,
+        "pre_release": pre_release,
+    }
 
-            if not target_version:
-                target_version = versions[0]
 
-            # Find VSIX download URL
-            vsix_url = None
-            for file in target_version.get("files", []):
-                if file.get("assetType") == "Microsoft.VisualStudio.Services.VSIXPackage":
-                    vsix_url = file.get("source")
-                    break
+def get_extension_info(extension_id, target_platform=None):
+    """Query VS Code Marketplace API to get extension download URL, version, and dependencies."""
+    # Parse extension ID (publisher.name or publisher.name@version)
+    extension_id, version = _split_extension_id(extension_id)
 
-            # Extract dependencies and extension pack members
-            dependencies = []
-            for prop in target_version.get("properties", []):
-                key = prop.get("key", "")
-                value = prop.get("value", "")
-                if key == "Microsoft.VisualStudio.Code.ExtensionDependencies" and value:
-                    dependencies.extend([d.strip() for d in value.split(",") if d.strip()])
-                elif key == "Microsoft.VisualStudio.Code.ExtensionPack" and value:
-                    dependencies.extend([d.strip() for d in value.split(",") if d.strip()])
-
-            # Check for platform-specific packages
-            target_platform = None
-            system = platform.system()
-            machine = platform.machine()
-            if system == "Darwin":
-                target_platform = "darwin-arm64" if machine == "arm64" else "darwin-x64"
-            elif system == "Linux":
-                target_platform = "linux-arm64" if machine == "aarch64" else "linux-x64"
-
-            # Try platform-specific URL
-            if target_platform:
-                platform_url = f"https://{publisher}.gallery.vsassets.io/_apis/public/gallery/publisher/{publisher}/extension/{name}/{target_version['version']}/assetbyname/Microsoft.VisualStudio.Services.VSIXPackage?targetPlatform={target_platform}"
-                # Test if platform-specific exists
-                try:
-                    test_req = urllib.request.Request(platform_url, method="HEAD")
-                    with urllib.request.urlopen(test_req, context=ctx) as resp:
-                        if resp.status == 200:
-                            vsix_url = platform_url
-                except (urllib.error.URLError, urllib.error.HTTPError):
-                    pass  # Fall back to universal
-
-            if not vsix_url:
-                # Construct fallback URL
-                vsix_url = f"https://{publisher}.gallery.vsassets.io/_apis/public/gallery/publisher/{publisher}/extension/{name}/{target_version['version']}/assetbyname/Microsoft.VisualStudio.Services.VSIXPackage"
-
-            return {
-                "id": extension_id,
-                "publisher": publisher,
-                "name": name,
-                "version": target_version["version"],
-                "vsix_url": vsix_url,
-                "dependencies": dependencies,
-            }
+    if "." not in extension_id:
+        print(f"Warning: Invalid extension ID format: {extension_id}")
+        return None
+
+    try:
+        ext = query_marketplace([extension_id]).get(extension_id.lower())
+        if not ext:
+            return None
+        return _extension_info_from_record(extension_id, version, ext, target_platform)
     except Exception as e:
         print(f"Warning: Could not query marketplace for {extension_id}: {e}")
         return None
 
 
+def get_extension_infos(extension_ids, jobs=DEFAULT_JOBS, target_platform=None, records=None):
+    """Resolve several extensions with one batched marketplace query.
+
+    Platform-specific VSIX probes for the results run concurrently on ``jobs`` workers,
+    against ``target_platform`` (default: the build host's platform).
+
+    Args:
+        extension_ids: IDs in ``publisher.name`` or ``publisher.name@version`` form
+        records: Optional dict of marketplace records shared between calls (for
+            example one per target platform). Only IDs missing from it are queried,
+            and the new records are added to it.
+
+    Returns:
+        Dict mapping each lower-cased requested ID to its ``get_extension_info()``
+        result, or None when it could not be resolved
+    """
+    infos = {}
+    requested = {}
+    for ext_id in extension_ids:
+        base_id, _version = _split_extension_id(ext_id)
+        if "." not in base_id:
+            print(f"Warning: Invalid extension ID format: {base_id}")
+            infos[ext_id.lower()] = None
+        else:
+            requested[ext_id.lower()] = ext_id
+
+    base_ids = sorted({_split_extension_id(ext_id)[0] for ext_id in requested.values()}, key=str.lower)
+    records = {} if records is None else records
+    # Held across the queries so that concurrent target builds sharing ``records``
+    # wait for one query instead of each sending their own
+    with _marketplace_records_lock:
+        base_ids = [base_id for base_id in base_ids if base_id.lower() not in records]
+        for i in range(0, len(base_ids), MARKETPLACE_BATCH_SIZE):
+            batch = base_ids[i : i + MARKETPLACE_BATCH_SIZE]
+            try:
+                records.update(query_marketplace(batch))
+            except Exception as e:
+                print(f"Warning: Could not query marketplace for {', '.join(batch)}: {e}")
+
+    def build(ext_id):
+        base_id, version = _split_extension_id(ext_id)
+        ext = records.get(base_id.lower())
+        if not ext:
+            return None
+        try:
+            return _extension_info_from_record(base_id, version, ext, target_platform)
+        except Exception as e:
+            print(f"Warning: Could not read marketplace entry for {base_id}: {e}")
+            return None
+
+    with profile_thread_pool(max_workers=max(1, jobs)) as pool:
+        for ext_id_lower, ext_info in zip(requested, pool.map(build, requested.values()), strict=True):
+            infos[ext_id_lower] = ext_info
+    return infos
+
+
+def _stream_download(url, sha256=None):
+    """Stream ``url`` into a spooled buffer, hashing it on the way through.
+
+    Content up to VSIX_SPOOL_MAX_BYTES stays in memory; larger downloads roll over
+    to an anonymous temporary file.
+
+    Returns:
+        ``(spool, digest)`` with ``spool`` rewound to the start
+    """
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=VSIX_SPOOL_MAX_BYTES)
+    try:
+        with http_request(url) as response:
+            for chunk in iter(lambda: response.read(1024 * 1024), b""):
+                digest.update(chunk)
+                spool.write(chunk)
+        if sha256 and digest.hexdigest() != sha256:
+            raise ValueError(f"SHA-256 mismatch for {url}: expected {sha256}, got {digest.hexdigest()}")
+    except BaseException:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool, digest.hexdigest()
+
+
+def extract_vsix(source, ext_target):
+    """Extract the ``extension/`` folder of a VSIX (path or file object) into ``ext_target``.
+
+    Returns:
+        ``(files, bytes_written)``
+    """
+    files = 0
+    bytes_written = 0
+    with zipfile.ZipFile(source, "r") as zip_ref:
+        # VSIX contains extension/ folder - extract contents
+        for member in zip_ref.infolist():
+            if member.filename.startswith("extension/"):
+                # Remove 'extension/' prefix
+                target_path = os.path.join(ext_target, member.filename[10:])
+                if member.is_dir():
+                    os.makedirs(target_path, exist_ok=True)
+                else:
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                    with zip_ref.open(member) as src, open(target_path, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                    files += 1
+                    bytes_written += member.file_size
+    return files, bytes_written
+
+
+def _record_vsix_stats(**counts):
+    with _vsix_stats_lock:
+        for name, value in counts.items():
+            _vsix_stats[name] += value
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Return the peak resident set size of this process in MB.
+
+    With ``who=resource.RUSAGE_CHILDREN``, return that of the largest finished child
+    process (npm, tar, compressors) instead.
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def report_vsix_stats():
+    """Print and reset the VSIX download/extraction counters."""
+    with _vsix_stats_lock:
+        stats = dict(_vsix_stats)
+        for name in _vsix_stats:
+            _vsix_stats[name] = 0
+    mb = 1024 * 1024
+    print(
+        f"  VSIX stats: {stats['packages']} packages, {stats['downloaded'] / mb:.1f} MB downloaded, "
+        f"{stats['files']} files / {stats['extracted'] / mb:.1f} MB extracted, "
+        f"{stats['cached'] / mb:.1f} MB written to cache, peak RSS {peak_rss_mb():.0f} MB"
+    )
+
+
 def download_and_install_vsix(ext_info, extensions_dir):
-    """Download VSIX and extract to extensions directory."""
-    ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
+    """Download VSIX and extract to extensions directory.
+
+    A cached VSIX is extracted straight from the cache. Otherwise the download is
+    streamed into a spooled in-memory buffer, hashed on the way through and
+    extracted from memory, so no intermediate .vsix file is written under build/;
+    the buffer is only written to disk once, as the new cache entry.
 
-    vsix_path = os.path.join(BUILD_DIR, f"{ext_info['publisher']}.{ext_info['name']}.vsix")
+    Concurrent target builds share platform-independent VSIXes: the first install
+    of a URL downloads and caches it, the others wait and extract the cached copy.
+    """
+    with _url_lock(ext_info["vsix_url"]):
+        return _download_and_install_vsix(ext_info, extensions_dir)
 
-    # Download VSIX
+
+def _download_and_install_vsix(ext_info, extensions_dir):
+    url = ext_info["vsix_url"]
+    spool = None
+
+    # Download VSIX (or reuse the cached copy)
     try:
-        with urllib.request.urlopen(ext_info["vsix_url"], context=ctx) as response:
-            with open(vsix_path, "wb") as f:
-                shutil.copyfileobj(response, f)
+        local_path = _file_url_path(url)
+        source = local_path or _cache_get(url, ext_info.get("sha256"))
+        if local_path:
+            # A VSIX in a mirror on local disk is extracted in place
+            if ext_info.get("sha256") and sha256_file(local_path) != ext_info["sha256"]:
+                raise ValueError(f"SHA-256 mismatch for {local_path}")
+        elif source:
+            print(f"  Using cached copy of {url}")
+        else:
+            with profile_span("VSIX download", extension=ext_info["id"]):
+                spool, digest = _stream_download(url, ext_info.get("sha256"))
+            source = spool
+            _record_vsix_stats(downloaded=spool.seek(0, os.SEEK_END))
+            spool.seek(0)
     except Exception as e:
-        print(f"  Failed to download: {e}")
+        print(f"  Failed to download {ext_info['id']}: {e}")
         return False
 
     # VSIX is a ZIP file - extract it
@@ -424,35 +2517,36 @@ def download_and_install_vsix(ext_info, extensions_dir):
     os.makedirs(ext_target, exist_ok=True)
 
     try:
-        with zipfile.ZipFile(vsix_path, "r") as zip_ref:
-            # VSIX contains extension/ folder - extract contents
-            for member in zip_ref.namelist():
-                if member.startswith("extension/"):
-                    # Remove 'extension/' prefix
-                    target_path = os.path.join(ext_target, member[10:])
-                    if member.endswith("/"):
-                        os.makedirs(target_path, exist_ok=True)
-                    else:
-                        os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                        with zip_ref.open(member) as src, open(target_path, "wb") as dst:
-                            shutil.copyfileobj(src, dst)
-
-        # Clean up VSIX file
-        os.remove(vsix_path)
+        with profile_span("VSIX extract", extension=ext_info["id"]):
+            files, extracted = extract_vsix(source, ext_target)
+        _record_vsix_stats(packages=1, files=files, extracted=extracted)
+        profile_count(disk_bytes=extracted, files=files)
+
+        # Keep the download for the next build
+        if spool and CACHE_ENABLED:
+            staging_dir = os.path.join(CACHE_DIR, "tmp")
+            os.makedirs(staging_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=staging_dir, suffix=".part")
+            spool.seek(0)
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(spool, f)
+            _record_vsix_stats(cached=os.path.getsize(tmp_path))
+            profile_count(disk_bytes=os.path.getsize(tmp_path))
+            cache_store(url, tmp_path, digest=digest)
         return True
     except Exception as e:
-        print(f"  Failed to extract: {e}")
+        print(f"  Failed to extract {ext_info['id']}: {e}")
         return False
+    finally:
+        if spool:
+            spool.close()
 
 
-def install_extensions(install_dir, data_dir):
-    print("Installing extensions...")
-    system = platform.system()
-    extensions_file = os.path.join(CONFIG_DIR, "extensions.txt")
-    if not os.path.exists(extensions_file):
-        print("No extensions.txt found, skipping.")
-        return
+def read_extensions_file(extensions_file):
+    """Parse extensions.txt into ``(extensions, excluded)``.
 
+    Lines starting with ``# !`` are exclusions; other ``#`` lines are comments.
+    """
     with open(extensions_file) as f:
         lines = [line.strip() for line in f if line.strip()]
 
@@ -465,48 +2559,399 @@ def install_extensions(install_dir, data_dir):
             excluded.add(line[3:].strip().lower())
         elif not line.startswith("#"):
             extensions.append(line)
+    return extensions, excluded
 
-    # Install Orion Launcher Extension
-    print("Building Orion Launcher Extension...")
-    ext_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "extensions", "orion-launcher")
-
-    # Install dependencies and compile
-    subprocess.run(["pixi", "run", "npm", "install"], cwd=ext_dir, check=True)
-    subprocess.run(["pixi", "run", "npm", "run", "compile"], cwd=ext_dir, check=True)
 
-    # Copy to extensions directory
+def get_launcher_target_dir(install_dir):
+    """Return where the orion-launcher extension is installed as a built-in extension."""
     # For macOS: Orion Studio.app/Contents/Resources/app/extensions/orion-launcher
     # For Linux: OrionStudio/resources/app/extensions/orion-launcher
     # Strategy: Bundle as "built-in" by placing in resources/app/extensions.
-
+    system = platform.system()
     if system == "Darwin":
-        target_ext_dir = os.path.join(
+        return os.path.join(
             install_dir, "Visual Studio Code.app", "Contents", "Resources", "app", "extensions", "orion-launcher"
         )
     elif system == "Linux":
         contents = os.listdir(install_dir)
         vscode_dir = next((d for d in contents if "VSCode" in d), None)
         if vscode_dir:
-            target_ext_dir = os.path.join(install_dir, vscode_dir, "resources", "app", "extensions", "orion-launcher")
+            return os.path.join(install_dir, vscode_dir, "resources", "app", "extensions", "orion-launcher")
         else:
             # Fallback if structure is different
-            target_ext_dir = os.path.join(install_dir, "resources", "app", "extensions", "orion-launcher")
+            return os.path.join(install_dir, "resources", "app", "extensions", "orion-launcher")
+
+
+def build_orion_launcher():
+    """Install the orion-launcher extension's dependencies and bundle it in place.
+
+    ``npm ci`` installs exactly what ``package-lock.json`` pins and never rewrites
+    it, so the tracked lockfile (and launcher_cache_key()) stays the same. Package
+    install scripts are not run: none of the build tools need one (esbuild finds
+    its platform binary without its postinstall step).
+    ``npm run bundle`` type-checks the sources and has esbuild write the extension
+    and its runtime dependencies to one minified ``dist/extension.js``.
+    """
+    print("Building Orion Launcher Extension...")
+    ext_dir = LAUNCHER_EXT_DIR
+
+    with open(os.path.join(ext_dir, "package-lock.json")) as f:
+        packages = json.load(f)["packages"]
+    unverified = sorted(
+        path.split("node_modules/")[-1] for path, package in packages.items() if path and "integrity" not in package
+    )
+    if unverified:
+        print(
+            f"Warning: package-lock.json has no integrity hash for {len(unverified)} packages "
+            f"({', '.join(unverified[:3])}{', ...' if len(unverified) > 3 else ''}); npm cannot verify them. "
+            "Run `npm install` in extensions/orion-launcher with registry access and commit the lockfile"
+        )
+
+    # Install dependencies and bundle
+    with profile_span("npm ci"):
+        subprocess.run(["pixi", "run", "npm", "ci", "--ignore-scripts"], cwd=ext_dir, check=True)
+    with profile_span("npm run bundle"):
+        subprocess.run(["pixi", "run", "npm", "run", "bundle"], cwd=ext_dir, check=True)
+
+
+def write_launcher_package_json(target_ext_dir):
+    """Write the installed launcher's package.json, pointing ``main`` at the bundle.
+
+    Build-only fields (scripts and dependencies) are dropped: everything the
+    extension needs at runtime is inside ``dist/extension.js``.
+    """
+    with open(os.path.join(LAUNCHER_EXT_DIR, "package.json")) as f:
+        package = json.load(f)
+    package["main"] = "./dist/extension.js"
+    for field in ("scripts", "devDependencies", "dependencies"):
+        package.pop(field, None)
+    with open(os.path.join(target_ext_dir, "package.json"), "w") as f:
+        json.dump(package, f, indent=2)
+        f.write("\n")
+
+
+def launcher_cache_key():
+    """Return the download cache key of the installed orion-launcher build.
+
+    The key covers the launcher sources, ``package.json``/``package-lock.json`` and
+    ``pixi.lock`` (which pins Node.js), so any change to them forces a rebuild.
+    """
+    digest = hashlib.sha256()
+    digest.update(hash_tree(LAUNCHER_EXT_DIR, LAUNCHER_BUILD_IGNORE).encode())
+    digest.update(str(_optional_sha256(PIXI_LOCK)).encode())
+    return f"orion-launcher:{digest.hexdigest()}"
 
-    if os.path.exists(target_ext_dir):
-        shutil.rmtree(target_ext_dir)
 
-    print(f"Installing Orion Launcher to {target_ext_dir}...")
-    shutil.copytree(ext_dir, target_ext_dir, ignore=shutil.ignore_patterns("node_modules", ".git", ".vscode-test"))
+def install_orion_launcher(install_dir, build=build_orion_launcher):
+    """Build the orion-launcher extension and install it as a built-in extension.
+
+    Only ``package.json`` and the esbuild bundle in ``dist/`` are installed; there
+    is no ``node_modules``. The installed tree is kept in the download cache as one
+    tar archive, keyed by launcher_cache_key(). On a cache hit it is unpacked
+    straight into the target and npm is not run at all.
+
+    Args:
+        install_dir: Directory the launcher target path is derived from
+        build: Callable that bundles the extension in LAUNCHER_EXT_DIR, called only
+            on a cache miss; concurrent target builds pass one that bundles once
+    """
+    target_ext_dir = get_launcher_target_dir(install_dir)
+    key = launcher_cache_key()
+
+    # Held across the build so that concurrent target builds wait for one build and
+    # then unpack it from the cache
+    with _url_lock(key):
+        cached = cache_lookup(key)
+        if os.path.exists(target_ext_dir):
+            shutil.rmtree(target_ext_dir)
+
+        if cached:
+            print(f"Installing cached Orion Launcher build to {target_ext_dir}...")
+            with profile_span("unpack cached launcher"), tarfile.open(cached) as tar:
+                # Reject absolute paths and links out of the target where tarfile supports it
+                if hasattr(tarfile, "data_filter"):
+                    tar.extractall(target_ext_dir, filter="data")
+                else:
+                    tar.extractall(target_ext_dir)
+            return
+
+        # Install Orion Launcher Extension
+        build()
+        ext_dir = LAUNCHER_EXT_DIR
+
+        # Copy the bundle to extensions directory
+        print(f"Installing Orion Launcher to {target_ext_dir}...")
+        os.makedirs(os.path.join(target_ext_dir, "dist"))
+        write_launcher_package_json(target_ext_dir)
+        for name in LAUNCHER_BUNDLE_FILES:
+            shutil.copy2(os.path.join(ext_dir, "dist", name), os.path.join(target_ext_dir, "dist", name))
+        media_dir = os.path.join(ext_dir, "media")
+        if os.path.isdir(media_dir):
+            shutil.copytree(media_dir, os.path.join(target_ext_dir, "media"))
+
+        if CACHE_ENABLED:
+            staging_dir = os.path.join(CACHE_DIR, "tmp")
+            os.makedirs(staging_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=staging_dir, suffix=".tar")
+            with os.fdopen(fd, "wb") as f, tarfile.open(fileobj=f, mode="w") as tar:
+                tar.add(target_ext_dir, arcname=".")
+            cache_store(key, tmp_path)
+
+
+def install_extensions(data_dir, jobs=DEFAULT_JOBS, use_lock=True, target_platform=None, records=None, entries=None):
+    """Install the marketplace extensions from extensions.txt into the portable data dir.
+
+    Extensions are installed for ``target_platform`` (default: the build host's
+    platform); ``records`` shares marketplace records between target builds.
+    ``entries`` (from a mirror) are installed instead of extensions.lock or the
+    marketplace resolution. The installed set is registered in
+    ``extensions/extensions.json``, see write_extensions_manifest().
+    """
+    target_platform = target_platform or get_target_platform()
+    print("Installing extensions...")
+    extensions_file = os.path.join(CONFIG_DIR, "extensions.txt")
+    if not os.path.exists(extensions_file):
+        print("No extensions.txt found, skipping.")
+        return
 
-    # We need to install production dependencies in the target
-    subprocess.run(["pixi", "run", "npm", "install", "--production"], cwd=target_ext_dir, check=True)
+    extensions, excluded = read_extensions_file(extensions_file)
 
-    # Define extensions dir inside portable data dir
+    # Define extensions dir inside portable data dir, starting empty so that
+    # incremental rebuilds do not keep superseded extension versions around
     extensions_dir = os.path.join(data_dir, "extensions")
+    if os.path.exists(extensions_dir):
+        shutil.rmtree(extensions_dir)
     os.makedirs(extensions_dir, exist_ok=True)
 
+    # Pinned extensions from config/extensions.lock skip the marketplace API entirely
+    locked = load_extension_lock(extensions_file, target_platform) if use_lock and entries is None else None
+    if entries is not None:
+        print("Installing extensions from the mirror...")
+        installed = install_locked_extensions(entries, extensions_dir, jobs=jobs)
+    elif locked is not None:
+        print(f"Installing extensions pinned in {os.path.basename(EXTENSIONS_LOCK)}...")
+        installed = install_locked_extensions(locked, extensions_dir, jobs=jobs)
+    else:
+        # Download and install marketplace extensions directly (no Electron CLI needed)
+        print("Downloading marketplace extensions...")
+        installed = install_marketplace_extensions(
+            extensions, excluded, extensions_dir, jobs=jobs, target_platform=target_platform, records=records
+        )
+
+    write_extensions_manifest(extensions_dir, installed.values())
+    report_vsix_stats()
+    return installed
+
+
+def write_extensions_manifest(extensions_dir, entries):
+    """Write VS Code's installed-extensions registry, ``extensions.json``, for ``entries``.
+
+    VS Code only loads the extensions listed in this file. Without it, the first
+    start scans the directory and writes it; shipping it spares that scan. Entries
+    record their location relative to the extensions directory only, so the file
+    stays valid wherever the directory is installed or linked to.
+
+    Args:
+        extensions_dir: Directory the extensions were installed into
+        entries: Install entries (get_extension_info() results or extensions.lock
+            entries) of the installed extensions
+
+    Returns:
+        Path to the written file
+    """
+    installed_timestamp = int(time.time() * 1000)
+    registry = []
+    for entry in entries:
+        dir_name = f"{entry['publisher']}.{entry['name']}-{entry['version']}"
+        with open(os.path.join(extensions_dir, dir_name, "package.json"), encoding="utf-8") as f:
+            package = json.load(f)
+
+        identifier = {"id": f"{package['publisher']}.{package['name']}"}
+        metadata = {
+            "installedTimestamp": installed_timestamp,
+            "source": "gallery",
+            "pinned": False,
+            "updated": False,
+            "isPreReleaseVersion": bool(entry.get("pre_release")),
+            "preRelease": bool(entry.get("pre_release")),
+        }
+        # Older extensions.lock files and mirrors do not record the gallery identity
+        if entry.get("uuid"):
+            identifier["uuid"] = entry["uuid"]
+            metadata["id"] = entry["uuid"]
+        if entry.get("publisher_id"):
+            metadata["publisherId"] = entry["publisher_id"]
+            metadata["publisherDisplayName"] = entry.get("publisher_display_name") or package["publisher"]
+        target_platform = entry.get("target_platform")
+        if not target_platform:
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(entry["vsix_url"]).query)
+            target_platform = query["targetPlatform"][0] if "targetPlatform" in query else None
+        if target_platform:
+            metadata["targetPlatform"] = target_platform
+
+        # "location" is required; VS Code resolves "relativeLocation" against the
+        # extensions directory and ignores a string "location" next to it
+        registry.append(
+            {
+                "identifier": identifier,
+                "version": package["version"],
+                "location": dir_name,
+                "relativeLocation": dir_name,
+                "metadata": metadata,
+            }
+        )
+
+    registry.sort(key=lambda item: item["relativeLocation"])
+    manifest_path = os.path.join(extensions_dir, "extensions.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+        f.write("\n")
+    print(f"  Registered {len(registry)} extensions in {os.path.basename(manifest_path)}")
+    return manifest_path
+
+
+def resolve_install_entries(extensions, excluded, target_platform, jobs=DEFAULT_JOBS, records=None):
+    """Resolve extensions.txt for one platform into install entries, dependencies first.
+
+    The entries have the extensions.lock format, without the ``sha256`` field.
+
+    Raises:
+        Exception: An extension or dependency could not be resolved
+    """
+    print(f"Resolving extensions for {target_platform}...")
+    infos = resolve_extensions(extensions, excluded, jobs=jobs, target_platform=target_platform, records=records)
+    plan = plan_extension_install(extensions, excluded, infos)
+
+    missing = [ext_id for step, ext_id, _indent, _info in plan if step == "missing"]
+    if missing:
+        raise Exception(f"Could not resolve {', '.join(missing)} for {target_platform}")
+    return [dict(ext_info) for step, _ext_id, _indent, ext_info in plan if step == "install"]
+
+
+def lock_extensions(platforms=None, jobs=DEFAULT_JOBS):
+    """Resolve extensions.txt for each platform and write config/extensions.lock.
+
+    Every VSIX is downloaded once (through the download cache) to record its SHA-256;
+    VSIXes already in the cache take it from the cache index.
+    """
+    platforms = platforms or LOCK_PLATFORMS
+    extensions_file = os.path.join(CONFIG_DIR, "extensions.txt")
+    extensions, excluded = read_extensions_file(extensions_file)
+
+    locked = {}
+    records = {}  # Marketplace metadata is the same for every platform; query it once
+    for target_platform in platforms:
+        entries = resolve_install_entries(extensions, excluded, target_platform, jobs=jobs, records=records)
+        for entry in entries:
+            print(f"  {entry['id']} v{entry['version']}")
+        locked[target_platform] = entries
+
+    # Hash each distinct VSIX once; platform-independent packages share a URL
+    urls = sorted({entry["vsix_url"] for entries in locked.values() for entry in entries})
+    print(f"Hashing {len(urls)} VSIX packages...")
+
+    def hash_url(url):
+        if not CACHE_ENABLED:
+            path = fetch_to_cache(url)
+            digest = sha256_file(path)
+            os.remove(path)
+            return digest
+        # Cache blobs are named by their SHA-256, so only fresh downloads are hashed
+        # (by cache_store()); a cached VSIX is not even read
+        with _cache_index_lock():
+            entry = _load_cache_index().get(url)
+        if entry and os.path.exists(_cache_blob_path(entry["sha256"])):
+            return entry["sha256"]
+        return os.path.basename(fetch_to_cache(url))
+
+    with profile_thread_pool(max_workers=max(1, jobs)) as pool:
+        digests = dict(zip(urls, pool.map(hash_url, urls), strict=True))
+    for entries in locked.values():
+        for entry in entries:
+            entry["sha256"] = digests[entry["vsix_url"]]
+
+    lock = {
+        "lock_version": LOCK_FORMAT_VERSION,
+        "extensions_txt_sha256": sha256_file(extensions_file),
+        "platforms": locked,
+    }
+    with open(EXTENSIONS_LOCK, "w") as f:
+        json.dump(lock, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {EXTENSIONS_LOCK}")
+    return lock
+
+
+def load_extension_lock(extensions_file, target_platform):
+    """Return the locked install list for ``target_platform``, or None to resolve live.
+
+    The lock is ignored (with a warning) when it is missing the platform or was
+    generated from a different extensions.txt.
+    """
+    if not os.path.exists(EXTENSIONS_LOCK):
+        return None
+
+    with open(EXTENSIONS_LOCK) as f:
+        lock = json.load(f)
+
+    if lock.get("lock_version") != LOCK_FORMAT_VERSION:
+        print(f"Warning: Unsupported {os.path.basename(EXTENSIONS_LOCK)} format, resolving from marketplace")
+        return None
+    if lock.get("extensions_txt_sha256") != sha256_file(extensions_file):
+        print(
+            "Warning: extensions.lock is out of date with extensions.txt (run `pixi run lock`), resolving from marketplace"
+        )
+        return None
+    if target_platform not in lock.get("platforms", {}):
+        print(f"Warning: extensions.lock has no entries for {target_platform}, resolving from marketplace")
+        return None
+    return lock["platforms"][target_platform]
+
+
+def install_locked_extensions(entries, extensions_dir, jobs=DEFAULT_JOBS):
+    """Install the pinned VSIXes from a lock entry list, verifying each SHA-256.
+
+    ``entries`` are already in dependency order; each install still waits for its
+    dependencies, as in the marketplace path.
+
+    Returns:
+        Dict mapping the lower-cased ID of each installed extension to its install entry
+    """
+    futures = {}
+    with profile_thread_pool(max_workers=max(1, jobs)) as pool:
+        for entry in entries:
+            dep_futures = [futures[dep.lower()] for dep in entry["dependencies"] if dep.lower() in futures]
+            futures[entry["id"].lower()] = pool.submit(_install_after, dep_futures, entry, extensions_dir)
+
+    installed = {}
+    for entry in entries:
+        if futures[entry["id"].lower()].result():
+            print(f"  {entry['id']}... Installed v{entry['version']}")
+            installed[entry["id"].lower()] = entry
+        else:
+            print(f"  {entry['id']}... Failed to install")
+    return installed
+
+
+def install_marketplace_extensions(
+    extensions, excluded, extensions_dir, jobs=DEFAULT_JOBS, target_platform=None, records=None
+):
+    """Install marketplace extensions and their dependencies into ``extensions_dir``.
+
+    With ``jobs`` > 1 marketplace queries and VSIX downloads run on a worker pool;
+    otherwise extensions are resolved and installed one at a time. VSIXes are chosen
+    for ``target_platform`` (default: the build host's platform).
+
+    Returns:
+        Dict mapping the lower-cased ID of each installed extension to its install entry
+    """
+    if jobs > 1:
+        return _install_marketplace_extensions_parallel(
+            extensions, excluded, extensions_dir, jobs, target_platform=target_platform, records=records
+        )
+
     # Track installed/processing extensions to avoid duplicates and circular deps
-    installed = set()
+    installed = {}
     processing = set()  # Track extensions currently being processed to detect cycles
 
     def install_with_dependencies(ext_id, indent=2):
@@ -524,7 +2969,7 @@ def install_extensions(install_dir, data_dir):
         processing.add(ext_id_lower)
 
         print(f"{' ' * indent}{ext_id}...")
-        ext_info = get_extension_info(ext_id)
+        ext_info = get_extension_info(ext_id, target_platform)
         if not ext_info:
             print(f"{' ' * indent}  Could not find in marketplace")
             processing.discard(ext_id_lower)
@@ -539,7 +2984,7 @@ def install_extensions(install_dir, data_dir):
         # Install the extension itself
         if download_and_install_vsix(ext_info, extensions_dir):
             print(f"{' ' * indent}  Installed v{ext_info['version']}")
-            installed.add(ext_id_lower)
+            installed[ext_id_lower] = ext_info
             processing.discard(ext_id_lower)
             return True
         else:
@@ -547,24 +2992,801 @@ def install_extensions(install_dir, data_dir):
             processing.discard(ext_id_lower)
             return False
 
-    # Download and install marketplace extensions directly (no Electron CLI needed)
-    print("Downloading marketplace extensions...")
     for ext in extensions:
         install_with_dependencies(ext)
+    return installed
+
+
+def resolve_extensions(extensions, excluded, jobs=DEFAULT_JOBS, target_platform=None, records=None):
+    """Resolve ``extensions`` and their transitive dependencies from the marketplace.
+
+    The dependency closure is walked breadth-first with one batched
+    ``extensionquery`` request per dependency level. VSIX URLs are chosen for
+    ``target_platform`` (default: the build host's platform). ``records`` shares
+    marketplace records between resolutions, see get_extension_infos().
+
+    Returns:
+        Dict mapping lower-cased extension ID to its get_extension_info() result
+        (None when the marketplace does not know the extension)
+    """
+    infos = {}
+    level = extensions
+    while level:
+        batch = {}
+        for ext_id in level:
+            ext_id_lower = ext_id.lower()
+            if ext_id_lower not in excluded and ext_id_lower not in infos:
+                batch.setdefault(ext_id_lower, ext_id)
+        if not batch:
+            break
+
+        infos.update(
+            get_extension_infos(list(batch.values()), jobs=jobs, target_platform=target_platform, records=records)
+        )
+        level = [dep for ext_id_lower in batch for dep in (infos[ext_id_lower] or {}).get("dependencies", [])]
+
+    return infos
+
+
+def plan_extension_install(extensions, excluded, infos):
+    """Replay the sequential dependency walk over already-resolved extension metadata.
+
+    Returns:
+        List of ``(step, ext_id, indent, ext_info)`` tuples in the order the sequential
+        installer would print and install them, where ``step`` is one of "excluded",
+        "visit", "missing" or "install". Dependencies always precede their dependents.
+    """
+    plan = []
+    planned = set()
+    processing = set()
+
+    def visit(ext_id, indent=2):
+        ext_id_lower = ext_id.lower()
+        if ext_id_lower in excluded:
+            plan.append(("excluded", ext_id, indent, None))
+            return
+        if ext_id_lower in planned or ext_id_lower in processing:
+            return
+
+        processing.add(ext_id_lower)
+        plan.append(("visit", ext_id, indent, None))
+        ext_info = infos.get(ext_id_lower)
+        if not ext_info:
+            plan.append(("missing", ext_id, indent, None))
+            processing.discard(ext_id_lower)
+            return
+
+        for dep in ext_info.get("dependencies", []):
+            dep_lower = dep.lower()
+            if dep_lower not in excluded and dep_lower not in planned and dep_lower not in processing:
+                visit(dep, indent + 2)
+
+        plan.append(("install", ext_id, indent, ext_info))
+        planned.add(ext_id_lower)
+        processing.discard(ext_id_lower)
+
+    for ext in extensions:
+        visit(ext)
+    return plan
+
+
+def _install_after(dep_futures, ext_info, extensions_dir):
+    """Install one extension once all of its dependencies have finished installing."""
+    wait(dep_futures)
+    return download_and_install_vsix(ext_info, extensions_dir)
+
+
+def _install_marketplace_extensions_parallel(
+    extensions, excluded, extensions_dir, jobs, target_platform=None, records=None
+):
+    infos = resolve_extensions(extensions, excluded, jobs=jobs, target_platform=target_platform, records=records)
+    plan = plan_extension_install(extensions, excluded, infos)
+
+    # Futures are submitted in plan order, so every dependency is queued ahead of its
+    # dependents and waiting on it inside a worker cannot deadlock the pool.
+    futures = {}
+    with profile_thread_pool(max_workers=jobs) as pool:
+        for step, ext_id, _indent, ext_info in plan:
+            if step != "install":
+                continue
+            dep_futures = [futures[dep.lower()] for dep in ext_info["dependencies"] if dep.lower() in futures]
+            futures[ext_id.lower()] = pool.submit(_install_after, dep_futures, ext_info, extensions_dir)
+
+    # Report in the same shape as the sequential installer
+    installed = {}
+    for step, ext_id, indent, ext_info in plan:
+        if step == "excluded":
+            print(f"{' ' * indent}{ext_id}... (excluded)")
+        elif step == "visit":
+            print(f"{' ' * indent}{ext_id}...")
+        elif step == "missing":
+            print(f"{' ' * indent}  Could not find in marketplace")
+        elif futures[ext_id.lower()].result():
+            print(f"{' ' * indent}  Installed v{ext_info['version']}")
+            installed[ext_id.lower()] = ext_info
+        else:
+            print(f"{' ' * indent}  Failed to install")
+    return installed
+
+
+def read_remote_default_extensions(settings_path=None):
+    """Return ``remote.SSH.defaultExtensions`` from config/settings.json (empty if unset)."""
+    settings_path = settings_path or os.path.join(CONFIG_DIR, "settings.json")
+    if not os.path.exists(settings_path):
+        return []
+    with open(settings_path) as f:
+        return json.load(f).get("remote.SSH.defaultExtensions", [])
+
+
+def resolve_remote_extensions(jobs=DEFAULT_JOBS, use_lock=True, records=None):
+    """Resolve the remote default extensions for REMOTE_PLATFORM into install entries.
+
+    The entries are taken from config/extensions.lock when it pins all of them and
+    their dependencies (extensions.txt usually covers them), and resolved from the
+    marketplace otherwise. Exclusions in extensions.txt apply.
+
+    Returns:
+        List of install entries, dependencies first
+    """
+    default_extensions = read_remote_default_extensions()
+    if not default_extensions:
+        return []
+    extensions_file = os.path.join(CONFIG_DIR, "extensions.txt")
+    _extensions, excluded = read_extensions_file(extensions_file)
+
+    locked = load_extension_lock(extensions_file, REMOTE_PLATFORM) if use_lock else None
+    if locked is not None:
+        by_id = {entry["id"].lower(): entry for entry in locked}
+        needed = set()
+        pending = [ext_id.lower() for ext_id in default_extensions]
+        while pending:
+            ext_id = pending.pop()
+            if ext_id in needed or ext_id in excluded or ext_id not in by_id:
+                continue
+            needed.add(ext_id)
+            pending.extend(dep.lower() for dep in by_id[ext_id]["dependencies"])
+        if all(ext_id.lower() in needed or ext_id.lower() in excluded for ext_id in default_extensions):
+            return [entry for entry in locked if entry["id"].lower() in needed]
+        print(f"{os.path.basename(EXTENSIONS_LOCK)} does not pin every remote default extension")
+
+    return resolve_install_entries(default_extensions, excluded, REMOTE_PLATFORM, jobs=jobs, records=records)
+
+
+def stage_remote_server(remote_dir, commit, archives, entries):
+    """Put the VS Code Server of ``commit`` and the remote default extensions into ``remote_dir``.
+
+    stage_remote_server.sh, copied along, installs them on a Remote-SSH host, so the
+    first connect neither downloads the server nor installs extensions from the
+    marketplace there.
+
+    Args:
+        remote_dir: Directory to (re)create, usually <install>/remote-server
+        commit: VS Code commit the server must match (``commit`` in product.json)
+        archives: Dict mapping each REMOTE_ARCHIVES platform ID to its ``(url, sha256)``;
+            the SHA-256 may be None
+        entries: Install entries of the VSIXes, dependencies first
+    """
+    if os.path.exists(remote_dir):
+        shutil.rmtree(remote_dir)
+    os.makedirs(os.path.join(remote_dir, "extensions"))
+
+    for server_platform, filename in REMOTE_ARCHIVES.items():
+        url, sha256 = archives[server_platform]
+        download_file(url, os.path.join(remote_dir, filename), sha256=sha256, label=f"VS Code {server_platform}")
+
+    # VS Code names extension directories in lower case; the remote installer
+    # looks for them by VSIX name
+    vsix_names = []
+    for entry in entries:
+        name = f"{entry['publisher']}.{entry['name']}-{entry['version']}.vsix".lower()
+        download_file(
+            entry["vsix_url"],
+            os.path.join(remote_dir, "extensions", name),
+            sha256=entry.get("sha256"),
+            label=entry["id"],
+        )
+        vsix_names.append(name)
+
+    with open(os.path.join(remote_dir, "commit"), "w") as f:
+        f.write(commit + "\n")
+    with open(os.path.join(remote_dir, "extensions.txt"), "w") as f:
+        f.writelines(name + "\n" for name in vsix_names)
+    for script in REMOTE_STAGE_SCRIPTS:
+        dest = os.path.join(remote_dir, script)
+        shutil.copy(os.path.join(os.path.dirname(__file__), script), dest)
+        os.chmod(dest, 0o755)
+    size = sum(
+        os.path.getsize(os.path.join(root, name)) for root, _dirs, files in os.walk(remote_dir) for name in files
+    )
+    print(
+        f"  Staged VS Code Server {commit[:10]} and {len(vsix_names)} remote extensions ({size / (1024 * 1024):.1f} MB)"
+    )
+
+
+def mirror_url(mirror, rel_path):
+    """Return the URL of ``rel_path`` in a mirror given as a directory or an http(s) URL."""
+    if mirror.startswith(("http://", "https://")):
+        return mirror.rstrip("/") + "/" + urllib.parse.quote(rel_path)
+    return "file://" + urllib.request.pathname2url(os.path.abspath(os.path.join(mirror, rel_path)))
+
+
+def _file_url_path(url):
+    """Return the local path of a ``file://`` URL, or None for any other URL."""
+    parsed = urllib.parse.urlsplit(url)
+    return urllib.request.url2pathname(parsed.path) if parsed.scheme == "file" else None
+
+
+def load_mirror_index(mirror):
+    """Read ``mirror.json`` from a mirror directory or URL (see create_mirror())."""
+    if mirror.startswith(("http://", "https://")):
+        with http_request(mirror_url(mirror, MIRROR_INDEX)) as response:
+            index = json.loads(response.read().decode())
+    else:
+        with open(os.path.join(mirror, MIRROR_INDEX)) as f:
+            index = json.load(f)
+    if index.get("mirror_format") != MIRROR_FORMAT:
+        raise Exception(f"Unsupported mirror format {index.get('mirror_format')!r} in {mirror}")
+    return index
+
+
+def create_mirror(mirror_dir, platforms=None, jobs=DEFAULT_JOBS, use_lock=True, remote=False):
+    """Download everything a build needs into ``mirror_dir``, for builds without internet access.
+
+    For each platform the mirror holds the VS Code archive and the VSIX of every
+    extension to install (pinned by config/extensions.lock when it is current, else
+    resolved from the marketplace), plus one orion-launcher build so that npm is not
+    needed either, and the Remote-SSH server payload (see stage_remote_server()).
+    ``mirror.json`` indexes them with their SHA-256 and the resolved
+    extension metadata. Files are hardlinked from the download cache where possible.
+    Running the command again updates the mirror in place and removes files it no
+    longer needs. Build from it with ``--mirror DIR``, or serve the directory over
+    HTTP and use ``--mirror URL``.
+
+    Args:
+        mirror_dir: Mirror directory, created if needed
+        platforms: Target platforms to mirror (default: LOCK_PLATFORMS)
+        jobs: Concurrent downloads
+        use_lock: Mirror the extensions pinned in config/extensions.lock
+        remote: Mirror the VS Code Server and the remote default extensions
+
+    Returns:
+        The index written to ``mirror.json``
+    """
+    platforms = platforms or LOCK_PLATFORMS
+    os.makedirs(mirror_dir, exist_ok=True)
+    extensions_file = os.path.join(CONFIG_DIR, "extensions.txt")
+    extensions, excluded = read_extensions_file(extensions_file)
+    version = get_latest_version()
+
+    def place(path, rel_path):
+        dest = os.path.join(mirror_dir, rel_path)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(path, dest)
+        except OSError:
+            shutil.copyfile(path, dest)
+        if not CACHE_ENABLED:
+            os.remove(path)
+
+    index = {
+        "mirror_format": MIRROR_FORMAT,
+        "extensions_txt_sha256": sha256_file(extensions_file),
+        "vscode": {"version": version, "platforms": {}},
+        "extensions": {},
+    }
+    for target_platform in platforms:
+        vscode_platform = VSCODE_PLATFORMS[target_platform]
+        release = get_release_info(version, vscode_platform)
+        url = release["url"] if release else get_download_url(version, vscode_platform)
+        print(f"Mirroring VS Code {version} for {target_platform}...")
+        path = fetch_to_cache(url, sha256=release["sha256hash"] if release else None)
+        rel_path = (
+            f"vscode/{version}/{target_platform}/vscode{'.zip' if target_platform.startswith('darwin') else '.tar.gz'}"
+        )
+        index["vscode"]["platforms"][target_platform] = {"path": rel_path, "sha256": sha256_file(path), "url": url}
+        place(path, rel_path)
+
+    records = {}
+    for target_platform in platforms:
+        entries = load_extension_lock(extensions_file, target_platform) if use_lock else None
+        if entries is None:
+            entries = resolve_install_entries(extensions, excluded, target_platform, jobs=jobs, records=records)
+        index["extensions"][target_platform] = [dict(entry) for entry in entries]
+    mirrored_entries = [entry for entries in index["extensions"].values() for entry in entries]
+
+    if remote:
+        index["remote"] = {"archives": {}, "extensions": []}
+        for server_platform, filename in REMOTE_ARCHIVES.items():
+            release = get_release_info(version, server_platform)
+            url = release["url"] if release else get_download_url(version, server_platform)
+            print(f"Mirroring VS Code {version} {server_platform}...")
+            path = fetch_to_cache(url, sha256=release["sha256hash"] if release else None)
+            rel_path = f"remote/{version}/{filename}"
+            index["remote"]["archives"][server_platform] = {"path": rel_path, "sha256": sha256_file(path), "url": url}
+            place(path, rel_path)
+        entries = resolve_remote_extensions(jobs=jobs, use_lock=use_lock, records=records)
+        index["remote"]["extensions"] = [dict(entry) for entry in entries]
+        mirrored_entries += index["remote"]["extensions"]
+
+    # Each distinct VSIX once; platform-independent packages share a URL
+    vsixes = {entry["vsix_url"]: entry for entry in mirrored_entries}
+    print(f"Mirroring {len(vsixes)} VSIX packages...")
+
+    def mirror_vsix(entry):
+        path = fetch_to_cache(entry["vsix_url"], sha256=entry.get("sha256"))
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(entry["vsix_url"]).query)
+        suffix = f"@{query['targetPlatform'][0]}" if "targetPlatform" in query else ""
+        rel_path = f"extensions/{entry['publisher']}.{entry['name']}-{entry['version']}{suffix}.vsix"
+        digest = entry.get("sha256") or sha256_file(path)
+        place(path, rel_path)
+        return rel_path, digest
+
+    with profile_thread_pool(max_workers=max(1, jobs)) as pool:
+        placed = dict(zip(vsixes, pool.map(mirror_vsix, vsixes.values()), strict=True))
+    for entry in mirrored_entries:
+        entry["path"], entry["sha256"] = placed[entry["vsix_url"]]
+
+    # The orion-launcher build runs npm, which an offline host cannot
+    print("Building orion-launcher for the mirror...")
+    launcher_path = "launcher/orion-launcher.tar"
+    os.makedirs(os.path.join(mirror_dir, "launcher"), exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        install_orion_launcher(tmp_dir)
+        with tarfile.open(os.path.join(mirror_dir, launcher_path), "w") as tar:
+            tar.add(get_launcher_target_dir(tmp_dir), arcname=".")
+    index["launcher"] = {
+        "key": launcher_cache_key(),
+        "path": launcher_path,
+        "sha256": sha256_file(os.path.join(mirror_dir, launcher_path)),
+    }
+
+    # Files from earlier runs that this index no longer references
+    referenced = {
+        os.path.normpath(os.path.join(mirror_dir, item["path"])) for item in index["vscode"]["platforms"].values()
+    }
+    referenced.update(os.path.normpath(os.path.join(mirror_dir, entry["path"])) for entry in vsixes.values())
+    referenced.add(os.path.normpath(os.path.join(mirror_dir, launcher_path)))
+    referenced.update(
+        os.path.normpath(os.path.join(mirror_dir, item["path"]))
+        for item in index.get("remote", {}).get("archives", {}).values()
+    )
+    for subdir in ("vscode", "extensions", "launcher", "remote"):
+        for dirpath, _dirs, files in os.walk(os.path.join(mirror_dir, subdir), topdown=False):
+            for name in files:
+                if os.path.join(dirpath, name) not in referenced:
+                    os.remove(os.path.join(dirpath, name))
+            if not os.listdir(dirpath):
+                os.rmdir(dirpath)
+
+    fd, tmp_path = tempfile.mkstemp(dir=mirror_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(index, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, os.path.join(mirror_dir, MIRROR_INDEX))
+    total = sum(os.path.getsize(path) for path in referenced)
+    print(f"Mirror written to {mirror_dir}: {len(referenced)} files, {total / (1024 * 1024):.1f} MB")
+    return index
+
+
+def seed_launcher_from_mirror(mirror, index):
+    """Put the mirror's orion-launcher build into the download cache.
+
+    install_orion_launcher() then unpacks it instead of running npm. Nothing is done
+    when the mirror was made from different launcher sources.
+    """
+    entry = index.get("launcher")
+    key = launcher_cache_key()
+    if not entry or not CACHE_ENABLED:
+        return
+    if entry["key"] != key:
+        print("Warning: the mirror's orion-launcher build is for other sources; it will be built with npm")
+        return
+    if _cache_get(key, entry["sha256"]):
+        return
+    url = mirror_url(mirror, entry["path"])
+    local_path = _file_url_path(url)
+    if not local_path:
+        fetch_to_cache(url, key=key, sha256=entry["sha256"])
+        return
+    staging_dir = os.path.join(CACHE_DIR, "tmp")
+    os.makedirs(staging_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=staging_dir, suffix=".tar")
+    with os.fdopen(fd, "wb") as f, open(local_path, "rb") as src:
+        shutil.copyfileobj(src, f)
+    if sha256_file(tmp_path) != entry["sha256"]:
+        os.remove(tmp_path)
+        raise ValueError(f"SHA-256 mismatch for {local_path}")
+    cache_store(key, tmp_path, digest=entry["sha256"])
+
+
+def _optional_sha256(path):
+    return sha256_file(path) if os.path.exists(path) else None
+
+
+def hash_tree(path, ignore=()):
+    """Return a SHA-256 over the relative paths and contents of every file under ``path``.
+
+    Directories named in ``ignore`` are skipped at any depth.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in ignore)
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode())
+            digest.update(sha256_file(file_path).encode())
+    return digest.hexdigest()
+
+
+def fingerprint_outputs(paths):
+    """Return a cheap change fingerprint of stage outputs.
+
+    Covers the relative path, size and mtime of every file under ``paths``, so an
+    output that was deleted or touched since the last build is noticed without
+    re-hashing hundreds of MB.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        if not os.path.lexists(path):
+            digest.update(b"<missing>")
+            continue
+        entries = [path]
+        if os.path.isdir(path) and not os.path.islink(path):
+            entries = []
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                entries.extend(os.path.join(root, name) for name in sorted(files))
+        for entry in entries:
+            st = os.lstat(entry)
+            digest.update(f"{os.path.relpath(entry, path)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def load_build_manifest(path=None):
+    try:
+        with open(path or BUILD_MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault("stages", {})
+    return manifest
+
+
+def save_build_manifest(manifest, path=None):
+    path = path or BUILD_MANIFEST
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def run_stage(manifest, name, inputs, outputs, func, incremental=False, manifest_path=None, label=None):
+    """Run one build stage and record it in the build manifest.
+
+    In incremental mode the stage is skipped when its inputs hash to the value
+    recorded by the previous build and its outputs are unchanged since then.
+    ``manifest_path`` defaults to BUILD_MANIFEST; ``label`` (default: ``name``)
+    names the stage in the log and the build profile.
+
+    Returns:
+        True if the stage ran, False if it was skipped
+    """
+    input_hash = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+    previous = manifest["stages"].get(name)
+    if (
+        incremental
+        and previous
+        and previous["inputs"] == input_hash
+        and all(os.path.lexists(path) for path in outputs)
+        and previous["outputs"] == fingerprint_outputs(outputs)
+    ):
+        print(f"[{label or name}] Up to date, skipping")
+        with profile_span(label or name, "stage", skipped=True):
+            pass
+        return False
+
+    print(f"[{label or name}] Running...")
+    start = time.perf_counter()
+    with profile_span(label or name, "stage"):
+        func()
+    manifest["stages"][name] = {
+        "inputs": input_hash,
+        "outputs": fingerprint_outputs(outputs),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    save_build_manifest(manifest, manifest_path)
+    return True
+
+
+def upstream_stages(manifest):
+    """Return the recorded state of every stage except packaging, as packaging input."""
+    return {
+        name: [entry["inputs"], entry["outputs"]]
+        for name, entry in manifest["stages"].items()
+        if name not in PACKAGING_STAGES
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build Orion Studio from the official VS Code distribution.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="build",
+        choices=["build", "lock", "mirror"],
+        help="build: build Orion Studio (default); lock: pin extension versions in config/extensions.lock; "
+        "mirror: download everything a build needs into the --mirror directory",
+    )
+    parser.add_argument(
+        "--mirror",
+        metavar="PATH|URL",
+        help="Build from a mirror made by the mirror command (a directory, or its URL on an HTTP "
+        "server) instead of the update server and marketplace; with the mirror command, the directory to write",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=CACHE_DIR,
+        help="Persistent download cache for VS Code archives and VSIX packages (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=CACHE_MAX_BYTES // (1024 * 1024),
+        help="Size limit for the download cache; least recently used entries are evicted (default: %(default)s)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Always download, never read or write the cache")
+    parser.add_argument(
+        "--metadata-ttl",
+        type=int,
+        default=METADATA_TTL,
+        help="Seconds a cached marketplace or update-server response is used before it is "
+        "revalidated (default: %(default)s; also ORION_METADATA_TTL)",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        default=os.environ.get("ORION_OFFLINE", "0") != "0",
+        help="Build from the download and metadata caches only, without network access (also ORION_OFFLINE=1)",
+    )
+    parser.add_argument(
+        "--verify-tls",
+        action="store_true",
+        default=os.environ.get("ORION_VERIFY_TLS", "0") != "0",
+        help="Verify TLS certificates of upstream servers (off by default; also ORION_VERIFY_TLS=1)",
+    )
+    parser.add_argument(
+        "--ca-bundle",
+        default=HTTP_CA_BUNDLE,
+        help="CA certificates to verify TLS against, e.g. a site proxy's; implies --verify-tls "
+        "(default: ORION_CA_BUNDLE or the system store)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help="Concurrent marketplace queries and VSIX downloads; 1 installs sequentially (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-lock",
+        action="store_true",
+        help="Ignore config/extensions.lock and resolve extensions from the marketplace",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Keep build/ and dist/ and rerun only the stages whose inputs changed since the last build",
+    )
+    parser.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help="Do not hardlink identical files across bundled extensions and VS Code before packaging",
+    )
+    parser.add_argument(
+        "--no-prune",
+        action="store_true",
+        help="Ship every file of the bundled extensions and VS Code, ignoring config/prune.txt",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=sorted(COMPRESSION_FORMATS),
+        default="gzip",
+        help="Linux tarball compression (default: %(default)s)",
+    )
+    parser.add_argument("--compression-level", type=int, help="Compression level (default: per format)")
+    parser.add_argument("--compression-threads", type=int, help="Compression threads (default: all CPUs)")
+    parser.add_argument(
+        "--prefetch-env",
+        nargs="?",
+        const=DEFAULT_NOTEBOOK_REPO,
+        metavar="REPO_URL",
+        help="Bundle the conda packages pinned by the pixi.lock of a notebook repository "
+        f"(default: {DEFAULT_NOTEBOOK_REPO}) so that its first pixi install works offline",
+    )
+    parser.add_argument(
+        "--remote-server",
+        action="store_true",
+        help="Bundle the VS Code Server and remote.SSH.defaultExtensions VSIXes for Remote-SSH hosts "
+        "(about 200 MB; the Linux release build does)",
+    )
+    parser.add_argument(
+        "--delta-from",
+        metavar="DIR",
+        help="Directory with the previous release's assets; for every Linux tarball whose "
+        "<artifact>.manifest.json is there, also write a delta update package from that release",
+    )
+    parser.add_argument(
+        "--targets",
+        type=lambda value: [target.strip() for target in value.split(",") if target.strip()],
+        help=f"Comma-separated Linux platforms to cross-build concurrently ({', '.join(CROSS_BUILD_TARGETS)}); "
+        "each produces dist/OrionStudio-<target> tarball (default: build for the host only)",
+    )
+    parser.add_argument(
+        "--platforms",
+        default=",".join(LOCK_PLATFORMS),
+        help="Comma-separated platforms to record with the lock and mirror commands (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    for target in args.targets or []:
+        if target not in CROSS_BUILD_TARGETS:
+            parser.error(f"unsupported target {target!r} (choose from {', '.join(CROSS_BUILD_TARGETS)})")
+    if args.command == "mirror" and (not args.mirror or args.mirror.startswith(("http://", "https://"))):
+        parser.error("the mirror command needs --mirror DIR, the directory to write the mirror to")
+    if args.offline and args.no_cache:
+        parser.error("--offline builds from the cache and cannot be combined with --no-cache")
+    return args
+
+
+def main(argv=None):
+    global CACHE_DIR, CACHE_MAX_BYTES, CACHE_ENABLED, HTTP_VERIFY_TLS, HTTP_CA_BUNDLE, _http_tls_context
+    global METADATA_TTL, OFFLINE
+
+    args = parse_args(argv)
+    CACHE_DIR = os.path.abspath(args.cache_dir)
+    CACHE_MAX_BYTES = args.cache_max_mb * 1024 * 1024
+    CACHE_ENABLED = not args.no_cache
+    # A lockfile should pin what the marketplace serves now, so the lock command
+    # revalidates every cached response (cheap when the server answers 304)
+    METADATA_TTL = 0 if args.command == "lock" else args.metadata_ttl
+    OFFLINE = args.offline
+    HTTP_VERIFY_TLS = args.verify_tls
+    HTTP_CA_BUNDLE = args.ca_bundle
+    # Every build starts with fresh connections under the policy just set
+    close_http_pools()
+    _http_tls_context = None
+
+    if args.command == "lock":
+        lock_extensions(platforms=[p.strip() for p in args.platforms.split(",") if p.strip()], jobs=args.jobs)
+        return
+    if args.command == "mirror":
+        create_mirror(
+            args.mirror,
+            platforms=[p.strip() for p in args.platforms.split(",") if p.strip()],
+            jobs=args.jobs,
+            use_lock=not args.no_lock,
+            remote=args.remote_server,
+        )
+        return
+
+    with _profile_lock:
+        _profile.update(start=time.perf_counter(), spans=[], counters=dict.fromkeys(PROFILE_COUNTERS, 0))
+    # The profile is written even when the build fails, to show where it got to
+    try:
+        if args.targets:
+            build_targets(args)
+        else:
+            build(args)
+    finally:
+        write_build_profile(
+            command=" ".join(["build_orion.py"] + (argv if argv is not None else sys.argv[1:])),
+            platform=",".join(args.targets) if args.targets else get_target_platform(),
+            incremental=args.incremental,
+        )
 
 
-def main():
-    # Clean build dir
-    if os.path.exists(BUILD_DIR):
-        shutil.rmtree(BUILD_DIR)
-    os.makedirs(BUILD_DIR)
+def build_targets(args):
+    """Cross-build Linux tarballs for every platform in ``args.targets`` concurrently.
 
-    if os.path.exists(DIST_DIR):
-        shutil.rmtree(DIST_DIR)
-    os.makedirs(DIST_DIR)
+    The targets share one VS Code version lookup, one set of marketplace records,
+    one orion-launcher bundle and the download cache (platform-independent VSIXes
+    are downloaded once). Each target stages in its own ``build/<target>`` and
+    ``dist/<target>`` directories and produces ``dist/OrionStudio-<target>.tar.gz``.
+    """
+    if platform.system() != "Linux":
+        raise Exception("--targets cross-builds Linux tarballs and needs a Linux build host")
+
+    incremental = args.incremental
+    if not incremental:
+        for path in (BUILD_DIR, DIST_DIR):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    os.makedirs(DIST_DIR, exist_ok=True)
+
+    # A mirror pins the VS Code version itself
+    version = None if args.mirror else get_latest_version()
+    records = {}
+    launcher_lock = threading.Lock()
+    launcher_built = []
+
+    def build_launcher_once():
+        with launcher_lock:
+            if not launcher_built:
+                build_orion_launcher()
+                launcher_built.append(True)
+
+    def build_target(target):
+        with profile_scope():
+            return build(args, target=target, version=version, records=records, build_launcher=build_launcher_once)
+
+    print(f"Building {', '.join(args.targets)} in parallel...")
+    with ThreadPoolExecutor(max_workers=len(args.targets)) as pool:
+        futures = {target: pool.submit(build_target, target) for target in args.targets}
+    failed = [target for target, future in futures.items() if future.exception()]
+    for target in failed:
+        print(f"[{target}] Build failed: {futures[target].exception()}")
+    if failed:
+        raise futures[failed[0]].exception()
+    print(f"All targets built: {', '.join(futures[target].result() for target in args.targets)}")
+
+
+def build(args, target=None, version=None, records=None, build_launcher=None):
+    """Run the build stages for the parsed command-line ``args``.
+
+    By default this builds for the host platform in BUILD_DIR and DIST_DIR. With
+    ``target`` (set by build_targets()), it builds the Linux ``target`` platform in
+    ``build/<target>`` and ``dist/<target>`` instead, using the given VS Code
+    ``version``, shared marketplace ``records`` and ``build_launcher`` callable.
 
-    # Download
-    url = get_download_url()
+    Returns:
+        Path to the packaged artifact
+    """
+    incremental = args.incremental
+    build_dir = os.path.join(BUILD_DIR, target) if target else BUILD_DIR
+    dist_dir = os.path.join(DIST_DIR, target) if target else DIST_DIR
+    manifest_path = os.path.join(build_dir, os.path.basename(BUILD_MANIFEST)) if target else BUILD_MANIFEST
+    manifest = load_build_manifest(manifest_path) if incremental else {"stages": {}}
+    target_platform = target or get_target_platform()
+
+    # Clean build dir (incremental builds keep build/ and dist/ and rerun only stale stages)
+    if not incremental and not target:
+        if os.path.exists(BUILD_DIR):
+            shutil.rmtree(BUILD_DIR)
+        if os.path.exists(DIST_DIR):
+            shutil.rmtree(DIST_DIR)
+    os.makedirs(build_dir, exist_ok=True)
+    os.makedirs(dist_dir, exist_ok=True)
+
+    def stage(name, inputs, outputs, func):
+        return run_stage(
+            manifest,
+            name,
+            inputs,
+            outputs,
+            func,
+            incremental=incremental,
+            manifest_path=manifest_path,
+            label=f"{target} {name}" if target else None,
+        )
+
+    # Download (from the mirror, when building from one)
+    mirror = load_mirror_index(args.mirror) if args.mirror else None
+    if mirror:
+        archive = mirror["vscode"]["platforms"].get(target_platform)
+        if not archive:
+            raise Exception(f"The mirror at {args.mirror} has no VS Code archive for {target_platform}")
+        version = mirror["vscode"]["version"]
+        url = mirror_url(args.mirror, archive["path"])
+        archive_sha256 = archive["sha256"]
+        seed_launcher_from_mirror(args.mirror, mirror)
+    else:
+        version = version or get_latest_version()
+        release = get_release_info(version, target)
+        url = release["url"] if release else get_download_url(version, target)
+        archive_sha256 = release["sha256hash"] if release else None
+    manifest["vscode_version"] = version
 
     # Determine filename based on platform
     if platform.system() == "Darwin":
@@ -572,39 +3794,150 @@ def main():
     else:
         filename = "vscode.tar.gz"
 
-    download_path = os.path.join(BUILD_DIR, filename)
-    download_file(url, download_path)
+    download_path = os.path.join(build_dir, filename)
+    stage(
+        "download",
+        {"url": url, "sha256": archive_sha256},
+        [download_path],
+        lambda: download_file(url, download_path, sha256=archive_sha256),
+    )
+    archive_sha256 = archive_sha256 or sha256_file(download_path)
+
+    extract_dir = os.path.join(build_dir, "extracted")
+    launcher_src = os.path.join(os.path.dirname(__file__), "launch_orion.sh")
+    materializer_src = os.path.join(os.path.dirname(__file__), "materialize_data_template.sh")
+    apply_delta_src = os.path.join(os.path.dirname(__file__), "apply_delta.py")
+    settings_src = os.path.join(CONFIG_DIR, "settings.json")
+    extensions_file = os.path.join(CONFIG_DIR, "extensions.txt")
+    prune_inputs = None if args.no_prune else _optional_sha256(PRUNE_CONFIG)
+    mirror_entries = None
+    if mirror:
+        if target_platform not in mirror["extensions"]:
+            raise Exception(f"The mirror at {args.mirror} has no extensions for {target_platform}")
+        if mirror.get("extensions_txt_sha256") != _optional_sha256(extensions_file):
+            print("Warning: the mirror was made from a different extensions.txt; installing the mirrored extensions")
+        mirror_entries = [
+            {**entry, "vsix_url": mirror_url(args.mirror, entry["path"])}
+            for entry in mirror["extensions"][target_platform]
+        ]
+    extensions_inputs = {
+        "extensions_txt": _optional_sha256(extensions_file),
+        "extensions_lock": _optional_sha256(EXTENSIONS_LOCK),
+        "use_lock": not args.no_lock,
+        "platform": target_platform,
+        "dedupe": not args.no_dedupe,
+        "prune": prune_inputs,
+        "mirror": [entry["sha256"] for entry in mirror_entries] if mirror_entries is not None else None,
+    }
+
+    def install_and_dedupe(data_dir, app_dir):
+        install_extensions(
+            data_dir,
+            jobs=args.jobs,
+            use_lock=not args.no_lock,
+            target_platform=target_platform,
+            records=records,
+            entries=mirror_entries,
+        )
+        # Pruning and deduplicating here, as part of the extensions stage, keeps them from
+        # invalidating the recorded fingerprint of the installed extensions
+        if not args.no_prune:
+            prune_payloads(os.path.join(data_dir, "extensions"), None, target_platform)
+        if not args.no_dedupe:
+            dedupe_files([os.path.join(data_dir, "extensions"), app_dir])
+
+    def prefetch_env(data_dir):
+        # Optional: mirror the notebook repository's conda packages into the portable
+        # data so that its first `pixi install` works offline
+        mirror_dir = os.path.join(data_dir, PIXI_MIRROR_DIR)
+        if not args.prefetch_env:
+            # Left over from an earlier incremental build with --prefetch-env
+            if os.path.exists(mirror_dir):
+                shutil.rmtree(mirror_dir)
+            manifest["stages"].pop("pixi-env", None)
+            return
+        stage(
+            "pixi-env",
+            {"repo": args.prefetch_env, "commit": git_head(args.prefetch_env), "platform": target_platform},
+            [mirror_dir],
+            lambda: prefetch_pixi_env(args.prefetch_env, mirror_dir, target_platform, build_dir, jobs=args.jobs),
+        )
+
+    def remote_server(install_dir, app_dir):
+        # The VS Code Server and the remote default extensions, for Remote-SSH hosts
+        remote_dir = os.path.join(install_dir, REMOTE_SERVER_DIR)
+        if not args.remote_server:
+            # Left over from an earlier incremental build
+            if os.path.exists(remote_dir):
+                shutil.rmtree(remote_dir)
+            manifest["stages"].pop("remote-server", None)
+            return
+        with open(os.path.join(app_dir, "product.json")) as f:
+            commit = json.load(f)["commit"]
+        if mirror:
+            if "remote" not in mirror:
+                raise Exception(
+                    f"The mirror at {args.mirror} has no VS Code Server; update it or build without --remote-server"
+                )
+            archives = {
+                server_platform: (mirror_url(args.mirror, item["path"]), item["sha256"])
+                for server_platform, item in mirror["remote"]["archives"].items()
+            }
+            entries = [
+                {**entry, "vsix_url": mirror_url(args.mirror, entry["path"])}
+                for entry in mirror["remote"]["extensions"]
+            ]
+        else:
+            archives = {}
+            for server_platform in REMOTE_ARCHIVES:
+                release = get_release_info(version, server_platform)
+                archives[server_platform] = (
+                    (release["url"], release["sha256hash"])
+                    if release
+                    else (f"{UPDATE_SERVER_URL}/commit:{commit}/{server_platform}/stable", None)
+                )
+            entries = resolve_remote_extensions(jobs=args.jobs, use_lock=not args.no_lock, records=records)
+        stage(
+            "remote-server",
+            {
+                "commit": commit,
+                # Content rather than URLs, so that a mirror and the upstream servers agree
+                "archives": {server_platform: sha256 or url for server_platform, (url, sha256) in archives.items()},
+                "extensions": [entry.get("sha256") or entry["vsix_url"] for entry in entries],
+                "scripts": [
+                    sha256_file(os.path.join(os.path.dirname(__file__), script)) for script in REMOTE_STAGE_SCRIPTS
+                ],
+            },
+            [remote_dir],
+            lambda: stage_remote_server(remote_dir, commit, archives, entries),
+        )
 
-    # Extract
-    extract_dir = os.path.join(BUILD_DIR, "extracted")
-    os.makedirs(extract_dir)
-    extract_file(download_path, extract_dir)
+    def extract():
+        # Extract
+        if os.path.exists(extract_dir):
+            shutil.rmtree(extract_dir)
+        os.makedirs(extract_dir)
+        extract_file(download_path, extract_dir)
 
     system = platform.system()
     if system == "Darwin":
         # Create the Wrapper App Structure
-        wrapper_app = os.path.join(DIST_DIR, "Orion Studio.app")
+        wrapper_app = os.path.join(dist_dir, "Orion Studio.app")
         contents_dir = os.path.join(wrapper_app, "Contents")
         macos_dir = os.path.join(contents_dir, "MacOS")
         resources_dir = os.path.join(contents_dir, "Resources")
+        vscode_dest = os.path.join(resources_dir, "Visual Studio Code.app")
+        data_dir = os.path.join(resources_dir, "code-portable-data")
 
-        if os.path.exists(wrapper_app):
-            shutil.rmtree(wrapper_app)
-
-        os.makedirs(macos_dir)
-        os.makedirs(resources_dir)
+        def build_wrapper_app():
+            if os.path.exists(wrapper_app):
+                shutil.rmtree(wrapper_app)
 
-        # Generate app icon from SVG
-        generate_icons(resources_dir)
+            os.makedirs(macos_dir)
+            os.makedirs(resources_dir)
 
-        # 1. Install the Launcher Script
-        launcher_src = os.path.join(os.path.dirname(__file__), "launch_orion.sh")
-        launcher_dest = os.path.join(macos_dir, "OrionStudio")  # Main executable name
-        shutil.copy(launcher_src, launcher_dest)
-        os.chmod(launcher_dest, 0o755)
-
-        # 2. Create Info.plist for the Wrapper
-        info_plist_content = """<?xml version="1.0" encoding="UTF-8"?>
+            # 1. Create Info.plist for the Wrapper
+            info_plist_content = """<?xml version="1.0" encoding="UTF-8"?>
 <!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">
 <plist version="1.0">
 <dict>
@@ -630,93 +3963,149 @@ def main():
     <true/>
 </dict>
 </plist>"""
-        with open(os.path.join(contents_dir, "Info.plist"), "w") as f:
-            f.write(info_plist_content)
-
-        # 3. Move VS Code to Resources (Embedded)
-        # Find Visual Studio Code.app in extract_dir
-        vscode_src = None
-        for root, dirs, _files in os.walk(extract_dir):
-            for d in dirs:
-                if d == "Visual Studio Code.app":
-                    vscode_src = os.path.join(root, d)
+            with open(os.path.join(contents_dir, "Info.plist"), "w") as f:
+                f.write(info_plist_content)
+
+            # 2. Move VS Code to Resources (Embedded)
+            extract()
+
+            # Find Visual Studio Code.app in extract_dir
+            vscode_src = None
+            for root, dirs, _files in os.walk(extract_dir):
+                for d in dirs:
+                    if d == "Visual Studio Code.app":
+                        vscode_src = os.path.join(root, d)
+                        break
+                if vscode_src:
                     break
-            if vscode_src:
-                break
 
-        if not vscode_src:
-            print(f"Error: Could not find Visual Studio Code.app in {extract_dir}")
-            return
+            if not vscode_src:
+                raise Exception(f"Could not find Visual Studio Code.app in {extract_dir}")
 
-        vscode_dest = os.path.join(resources_dir, "Visual Studio Code.app")
-        print(f"Embedding {vscode_src} into {vscode_dest}...")
-        shutil.move(vscode_src, vscode_dest)
+            print(f"Embedding {vscode_src} into {vscode_dest}...")
+            shutil.move(vscode_src, vscode_dest)
+
+            # Clear quarantine on the embedded app
+            clear_quarantine(vscode_dest)
+
+        stage(
+            "extract",
+            {"archive": archive_sha256},
+            [os.path.join(vscode_dest, "Contents", "Resources", "app", "product.json")],
+            build_wrapper_app,
+        )
+
+        # 3. Generate app icon from SVG
+        stage(
+            "icons",
+            {"svg": _optional_sha256(ICON_SVG)},
+            [os.path.join(resources_dir, "AppIcon.icns")],
+            lambda: generate_icons(resources_dir),
+        )
+
+        # 4. Install the Launcher Script and the orion-launcher extension
+        # We need to point the installers to the EMBEDDED app
+        # They expect the PARENT directory of "Visual Studio Code.app"
+        launcher_dest = os.path.join(macos_dir, "OrionStudio")  # Main executable name
+
+        def install_launchers():
+            shutil.copy(launcher_src, launcher_dest)
+            os.chmod(launcher_dest, 0o755)
+            install_orion_launcher(resources_dir)
 
-        # Clear quarantine on the embedded app
-        clear_quarantine(vscode_dest)
+        stage(
+            "launcher",
+            {"script": sha256_file(launcher_src), "extension": hash_tree(LAUNCHER_EXT_DIR, LAUNCHER_BUILD_IGNORE)},
+            [launcher_dest, get_launcher_target_dir(resources_dir)],
+            install_launchers,
+        )
 
-        # 4. Setup Portable Mode (inside the embedded app)
+        # 5. Setup Portable Mode (inside the embedded app)
         # For macOS, 'code-portable-data' goes alongside the binary's app bundle,
         # BUT since we are embedding it, we need to be careful.
         # VS Code looks for 'code-portable-data' sibling to 'Visual Studio Code.app' OR inside it.
         # Let's put it inside the embedded app's Contents/Resources/app/ to be safe?
         # Actually, standard portable mode for macOS is sibling to the .app.
         # So we put 'code-portable-data' in Orion Studio.app/Contents/Resources/
+        settings_dest = os.path.join(data_dir, "user-data", "User", "settings.json")
 
-        data_dir = os.path.join(resources_dir, "code-portable-data")
-        os.makedirs(data_dir, exist_ok=True)
+        def install_settings():
+            os.makedirs(data_dir, exist_ok=True)
 
-        # Create User/settings.json
-        user_data_dir = os.path.join(data_dir, "user-data", "User")
-        os.makedirs(user_data_dir, exist_ok=True)
+            # Create User/settings.json
+            os.makedirs(os.path.dirname(settings_dest), exist_ok=True)
 
-        settings_src = os.path.join(CONFIG_DIR, "settings.json")
-        settings_dest = os.path.join(user_data_dir, "settings.json")
+            if os.path.exists(settings_src):
+                print(f"Copying settings from {settings_src}...")
+                shutil.copy(settings_src, settings_dest)
 
-        if os.path.exists(settings_src):
-            print(f"Copying settings from {settings_src}...")
-            shutil.copy(settings_src, settings_dest)
+        stage("settings", {"settings": _optional_sha256(settings_src)}, [settings_dest], install_settings)
 
-        # 5. Install Extensions
-        # We need to point install_extensions to the EMBEDDED app
-        # install_extensions expects the PARENT directory of "Visual Studio Code.app"
-        install_extensions(resources_dir, data_dir)
+        # 6. Install Extensions
+        stage(
+            "extensions",
+            extensions_inputs,
+            [os.path.join(data_dir, "extensions")],
+            lambda: install_and_dedupe(data_dir, os.path.join(vscode_dest, "Contents", "Resources", "app")),
+        )
+        prefetch_env(data_dir)
+        remote_server(resources_dir, os.path.join(vscode_dest, "Contents", "Resources", "app"))
 
-        # 6. Create DMG installer
-        dmg_path = os.path.join(DIST_DIR, "OrionStudio-macOS.dmg")
-        create_dmg(wrapper_app, dmg_path)
+        # 7. Create DMG installer
+        dmg_path = os.path.join(dist_dir, "OrionStudio-macOS.dmg")
+        stage("package", upstream_stages(manifest), [dmg_path], lambda: create_dmg(wrapper_app, dmg_path))
+        save_build_manifest(manifest, manifest_path)
 
         print(f"Build complete! Orion Studio.app is located at: {wrapper_app}")
         print(f"DMG installer: {dmg_path}")
-        return  # End of macOS build
+        return dmg_path  # End of macOS build
 
     elif system == "Linux":
-        # Setup Portable
-        orion_dir = os.path.join(DIST_DIR, APP_NAME)
-        if os.path.exists(orion_dir):
-            shutil.rmtree(orion_dir)
-        os.makedirs(orion_dir)
-
-        # Find the inner folder
-        contents = os.listdir(extract_dir)
-        vscode_dir = next((d for d in contents if "VSCode" in d), None)
-        if vscode_dir:
-            src_dir = os.path.join(extract_dir, vscode_dir)
-            # Move contents of src_dir to orion_dir
-            for item in os.listdir(src_dir):
-                shutil.move(os.path.join(src_dir, item), orion_dir)
+        orion_dir = os.path.join(dist_dir, APP_NAME)
+
+        def build_install_dir():
+            # Setup Portable
+            if os.path.exists(orion_dir):
+                shutil.rmtree(orion_dir)
+            os.makedirs(orion_dir)
+
+            # Extract the contents of the archive's VSCode-linux-<arch>/ folder straight
+            # into orion_dir
+            extract_file(download_path, orion_dir, strip_components=1)
+            if not args.no_prune:
+                prune_payloads(None, os.path.join(orion_dir, "resources", "app"), target_platform)
+
+        stage(
+            "extract",
+            {"archive": archive_sha256, "prune": prune_inputs},
+            [os.path.join(orion_dir, "resources", "app", "product.json")],
+            build_install_dir,
+        )
 
-        # Install Launcher Script for Linux
-        launcher_src = os.path.join(os.path.dirname(__file__), "launch_orion.sh")
+        # Generate icons for Linux
+        stage(
+            "icons",
+            {"svg": _optional_sha256(ICON_SVG)},
+            [os.path.join(orion_dir, "icons"), os.path.join(orion_dir, "orion-studio.png")],
+            lambda: generate_icons(orion_dir),
+        )
+
+        # Install Launcher Script, data-template materializer, delta update tool, .desktop
+        # file and the orion-launcher extension for Linux
         launcher_dest = os.path.join(orion_dir, "OrionStudio")  # No extension for cleaner look
-        shutil.copy(launcher_src, launcher_dest)
-        os.chmod(launcher_dest, 0o755)
+        materializer_dest = os.path.join(orion_dir, os.path.basename(materializer_src))
+        apply_delta_dest = os.path.join(orion_dir, os.path.basename(apply_delta_src))
+        desktop_file = os.path.join(orion_dir, "orion-studio.desktop")
 
-        # Generate icons for Linux
-        generate_icons(orion_dir)
+        def install_launchers():
+            shutil.copy(launcher_src, launcher_dest)
+            os.chmod(launcher_dest, 0o755)
+            shutil.copy(materializer_src, materializer_dest)
+            os.chmod(materializer_dest, 0o755)
+            shutil.copy(apply_delta_src, apply_delta_dest)
 
-        # Create .desktop file for Linux application menu
-        desktop_content = """[Desktop Entry]
+            # Create .desktop file for Linux application menu
+            desktop_content = """[Desktop Entry]
 Name=Orion Studio
 Comment=Scientific Computing IDE for ORNL Neutron Imaging
 Exec={exec_path}
@@ -726,29 +4115,113 @@ Type=Application
 Categories=Development;IDE;Science;
 StartupWMClass=Code
 """
-        desktop_file = os.path.join(orion_dir, "orion-studio.desktop")
-        with open(desktop_file, "w") as f:
-            f.write(
-                desktop_content.format(
-                    exec_path=os.path.join(orion_dir, "OrionStudio"),
-                    icon_path=os.path.join(orion_dir, "orion-studio.png"),
+            with open(desktop_file, "w") as f:
+                f.write(
+                    desktop_content.format(
+                        exec_path=os.path.join(orion_dir, "OrionStudio"),
+                        icon_path=os.path.join(orion_dir, "orion-studio.png"),
+                    )
                 )
-            )
-        os.chmod(desktop_file, 0o755)
-        print(f"Created {desktop_file}")
+            os.chmod(desktop_file, 0o755)
+            print(f"Created {desktop_file}")
+
+            install_orion_launcher(orion_dir, build=build_launcher or build_orion_launcher)
+
+        stage(
+            "launcher",
+            {
+                "script": sha256_file(launcher_src),
+                "materializer": sha256_file(materializer_src),
+                "apply_delta": sha256_file(apply_delta_src),
+                "extension": hash_tree(LAUNCHER_EXT_DIR, LAUNCHER_BUILD_IGNORE),
+                "install_dir": orion_dir,
+            },
+            [launcher_dest, materializer_dest, apply_delta_dest, desktop_file, get_launcher_target_dir(orion_dir)],
+            install_launchers,
+        )
 
     # Now setup portable mode in the final location
-    data_dir = setup_portable_mode(orion_dir)
+    data_dir = get_portable_data_dir(orion_dir)
+    stage(
+        "settings",
+        {"settings": _optional_sha256(settings_src)},
+        [os.path.join(data_dir, "user-data", "User", "settings.json")],
+        lambda: setup_portable_mode(orion_dir),
+    )
 
     # Install Extensions
-    install_extensions(orion_dir, data_dir)
+    stage(
+        "extensions",
+        extensions_inputs,
+        [os.path.join(data_dir, "extensions")],
+        lambda: install_and_dedupe(data_dir, os.path.join(orion_dir, "resources", "app")),
+    )
+    prefetch_env(data_dir)
+    remote_server(orion_dir, os.path.join(orion_dir, "resources", "app"))
+
+    # Describe the install, as the base of delta updates to the next release
+    artifact = f"OrionStudio-{target}" if target else "OrionStudio-linux"
+    release_manifest_path = os.path.join(DIST_DIR, f"{artifact}.manifest.json")
+    orion_version = get_orion_version()
+    stage(
+        "release-manifest",
+        {"stages": upstream_stages(manifest), "version": orion_version},
+        [release_manifest_path, os.path.join(orion_dir, RELEASE_MANIFEST_NAME)],
+        lambda: write_release_manifest(
+            orion_dir, release_manifest_path, version=orion_version, vscode_version=version, platform=target_platform
+        ),
+    )
 
     # Create compressed tarball for Linux
-    tarball_path = os.path.join(DIST_DIR, "OrionStudio-linux.tar.gz")
-    create_tarball(orion_dir, tarball_path)
+    suffix = COMPRESSION_FORMATS[args.compression]["suffix"]
+    tarball_path = os.path.join(DIST_DIR, artifact + suffix)
+    stage(
+        "package",
+        {"stages": upstream_stages(manifest), "compression": [args.compression, args.compression_level]},
+        [tarball_path],
+        lambda: create_tarball(
+            orion_dir,
+            tarball_path,
+            compression=args.compression,
+            level=args.compression_level,
+            threads=args.compression_threads,
+        ),
+    )
+
+    # Delta update package from the previous release
+    if args.delta_from:
+        base_path = os.path.join(args.delta_from, f"{artifact}.manifest.json")
+        if os.path.exists(base_path):
+            with open(base_path) as f:
+                base_manifest = json.load(f)
+            delta_path = os.path.join(
+                DIST_DIR, f"{artifact}-delta-{base_manifest.get('version')}-to-{orion_version}{suffix}"
+            )
+            stage(
+                "delta",
+                {
+                    "base": sha256_file(base_path),
+                    "release": sha256_file(release_manifest_path),
+                    "compression": [args.compression, args.compression_level],
+                },
+                [delta_path],
+                lambda: create_delta_package(
+                    base_manifest,
+                    orion_dir,
+                    delta_path,
+                    compression=args.compression,
+                    level=args.compression_level,
+                    threads=args.compression_threads,
+                ),
+            )
+            print(f"Delta update: {delta_path}")
+        else:
+            print(f"No previous release manifest at {base_path}, skipping the delta update package")
+    save_build_manifest(manifest, manifest_path)
 
     print(f"Build complete! Orion Studio is located at: {orion_dir}")
     print(f"Tarball: {tarball_path}")
+    return tarball_path
 
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+#!/bin/bash
+
+# Install the VS Code Server payload bundled by build_orion.py into ~/.vscode-server.
+#
+# Usage: install_remote_server.sh [PAYLOAD_DIR]   # default: this script's directory
+#
+# Runs on the Remote-SSH host; stage_remote_server.sh copies the payload there
+# (or finds it in a shared directory) and starts it. Everything goes where
+# Remote-SSH looks before downloading anything:
+#   ~/.vscode-server/code-<commit>                           the VS Code CLI (exec server)
+#   ~/.vscode-server/cli/servers/Stable-<commit>/server      the server
+#   ~/.vscode-server/bin/<commit>                            the server, for the legacy
+#                                                            install (remote.SSH.useExecServer off)
+#   ~/.vscode-server/extensions                              remote.SSH.defaultExtensions
+# Parts that are already there are left alone. Extensions are installed offline
+# with the server's own CLI, dependencies first; one that fails is left for
+# Remote-SSH to install from the marketplace as before.
+
+set -eu
+
+PAYLOAD_DIR="${1:-$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)}"
+COMMIT="$(cat "$PAYLOAD_DIR/commit")"
+BASE_DIR="$HOME/.vscode-server"
+CLI="$BASE_DIR/code-$COMMIT"
+SERVER_DIR="$BASE_DIR/cli/servers/Stable-$COMMIT/server"
+LEGACY_SERVER_DIR="$BASE_DIR/bin/$COMMIT"
+EXT_DIR="$BASE_DIR/extensions"
+
+mkdir -p "$BASE_DIR" "$EXT_DIR" "$(dirname "$SERVER_DIR")" "$(dirname "$LEGACY_SERVER_DIR")"
+
+# Unpacked next to their final place and renamed, so that a connect running at
+# the same time never sees half a CLI or server
+if [ ! -x "$CLI" ]; then
+    tar -xzf "$PAYLOAD_DIR/vscode-cli.tar.gz" -O code >"$CLI.$$"
+    chmod 755 "$CLI.$$"
+    mv "$CLI.$$" "$CLI"
+fi
+if [ ! -x "$SERVER_DIR/bin/code-server" ]; then
+    tmp="$(mktemp -d "$SERVER_DIR.XXXXXX")"
+    tar -xzf "$PAYLOAD_DIR/vscode-server.tar.gz" -C "$tmp" --strip-components 1
+    rm -rf "$SERVER_DIR"
+    mv "$tmp" "$SERVER_DIR"
+fi
+if [ ! -e "$LEGACY_SERVER_DIR" ]; then
+    ln -s "$SERVER_DIR" "$LEGACY_SERVER_DIR"
+fi
+
+INSTALLED=0
+while read -r vsix; do
+    # VS Code names extension directories <id>-<version>[-<platform>], in lower case
+    if compgen -G "$EXT_DIR/${vsix%.vsix}*" >/dev/null; then
+        continue
+    fi
+    if "$SERVER_DIR/bin/code-server" --install-extension "$PAYLOAD_DIR/extensions/$vsix" >/dev/null; then
+        INSTALLED=$((INSTALLED + 1))
+    else
+        echo "Warning: could not install $vsix; Remote-SSH will install it from the marketplace" >&2
+    fi
+done <"$PAYLOAD_DIR/extensions.txt"
+
+echo "VS Code Server ${COMMIT:0:10} is installed in $BASE_DIR ($INSTALLED extensions added)"
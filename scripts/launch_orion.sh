@@ -33,27 +33,31 @@ if [ "$OS" == "Darwin" ]; then
     # macOS: Use portable data in app bundle (single-user installs to /Applications)
     DATA_DIR="$SCRIPT_DIR/../Resources/code-portable-data"
     EXT_DIR="$DATA_DIR/extensions"
+    PIXI_MIRROR_DIR="$DATA_DIR/pixi-mirror"
 else
     # Linux: Use per-user portable data for multi-user shared deployments
     USER_PORTABLE_DIR="$HOME/.orion-studio"
     TEMPLATE_DIR="$SCRIPT_DIR/data-template"
+    PIXI_MIRROR_DIR="$TEMPLATE_DIR/pixi-mirror"
 
     # Check if first run (user portable directory doesn't exist)
     if [ ! -d "$USER_PORTABLE_DIR/user-data" ]; then
         echo "First run: Setting up Orion Studio for $USER..."
         mkdir -p "$USER_PORTABLE_DIR"
 
-        # Copy template if it exists (shared installation)
-        if [ -d "$TEMPLATE_DIR" ]; then
-            echo "Copying bundled settings and extensions..."
-            cp -r "$TEMPLATE_DIR"/* "$USER_PORTABLE_DIR/"
-        else
-            # Fallback: create minimal structure
+        # Fallback without a template: create minimal structure
+        if [ ! -d "$TEMPLATE_DIR" ]; then
             echo "No template found, creating minimal structure..."
             mkdir -p "$USER_PORTABLE_DIR/user-data/User"
             mkdir -p "$USER_PORTABLE_DIR/extensions"
         fi
-        echo "Setup complete."
+    fi
+
+    # Link the bundled extensions from the shared installation and copy the
+    # default settings. Runs on every launch; it returns immediately unless this
+    # is the first run or the installation ships a different set of extensions.
+    if [ -d "$TEMPLATE_DIR" ]; then
+        "$SCRIPT_DIR/materialize_data_template.sh" "$TEMPLATE_DIR" "$USER_PORTABLE_DIR" || exit 1
     fi
 
     # Set portable mode to user directory
@@ -62,6 +66,12 @@ else
     EXT_DIR="$USER_PORTABLE_DIR/extensions"
 fi
 
+# Conda packages bundled by the build (--prefetch-env): orion-launcher points
+# pixi at them so the first notebook environment install works offline
+if [ -f "$PIXI_MIRROR_DIR/mirrors.json" ]; then
+    export ORION_PIXI_MIRROR="$PIXI_MIRROR_DIR"
+fi
+
 # --- Main Logic ---
 
 # Check if App exists
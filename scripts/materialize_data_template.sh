@@ -0,0 +1,138 @@
+#!/bin/bash
+
+# Materialize the Linux data-template into a user's portable directory.
+#
+# Usage: materialize_data_template.sh TEMPLATE_DIR USER_DIR
+#
+# The bundled extensions in TEMPLATE_DIR/extensions are immutable, so each one
+# is linked from the shared install instead of copied. Everything else in the
+# template (user-data/ with the default settings) is mutable user state; it is
+# copied once, on first run. The bundled conda packages in pixi-mirror/ are read
+# in place and not copied at all.
+#
+# ORION_MATERIALIZE_MODE selects how extensions are linked:
+#   auto      reflink, then hardlink, then symlink, whichever works first; the
+#             last two only when the user cannot write to any template file,
+#             and a copy otherwise (default)
+#   hardlink  cp -al; same filesystem, and fs.protected_hardlinks must allow it
+#   reflink   cp --reflink=always; same copy-on-write filesystem (Btrfs, XFS)
+#   symlink   one symlink per extension; works across filesystems (NFS homes)
+#   copy      full copy, for extensions that write into their own directory
+#
+# Hardlinks and symlinks share the files with the install. An extension that
+# rewrites one of them in place would change it for every user and for the
+# next template refresh. So auto uses them only for a read-only install. A
+# user who owns the install (a personal build, say) gets reflinks or copies.
+#
+# The names of the linked extensions are kept in USER_DIR/.orion-template. When
+# an upgraded install ships a different set, the dropped ones are removed and
+# the new ones linked. Extensions the user installed are never touched.
+#
+# VS Code only loads the extensions listed in extensions/extensions.json. The
+# build writes one for the bundled set; it is copied whenever the user has no
+# extensions of their own, which spares VS Code the scan of the whole directory
+# on first start. Otherwise it is deleted so VS Code rebuilds it from the
+# directory contents, user extensions included.
+
+set -u
+
+TEMPLATE_DIR="$(cd "$1" && pwd -P)"
+USER_DIR="$2"
+MODE="${ORION_MATERIALIZE_MODE:-auto}"
+STATE_FILE="$USER_DIR/.orion-template"
+
+case "$MODE" in
+    auto)
+        if [ -n "$(find "$TEMPLATE_DIR/extensions" -writable -print -quit 2>/dev/null)" ]; then
+            METHODS="reflink copy"
+        else
+            METHODS="reflink hardlink symlink"
+        fi
+        ;;
+    hardlink | reflink | symlink | copy) METHODS="$MODE" ;;
+    *)
+        echo "Error: unknown ORION_MATERIALIZE_MODE '$MODE'" >&2
+        exit 2
+        ;;
+esac
+
+# Link (or copy) one extension directory with the first method that works.
+# Methods that fail are dropped, so the remaining extensions don't retry them.
+link_extension() {
+    local src="$1" dest="$2" method
+    for method in $METHODS; do
+        case "$method" in
+            hardlink) cp -al "$src" "$dest" 2>/dev/null ;;
+            reflink) cp -r --reflink=always "$src" "$dest" 2>/dev/null ;;
+            symlink) ln -s "$src" "$dest" ;;
+            copy) cp -r "$src" "$dest" ;;
+        esac && {
+            LINKED_WITH="$method"
+            return 0
+        }
+        # A partial copy of a read-only install keeps its read-only directories
+        chmod -R u+w "$dest" 2>/dev/null
+        rm -rf "$dest"
+        METHODS="${METHODS#"$method"}"
+        METHODS="${METHODS# }"
+    done
+    return 1
+}
+
+mkdir -p "$USER_DIR/extensions"
+
+# Mutable user state: copied on first run only
+if [ ! -d "$USER_DIR/user-data" ]; then
+    for item in "$TEMPLATE_DIR"/*; do
+        case "$(basename "$item")" in
+            extensions | pixi-mirror) continue ;;
+        esac
+        cp -r "$item" "$USER_DIR/"
+    done
+fi
+
+# Bundled extensions: skip everything when the install ships the same set
+CURRENT=""
+if [ -d "$TEMPLATE_DIR/extensions" ]; then
+    CURRENT="$(find "$TEMPLATE_DIR/extensions" -mindepth 1 -maxdepth 1 -type d -printf '%f\n' | sort)"
+fi
+PREVIOUS=""
+if [ -f "$STATE_FILE" ]; then
+    PREVIOUS="$(cat "$STATE_FILE")"
+fi
+if [ -f "$STATE_FILE" ] && [ "$CURRENT" == "$PREVIOUS" ]; then
+    exit 0
+fi
+
+# Extensions an earlier install shipped but this one no longer does
+for name in $(comm -23 <(echo "$PREVIOUS") <(echo "$CURRENT")); do
+    rm -rf "${USER_DIR:?}/extensions/$name"
+done
+
+LINKED=0
+LINKED_WITH=""
+for name in $CURRENT; do
+    dest="$USER_DIR/extensions/$name"
+    # Left in place: copies from before this tool existed, or a previous run
+    if [ -e "$dest" ] || [ -L "$dest" ]; then
+        continue
+    fi
+    if ! link_extension "$TEMPLATE_DIR/extensions/$name" "$dest"; then
+        echo "Error: could not materialize extension $name into $USER_DIR" >&2
+        exit 1
+    fi
+    LINKED=$((LINKED + 1))
+done
+
+if [ "$LINKED" -gt 0 ]; then
+    echo "Linked $LINKED bundled extensions ($LINKED_WITH)"
+fi
+
+# Extensions the user installed (VS Code's own dot files aside)
+INSTALLED="$(find "$USER_DIR/extensions" -mindepth 1 -maxdepth 1 \( -type d -o -type l \) -not -name '.*' -printf '%f\n' | sort)"
+if [ -f "$TEMPLATE_DIR/extensions/extensions.json" ] && [ -z "$(comm -13 <(echo "$CURRENT") <(echo "$INSTALLED"))" ]; then
+    cp "$TEMPLATE_DIR/extensions/extensions.json" "$USER_DIR/extensions/extensions.json"
+else
+    rm -f "$USER_DIR/extensions/extensions.json"
+fi
+echo "$CURRENT" >"$STATE_FILE"
@@ -0,0 +1,78 @@
+#!/bin/bash
+
+# Pre-stage the bundled VS Code Server and remote default extensions on an SSH host.
+#
+# Usage: stage_remote_server.sh [--cache DIR] HOST
+#        stage_remote_server.sh --publish DIR HOST
+#
+# The build puts the VS Code Server and CLI of the VS Code commit it ships, and
+# the linux-x64 VSIXes of remote.SSH.defaultExtensions, next to this script.
+# install_remote_server.sh sets them up in ~/.vscode-server on HOST, so the next
+# Remote-SSH connect neither downloads the server nor installs extensions from
+# the marketplace there, and works on hosts without internet access.
+#
+#   --cache DIR    shared directory on HOST holding payloads published with
+#                  --publish; when DIR/<commit> exists, the server is installed
+#                  from there instead of copying the payload over SSH
+#   --publish DIR  copy the payload to DIR/<commit> on HOST, for everyone's
+#                  --cache, and install nothing
+#
+# DIR must not contain spaces or quotes. Staged hosts are recorded in
+# ~/.orion-studio/remote-server-staged and skipped, without connecting, until
+# an Orion Studio update ships another VS Code commit.
+
+set -eu
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+COMMIT="$(cat "$SCRIPT_DIR/commit")"
+STAGED_FILE="$HOME/.orion-studio/remote-server-staged"
+
+CACHE_DIR=""
+PUBLISH_DIR=""
+while [ $# -gt 1 ]; do
+    case "$1" in
+        --cache) CACHE_DIR="$2" ;;
+        --publish) PUBLISH_DIR="$2" ;;
+        *) break ;;
+    esac
+    shift 2
+done
+if [ $# -ne 1 ]; then
+    echo "Usage: $0 [--cache DIR | --publish DIR] HOST" >&2
+    exit 2
+fi
+HOST="$1"
+
+# Commands for the remote login shell, which may not be bash: each runs as
+# bash -c '...' with its directory as $1, so they must not contain single quotes
+REMOTE_PUBLISH='set -e; mkdir -p "$1"; tar -xf - -C "$1"; chmod -R a+rX "$1"'
+REMOTE_FROM_CACHE='if [ -f "$1/install_remote_server.sh" ]; then exec bash "$1/install_remote_server.sh" "$1"; fi; exit 3'
+REMOTE_FROM_STDIN='set -e; mkdir -p "$1"; tmp="$(mktemp -d "$1/.orion-stage.XXXXXX")"; trap "rm -rf $tmp" EXIT; tar -xf - -C "$tmp"; bash "$tmp/install_remote_server.sh" "$tmp"'
+
+if [ -n "$PUBLISH_DIR" ]; then
+    echo "Publishing VS Code Server ${COMMIT:0:10} to $HOST:$PUBLISH_DIR/$COMMIT..."
+    tar -C "$SCRIPT_DIR" -cf - . | ssh "$HOST" "bash -c '$REMOTE_PUBLISH' orion-stage $PUBLISH_DIR/$COMMIT"
+    exit 0
+fi
+
+if grep -qxF "$HOST $COMMIT" "$STAGED_FILE" 2>/dev/null; then
+    exit 0
+fi
+
+echo "Staging VS Code Server ${COMMIT:0:10} on $HOST..."
+status=3  # nothing published for this commit
+if [ -n "$CACHE_DIR" ]; then
+    status=0
+    ssh "$HOST" "bash -c '$REMOTE_FROM_CACHE' orion-stage $CACHE_DIR/$COMMIT" || status=$?
+    if [ "$status" -ne 0 ] && [ "$status" -ne 3 ]; then
+        exit "$status"
+    fi
+    [ "$status" -eq 3 ] && echo "$HOST:$CACHE_DIR has no payload for ${COMMIT:0:10}, copying it over SSH"
+fi
+if [ "$status" -ne 0 ]; then
+    # Unpacked into a temporary directory on HOST, installed and removed in one connection
+    tar -C "$SCRIPT_DIR" -cf - . | ssh "$HOST" "bash -c '$REMOTE_FROM_STDIN' orion-stage .vscode-server"
+fi
+
+mkdir -p "$(dirname "$STAGED_FILE")"
+echo "$HOST $COMMIT" >>"$STAGED_FILE"